@@ -0,0 +1,474 @@
+"""Content-addressed store of the files of project snapshots.
+
+Instead of copying a project for every snapshot, the files of the
+project are stored once as blobs, keyed by the hash of their content
+and their mode, and hardlinked into the snapshots. Creating a snapshot
+thus only writes files that are not stored yet.
+
+Every project has its own store at `<USERDIR_BLOB_STORE>/<project>`:
+    blobs/<hash[:2]>/<hash[2:]>-<mode>: The stored files.
+    index.json: Maps the paths of the project files to their stat info
+        and blob at the time of the last snapshot. Files whose stat info
+        didn't change are not hashed again. Files modified shortly
+        before the index was written are not trusted, see
+        `_RACY_INTERVAL`.
+    manifests/<snapshot_id>.json: The blobs used by a snapshot, so that
+        blobs that are no longer used can be found when the snapshot is
+        removed, without going over the entire store, and the files of
+        the snapshot, see `get_snapshot_files`.
+
+Snapshots can also be shared, see `create_shared_snapshot`, in which
+case their id is derived from their content so that snapshotting an
+unchanged directory reuses the existing snapshot.
+
+Blobs are shared with the snapshots through hardlinks, snapshots are
+therefore not to be modified in place. A blob that is not linked by
+any snapshot, i.e. has a link count of 1, is removed.
+
+"""
+import hashlib
+import json
+import os
+import shutil
+import stat
+import subprocess
+import tempfile
+import time
+import uuid
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from _orchest.internals import config as _config
+from _orchest.internals.utils import rmtree
+
+# Index entries of files modified less than this many seconds before the
+# index was written are not trusted, since the file could have been
+# modified again within the same mtime granularity, which is coarse on
+# some file systems, e.g. NFS, without its stat info changing.
+_RACY_INTERVAL = 3
+
+
+def _get_project_store(project_uuid: str) -> str:
+    return os.path.join(_config.USERDIR_BLOB_STORE, project_uuid)
+
+
+def _get_manifest_path(project_uuid: str, snapshot_id: str) -> str:
+    return os.path.join(
+        _get_project_store(project_uuid), "manifests", f"{snapshot_id}.json"
+    )
+
+
+def _read_json(path: str) -> dict:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _read_index(project_store: str) -> Tuple[Dict[str, list], int]:
+    """Reads the index and the mtime, in ns, of when it was written."""
+    try:
+        with open(os.path.join(project_store, "index.json"), "r") as f:
+            return json.load(f), os.fstat(f.fileno()).st_mtime_ns
+    except (OSError, ValueError):
+        return {}, 0
+
+
+def _write_json(path: str, content: dict) -> None:
+    # Write to a temporary file first so that concurrent readers never
+    # read a partially written file.
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp-{uuid.uuid4()}"
+    with open(tmp_path, "w") as f:
+        json.dump(content, f)
+    os.replace(tmp_path, path)
+
+
+def _list_files(source: str, use_gitignore: bool) -> Iterator[str]:
+    """Yields the paths, relative to source, of the files to snapshot.
+
+    Directories are yielded before their content.
+    """
+    if use_gitignore:
+        # Let rsync do the listing so that the `.gitignore` is
+        # interpreted exactly like `utils.copytree` does.
+        source = source.rstrip("/") + "/"
+        list_cmd = ["rsync", "-an", "--out-format=%n"]
+        if os.path.isfile(f"{source}.gitignore"):
+            list_cmd += [f"--exclude-from={source}.gitignore"]
+        with tempfile.TemporaryDirectory() as empty_dir:
+            output = subprocess.check_output(list_cmd + [source, empty_dir])
+        for line in output.decode("utf-8").splitlines():
+            path = line.rstrip("/")
+            if path and path != ".":
+                yield path
+    else:
+        for root, dirs, files in os.walk(source):
+            for name in dirs + files:
+                yield os.path.relpath(os.path.join(root, name), source)
+
+
+def _hash_file(path: str) -> str:
+    file_hash = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def _get_blob_path(project_store: str, blob: str) -> str:
+    return os.path.join(project_store, "blobs", blob[:2], blob[2:])
+
+
+def _get_blob_name(path: str, st: os.stat_result) -> str:
+    return f"{_hash_file(path)}-{stat.S_IMODE(st.st_mode):o}"
+
+
+def _store_blob(project_store: str, path: str, st: os.stat_result) -> str:
+    """Stores the file as a blob if needed and returns its name."""
+    blob = _get_blob_name(path, st)
+    if os.path.exists(_get_blob_path(project_store, blob)):
+        return blob
+
+    # The file is hashed again while it is copied, the blob is named
+    # after the content that was copied, which differs from the content
+    # that was hashed before if the file was written to in between.
+    blobs_dir = os.path.join(project_store, "blobs")
+    os.makedirs(blobs_dir, exist_ok=True)
+    tmp_path = os.path.join(blobs_dir, f"tmp-{uuid.uuid4()}")
+    file_hash = hashlib.sha256()
+    try:
+        with open(path, "rb") as src, open(tmp_path, "wb") as dst:
+            for chunk in iter(lambda: src.read(1 << 20), b""):
+                file_hash.update(chunk)
+                dst.write(chunk)
+        shutil.copystat(path, tmp_path)
+        blob = f"{file_hash.hexdigest()}-{stat.S_IMODE(st.st_mode):o}"
+        blob_path = _get_blob_path(project_store, blob)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        # Replacing an existing blob, added concurrently, is harmless
+        # since its content is the same.
+        os.replace(tmp_path, blob_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return blob
+
+
+def _link_blob(project_store: str, blob: str, target: str) -> None:
+    blob_path = _get_blob_path(project_store, blob)
+    try:
+        os.link(blob_path, target)
+    except OSError:
+        # E.g. the file system doesn't support hardlinks.
+        shutil.copy2(blob_path, target)
+
+
+def _is_racy(mtime_ns: int, index_mtime_ns: int) -> bool:
+    return index_mtime_ns - mtime_ns < _RACY_INTERVAL * 10**9
+
+
+def _is_index_entry_valid(
+    entry: Optional[list], st: os.stat_result, index_mtime_ns: int
+) -> bool:
+    """Whether the blob of the index entry is the one of the file.
+
+    The blob itself isn't necessarily stored, see `get_project_files`.
+    """
+    return (
+        entry is not None
+        and entry[:3] == [st.st_size, st.st_mtime_ns, st.st_ino]
+        and not _is_racy(st.st_mtime_ns, index_mtime_ns)
+    )
+
+
+def _is_blob_stored(project_store: str, blob: str) -> bool:
+    return os.path.exists(_get_blob_path(project_store, blob))
+
+
+def _write_index(project_store: str, index: Dict[str, list]) -> None:
+    """Writes the index, without the entries that can't be trusted."""
+    now = time.time_ns()
+    _write_json(
+        os.path.join(project_store, "index.json"),
+        {
+            rel_path: entry
+            for rel_path, entry in index.items()
+            if not _is_racy(entry[1], now)
+        },
+    )
+
+
+def _store_files(project_uuid: str, source: str, use_gitignore: bool) -> List[list]:
+    """Stores the files of the source directory.
+
+    Returns:
+        The [path, kind, value] entries of the snapshot, in the order
+        in which they are to be created. The kind is "dir", "symlink",
+        whose value is the target of the link, or "file", whose value
+        is the blob.
+
+    """
+    project_store = _get_project_store(project_uuid)
+    index, index_mtime_ns = _read_index(project_store)
+    new_index: Dict[str, list] = {}
+    entries: List[list] = []
+
+    for rel_path in _list_files(source, use_gitignore):
+        path = os.path.join(source, rel_path)
+        st = os.lstat(path)
+
+        if stat.S_ISDIR(st.st_mode):
+            entries.append([rel_path, "dir", None])
+        elif stat.S_ISLNK(st.st_mode):
+            entries.append([rel_path, "symlink", os.readlink(path)])
+        elif stat.S_ISREG(st.st_mode):
+            entry = index.get(rel_path)
+            if _is_index_entry_valid(entry, st, index_mtime_ns) and _is_blob_stored(
+                project_store, entry[3]
+            ):
+                blob = entry[3]
+            else:
+                blob = _store_blob(project_store, path, st)
+            new_index[rel_path] = [st.st_size, st.st_mtime_ns, st.st_ino, blob]
+            entries.append([rel_path, "file", blob])
+
+    _write_index(project_store, new_index)
+    return entries
+
+
+def _create_snapshot_from_entries(
+    project_uuid: str, snapshot_id: str, source: str, target: str, entries: List[list]
+) -> None:
+    project_store = _get_project_store(project_uuid)
+    blobs: List[str] = []
+    files: Dict[str, str] = {}
+
+    os.makedirs(target)
+    for rel_path, kind, value in entries:
+        target_path = os.path.join(target, rel_path)
+        if kind == "dir":
+            os.makedirs(target_path, exist_ok=True)
+        elif kind == "symlink":
+            os.symlink(value, target_path)
+            files[rel_path] = f"symlink:{value}"
+        else:
+            try:
+                _link_blob(project_store, value, target_path)
+            except FileNotFoundError:
+                # The blob was removed concurrently.
+                path = os.path.join(source, rel_path)
+                value = _store_blob(project_store, path, os.lstat(path))
+                _link_blob(project_store, value, target_path)
+            blobs.append(value)
+            files[rel_path] = value
+
+    _write_json(
+        _get_manifest_path(project_uuid, snapshot_id), {"blobs": blobs, "files": files}
+    )
+
+
+def create_snapshot(
+    project_uuid: str,
+    snapshot_id: str,
+    source: str,
+    target: str,
+    use_gitignore: bool = True,
+) -> None:
+    """Creates a snapshot of the source directory at target.
+
+    Equivalent to `utils.copytree(source, target, use_gitignore)`, but
+    files are hardlinked from the store of the project. Only files
+    whose stat info changed since the last snapshot are read, and only
+    files whose content isn't stored yet are written.
+
+    Args:
+        project_uuid: The project the source directory belongs to.
+        snapshot_id: Identifies the snapshot within the project, the
+            snapshot can be moved without changing its id.
+        source: The directory to snapshot.
+        target: The not yet existing directory of the snapshot.
+        use_gitignore: If True, patterns from the top-level
+            `.gitignore` in `source` are ignored.
+
+    Raises:
+        OSError if it failed to create the snapshot.
+
+    """
+    entries = _store_files(project_uuid, source, use_gitignore)
+    _create_snapshot_from_entries(project_uuid, snapshot_id, source, target, entries)
+
+
+def create_shared_snapshot(
+    project_uuid: str, source: str, snapshots_dir: str, use_gitignore: bool = True
+) -> str:
+    """Creates a snapshot of the source directory, unless it exists.
+
+    Like `create_snapshot`, but the id of the snapshot is the hash of
+    its content and the snapshot is created at
+    `<snapshots_dir>/<snapshot_id>`. Snapshotting a directory whose
+    content didn't change since its previous snapshot in snapshots_dir
+    thus returns the existing snapshot, which is to be considered read
+    only. The snapshot is created atomically, concurrent calls get the
+    same, complete, snapshot.
+
+    Returns:
+        The path of the snapshot, its basename is the snapshot id to be
+        given to `remove_snapshot`.
+
+    Raises:
+        OSError if it failed to create the snapshot.
+
+    """
+    entries = _store_files(project_uuid, source, use_gitignore)
+    snapshot_id = hashlib.sha256(json.dumps(entries).encode("utf-8")).hexdigest()
+    target = os.path.join(snapshots_dir, snapshot_id)
+    if os.path.isdir(target):
+        return target
+
+    tmp_target = f"{target}.tmp-{uuid.uuid4()}"
+    try:
+        _create_snapshot_from_entries(
+            project_uuid, snapshot_id, source, tmp_target, entries
+        )
+        os.rename(tmp_target, target)
+    except OSError:
+        rmtree(tmp_target, ignore_errors=True)
+        # The same snapshot has been created concurrently.
+        if not os.path.isdir(target):
+            raise
+    return target
+
+
+def get_project_files(
+    project_uuid: str, source: str, use_gitignore: bool = True
+) -> Dict[str, str]:
+    """Gets the files a snapshot of the source directory would contain.
+
+    No blobs are stored, files whose stat info didn't change since the
+    last snapshot of the project, or since the last call, aren't read.
+    The blobs of the files that are read are recorded in the index.
+
+    Returns:
+        A mapping from the paths of the files, relative to source, to
+        their blob, or to "symlink:<target>" for symlinks. Equal to
+        `get_snapshot_files` of a snapshot of the same content.
+
+    """
+    project_store = _get_project_store(project_uuid)
+    index, index_mtime_ns = _read_index(project_store)
+    files: Dict[str, str] = {}
+    new_entries: Dict[str, list] = {}
+    for rel_path in _list_files(source, use_gitignore):
+        path = os.path.join(source, rel_path)
+        st = os.lstat(path)
+        if stat.S_ISLNK(st.st_mode):
+            files[rel_path] = f"symlink:{os.readlink(path)}"
+        elif stat.S_ISREG(st.st_mode):
+            entry = index.get(rel_path)
+            if _is_index_entry_valid(entry, st, index_mtime_ns):
+                files[rel_path] = entry[3]
+            else:
+                files[rel_path] = _get_blob_name(path, st)
+                new_entries[rel_path] = [
+                    st.st_size,
+                    st.st_mtime_ns,
+                    st.st_ino,
+                    files[rel_path],
+                ]
+
+    if new_entries:
+        # Entries of concurrent calls can get lost, which only means
+        # that their files are read again.
+        index.update(new_entries)
+        _write_index(project_store, index)
+    return files
+
+
+def get_snapshot_files(project_uuid: str, snapshot_id: str) -> Dict[str, str]:
+    """Gets the files of an existing snapshot, see `get_project_files`.
+
+    Raises:
+        OSError if the snapshot doesn't exist.
+
+    """
+    manifest_path = _get_manifest_path(project_uuid, snapshot_id)
+    with open(manifest_path, "r") as f:
+        return json.load(f)["files"]
+
+
+def remove_snapshot(project_uuid: str, snapshot_id: str, snapshot_dir: str) -> None:
+    """Removes a snapshot and the blobs no other snapshot uses.
+
+    Only the blobs used by the snapshot are considered, so that the
+    removal scales with the size of the snapshot instead of the size
+    of the store.
+    """
+    rmtree(snapshot_dir, ignore_errors=True)
+
+    project_store = _get_project_store(project_uuid)
+    manifest_path = _get_manifest_path(project_uuid, snapshot_id)
+    for blob in set(_read_json(manifest_path).get("blobs", [])):
+        blob_path = _get_blob_path(project_store, blob)
+        try:
+            if os.stat(blob_path).st_nlink == 1:
+                os.remove(blob_path)
+        except OSError:
+            pass
+
+    try:
+        os.remove(manifest_path)
+    except OSError:
+        pass
+
+
+def remove_project_store(project_uuid: str) -> None:
+    """Removes the store of a project, e.g. when deleting the project.
+
+    Existing snapshots are unaffected, they hold their own links.
+    """
+    rmtree(_get_project_store(project_uuid), ignore_errors=True)
+
+
+def get_new_content_size(
+    project_uuid: str, source: str, skip_dirs: Optional[List[str]] = None
+) -> int:
+    """Gets the size of the files that a new snapshot would store.
+
+    Files that haven't changed since the last snapshot, according to
+    their stat info, are already stored. Changed files are counted
+    entirely, even though their content might be stored already.
+
+    Args:
+        project_uuid: The project the source directory belongs to.
+        source: The directory to snapshot.
+        skip_dirs: Directories to skip, like `get_directory_size`.
+
+    Returns:
+        The size, in bytes, of the new content.
+
+    """
+    project_store = _get_project_store(project_uuid)
+    index, index_mtime_ns = _read_index(project_store)
+    if skip_dirs is None:
+        skip_dirs = []
+
+    size = 0
+    for root, dirs, files in os.walk(source):
+        for file_name in files:
+            path = os.path.join(root, file_name)
+            st = os.lstat(path)
+            if not stat.S_ISREG(st.st_mode):
+                continue
+            entry = index.get(os.path.relpath(path, source))
+            if not _is_index_entry_valid(
+                entry, st, index_mtime_ns
+            ) or not _is_blob_stored(project_store, entry[3]):
+                size += st.st_size
+
+        for skip_dir in skip_dirs:
+            if skip_dir in dirs:
+                dirs.remove(skip_dir)
+
+    return size
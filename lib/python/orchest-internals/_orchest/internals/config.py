@@ -12,6 +12,8 @@ USERDIR_PROJECTS = "/userdir/projects"
 USERDIR_ENV_IMG_BUILDS = "/userdir/.orchest/env-img-builds"
 USERDIR_JUPYTER_IMG_BUILDS = "/userdir/.orchest/jupyter-img-builds"
 USERDIR_JUPYTERLAB = "/userdir/.orchest/user-configurations/jupyterlab"
+USERDIR_STEP_OUTPUT_CACHE = "/userdir/.orchest/step-output-cache"
+USERDIR_BLOB_STORE = "/userdir/.orchest/blob-store"
 
 ALLOWED_FILE_EXTENSIONS = ["ipynb", "py", "R", "sh", "jl", "js"]
 
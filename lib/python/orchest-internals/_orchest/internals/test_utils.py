@@ -1,3 +1,4 @@
+import contextlib
 import uuid
 from typing import Any, Callable, Optional
 
@@ -53,8 +54,16 @@ class CeleryMock:
     def __init__(self):
         self.tasks = []
         self.revoked_tasks = []
+        self.producers = []
         self.control = self
 
+    @contextlib.contextmanager
+    def producer_or_acquire(self, producer=None):
+        if producer is None:
+            producer = object()
+            self.producers.append(producer)
+        yield producer
+
     def send_task(self, *args, **kwargs):
         self.tasks.append(
             (
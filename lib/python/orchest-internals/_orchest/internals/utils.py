@@ -343,6 +343,31 @@ def copytree(
         raise OSError(f"Failed to copy {source} to {target}, :{exit_code}.")
 
 
+def linktree(source: str, target: str, ignore_errors: bool = False) -> None:
+    """Recreates the tree of source at target by hardlinking its files.
+
+    Directories are created, files are hardlinked, meaning that the
+    target takes up (almost) no additional space. Writing to a file in
+    place through either tree changes it in both, files should be
+    replaced (removed and recreated) instead.
+
+    Args:
+        source:
+        target:
+        ignore_errors: If True errors will be ignored, if False an
+            OSError will be raised.
+
+    Raises:
+        OSError if it failed to link and ignore_errors is False.
+
+    """
+    exit_code = subprocess.call(
+        ["cp", "-r", "--link", source, target], stderr=subprocess.STDOUT
+    )
+    if exit_code != 0 and not ignore_errors:
+        raise OSError(f"Failed to link {source} to {target}, :{exit_code}.")
+
+
 def get_userdir_relpath(path):
     return os.path.relpath(path, "/userdir")
 
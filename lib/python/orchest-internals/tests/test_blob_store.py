@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import time
+
+import pytest
+
+from _orchest.internals import blob_store
+
+
+def _write(root, path, content, age=10):
+    path = os.path.join(root, path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+    # Files that were modified just now are never trusted by the index.
+    if age:
+        past = time.time() - age
+        os.utime(path, (past, past))
+
+
+def _read(root, path):
+    with open(os.path.join(root, path)) as f:
+        return f.read()
+
+
+def _blobs(project_uuid):
+    blobs_dir = os.path.join(blob_store._get_project_store(project_uuid), "blobs")
+    return sorted(
+        os.path.join(root, name)
+        for root, _, files in os.walk(blobs_dir)
+        for name in files
+    )
+
+
+@pytest.fixture(autouse=True)
+def store_dir(tmp_path, monkeypatch):
+    store_dir = str(tmp_path / "blob-store")
+    monkeypatch.setattr(blob_store._config, "USERDIR_BLOB_STORE", store_dir)
+    return store_dir
+
+
+@pytest.fixture
+def project(tmp_path):
+    project = str(tmp_path / "project")
+    _write(project, "a.py", "a")
+    _write(project, "dir/b.py", "b")
+    _write(project, "dir/copy-of-b.py", "b")
+    os.makedirs(os.path.join(project, "empty"))
+    os.symlink("a.py", os.path.join(project, "link"))
+    return project
+
+
+def test_create_snapshot(project, tmp_path):
+    target = str(tmp_path / "snapshot")
+
+    blob_store.create_snapshot("project", "snapshot", project, target, False)
+
+    assert _read(target, "a.py") == "a"
+    assert _read(target, "dir/b.py") == "b"
+    assert os.path.isdir(os.path.join(target, "empty"))
+    assert os.readlink(os.path.join(target, "link")) == "a.py"
+    # Files with the same content share their blob.
+    assert os.path.samefile(
+        os.path.join(target, "dir/b.py"), os.path.join(target, "dir/copy-of-b.py")
+    )
+    assert len(_blobs("project")) == 2
+
+
+def test_create_snapshot_uses_gitignore(project, tmp_path):
+    _write(project, ".gitignore", "ignored/\n")
+    _write(project, "ignored/c.py", "c")
+    target = str(tmp_path / "snapshot")
+
+    blob_store.create_snapshot("project", "snapshot", project, target)
+
+    assert os.path.isfile(os.path.join(target, "a.py"))
+    assert not os.path.exists(os.path.join(target, "ignored"))
+
+
+def test_snapshots_share_unchanged_files(project, tmp_path):
+    first, second = str(tmp_path / "first"), str(tmp_path / "second")
+    blob_store.create_snapshot("project", "first", project, first, False)
+    _write(project, "a.py", "changed")
+
+    blob_store.create_snapshot("project", "second", project, second, False)
+
+    assert os.path.samefile(
+        os.path.join(first, "dir/b.py"), os.path.join(second, "dir/b.py")
+    )
+    assert _read(first, "a.py") == "a"
+    assert _read(second, "a.py") == "changed"
+
+
+def test_index_is_reused(project, tmp_path, monkeypatch):
+    blob_store.create_snapshot(
+        "project", "first", project, str(tmp_path / "first"), False
+    )
+    hashed = []
+    hash_file = blob_store._hash_file
+    monkeypatch.setattr(
+        blob_store, "_hash_file", lambda path: hashed.append(path) or hash_file(path)
+    )
+    _write(project, "a.py", "changed")
+
+    blob_store.create_snapshot(
+        "project", "second", project, str(tmp_path / "second"), False
+    )
+
+    # Only the file whose stat info changed is read again.
+    assert hashed == [os.path.join(project, "a.py")]
+
+
+def test_remove_snapshot(project, tmp_path):
+    first, second = str(tmp_path / "first"), str(tmp_path / "second")
+    blob_store.create_snapshot("project", "first", project, first, False)
+    _write(project, "a.py", "changed")
+    blob_store.create_snapshot("project", "second", project, second, False)
+    assert len(_blobs("project")) == 3
+
+    blob_store.remove_snapshot("project", "first", first)
+
+    # The blob only used by the first snapshot is removed.
+    assert not os.path.exists(first)
+    assert len(_blobs("project")) == 2
+    assert _read(second, "a.py") == "changed"
+
+    blob_store.remove_snapshot("project", "second", second)
+
+    assert _blobs("project") == []
+
+
+def test_get_new_content_size(project, tmp_path):
+    assert blob_store.get_new_content_size("project", project) == 3
+
+    blob_store.create_snapshot(
+        "project", "snapshot", project, str(tmp_path / "snapshot"), False
+    )
+    assert blob_store.get_new_content_size("project", project) == 0
+
+    _write(project, "a.py", "changed")
+    _write(project, "skipped/c.py", "c")
+    assert blob_store.get_new_content_size("project", project, ["skipped"]) == 7
+
+
+def test_get_project_files_matches_snapshot(project, tmp_path):
+    files = blob_store.get_project_files("project", project, use_gitignore=False)
+
+    snapshot = blob_store.create_shared_snapshot(
+        "project", project, str(tmp_path / "snapshots"), use_gitignore=False
+    )
+
+    assert files["link"] == "symlink:a.py"
+    assert blob_store.get_snapshot_files("project", os.path.basename(snapshot)) == (
+        files
+    )
+
+
+def test_get_project_files_updates_index(project, tmp_path, monkeypatch):
+    files = blob_store.get_project_files("project", project)
+    hashed = []
+    hash_file = blob_store._hash_file
+    monkeypatch.setattr(
+        blob_store, "_hash_file", lambda path: hashed.append(path) or hash_file(path)
+    )
+
+    assert blob_store.get_project_files("project", project) == files
+    assert hashed == []
+
+    # The blobs themselves are still stored by a snapshot.
+    target = str(tmp_path / "snapshot")
+    blob_store.create_snapshot("project", "snapshot", project, target, False)
+    assert _read(target, "dir/b.py") == "b"
+    assert len(_blobs("project")) == 2
+
+
+def test_create_shared_snapshot_reuses_unchanged_snapshot(project, tmp_path):
+    snapshots_dir = str(tmp_path / "snapshots")
+
+    first = blob_store.create_shared_snapshot("project", project, snapshots_dir, False)
+    second = blob_store.create_shared_snapshot("project", project, snapshots_dir, False)
+    _write(project, "a.py", "changed")
+    third = blob_store.create_shared_snapshot("project", project, snapshots_dir, False)
+
+    assert first == second
+    assert third != first
+    assert _read(third, "a.py") == "changed"
+
+
+def test_racy_index_entries_are_not_trusted(project, tmp_path):
+    _write(project, "a.py", "a", age=0)
+    blob_store.create_snapshot(
+        "project", "first", project, str(tmp_path / "first"), False
+    )
+    index_path = os.path.join(blob_store._get_project_store("project"), "index.json")
+    with open(index_path) as f:
+        assert "a.py" not in json.load(f)
+
+    # Rewrite the file without changing its stat info, as happens
+    # within the mtime granularity of the file system.
+    st = os.stat(os.path.join(project, "a.py"))
+    _write(project, "a.py", "x", age=0)
+    os.utime(os.path.join(project, "a.py"), ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    blob_store.create_snapshot(
+        "project", "second", project, str(tmp_path / "second"), False
+    )
+
+    assert _read(tmp_path / "second", "a.py") == "x"
+
+
+def test_blob_is_named_after_stored_content(project, tmp_path, monkeypatch):
+    hash_file = blob_store._hash_file
+
+    def hash_then_write(path):
+        file_hash = hash_file(path)
+        if path.endswith("a.py"):
+            _write(project, "a.py", "written concurrently")
+        return file_hash
+
+    monkeypatch.setattr(blob_store, "_hash_file", hash_then_write)
+
+    blob_store.create_snapshot(
+        "project", "snapshot", project, str(tmp_path / "snapshot"), False
+    )
+
+    for blob_path in _blobs("project"):
+        with open(blob_path, "rb") as f:
+            content_hash = hashlib.sha256(f.read()).hexdigest()
+        blob = os.path.relpath(blob_path, os.path.dirname(os.path.dirname(blob_path)))
+        assert blob.replace(os.sep, "").startswith(content_hash)
+    assert _read(tmp_path / "snapshot", "a.py") == "written concurrently"
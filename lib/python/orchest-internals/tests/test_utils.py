@@ -0,0 +1,31 @@
+import os
+
+import pytest
+
+from _orchest.internals import utils
+
+
+def test_linktree(tmp_path):
+    source = tmp_path / "source"
+    (source / "dir").mkdir(parents=True)
+    (source / "dir" / "file.txt").write_text("content")
+    target = str(tmp_path / "target")
+
+    utils.linktree(str(source), target)
+
+    assert os.path.samefile(source / "dir" / "file.txt", f"{target}/dir/file.txt")
+
+    # Replacing a file in the target leaves the source untouched.
+    os.remove(f"{target}/dir/file.txt")
+    with open(f"{target}/dir/file.txt", "w") as f:
+        f.write("changed")
+    assert (source / "dir" / "file.txt").read_text() == "content"
+
+
+def test_linktree_raises_on_failure(tmp_path):
+    with pytest.raises(OSError):
+        utils.linktree(str(tmp_path / "missing"), str(tmp_path / "target"))
+
+    utils.linktree(
+        str(tmp_path / "missing"), str(tmp_path / "target"), ignore_errors=True
+    )
@@ -7,6 +7,7 @@ CAUTION:
 """
 
 import os
+from typing import Optional
 
 
 class Config:
@@ -59,6 +60,21 @@ class Config:
     # those warnings.
     silence_multiple_data_transfer_calls_warning: bool = False
 
+    # Maximum number of threads used by get_inputs() to concurrently
+    # resolve and retrieve the outputs of the parent steps. Setting it
+    # to 1 retrieves the outputs one after another.
+    get_inputs_max_workers: int = 8
+
+    # Whether to pickle the buffers of objects, e.g. NumPy arrays, to a
+    # separate memory mappable file using pickle protocol 5. Requires
+    # Python 3.8 or higher in both the outputting and receiving step.
+    pickle_out_of_band: bool = True
+
+    # Compression used when outputting pandas and Polars DataFrames,
+    # can be "lz4", "zstd" or None. Uncompressed DataFrames can be
+    # memory mapped by the receiving step.
+    dataframe_compression: Optional[str] = None
+
     @classmethod
     def get_step_data_dir(cls, step_uuid):
         return cls.STEP_DATA_DIR.format(step_uuid=step_uuid)
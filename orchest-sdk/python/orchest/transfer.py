@@ -1,14 +1,32 @@
 """Transfer mechanisms to output data and get data."""
+import contextlib
 import json
+import mmap
 import os
 import pickle
+import struct
+import sys
+import threading
 import warnings
-from collections import defaultdict
+from collections import abc, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from enum import Enum
-from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import pyarrow as pa
+import pyarrow.feather as feather
 
 from orchest import error
 from orchest.config import Config
@@ -24,12 +42,22 @@ class Serialization(Enum):
         * ``ARROW_TABLE``
         * ``ARROW_BATCH``
         * ``PICKLE``
+        * ``PICKLE_OUT_OF_BAND``
+        * ``ARROW_PANDAS``
+        * ``ARROW_POLARS``
 
     """
 
     ARROW_TABLE = 0
     ARROW_BATCH = 1
     PICKLE = 2
+    # Pickle protocol 5 where large buffers, e.g. of NumPy arrays, are
+    # stored in a separate file so they can be memory mapped on read.
+    PICKLE_OUT_OF_BAND = 3
+    # DataFrames stored in the Arrow IPC file format (Feather V2), they
+    # are deserialized to a DataFrame of the same library.
+    ARROW_PANDAS = 4
+    ARROW_POLARS = 5
 
 
 _MULTIPLE_DATA_TRANSFER_CALLS_WARNING_DOCS_REFERENCE = (
@@ -168,11 +196,7 @@ def _interpret_metadata(metadata: str) -> Tuple[str, str, str]:
             pass
 
         # check serialization for correctness
-        if serialization not in [
-            Serialization.ARROW_TABLE.name,
-            Serialization.ARROW_BATCH.name,
-            Serialization.PICKLE.name,
-        ]:
+        if serialization not in Serialization.__members__:
             raise error.InvalidMetaDataError(
                 f"Metadata {metadata} has an "
                 f"invalid serialization ({serialization})."
@@ -185,15 +209,128 @@ def _interpret_metadata(metadata: str) -> Tuple[str, str, str]:
         )
 
 
+def _load_pipeline() -> Pipeline:
+    """Loads the pipeline the current step is part of.
+
+    Raises:
+        PipelineDefinitionNotFoundError: If the pipeline definition file
+            could not be found.
+    """
+    try:
+        with open(Config.PIPELINE_DEFINITION_PATH, "r") as f:
+            pipeline_definition = json.load(f)
+    except FileNotFoundError:
+        raise error.PipelineDefinitionNotFoundError(
+            f"Could not open {Config.PIPELINE_DEFINITION_PATH}."
+        )
+
+    return Pipeline.from_json(pipeline_definition)
+
+
+def _write_head_file(
+    step_data_dir: str, serialization: Serialization, name: str
+) -> None:
+    """Writes the HEAD file that is used to resolve the output."""
+    head_file = os.path.join(step_data_dir, "HEAD")
+    with open(head_file, "w") as f:
+        metadata = [
+            datetime.utcnow().isoformat(timespec="seconds"),
+            serialization.name,
+            name,
+        ]
+        metadata = Config.__METADATA_SEPARATOR__.join(metadata)
+        f.write(metadata)
+
+
+# Alignment (in bytes) of the out-of-band buffers inside the buffers
+# file, which allows zero-copy reconstruction of e.g. NumPy arrays.
+_OUT_OF_BAND_BUFFER_ALIGNMENT = 64
+
+
+class _OutOfBandPickle:
+    """Pickled data of which the buffers are kept out-of-band.
+
+    Attributes:
+        payload: The in-band pickled data.
+        buffers: The out-of-band buffers, in the order they need to be
+            passed to ``pickle.loads``.
+
+    """
+
+    def __init__(self, payload: bytes, buffers: List[memoryview]):
+        self.payload = payload
+        self.buffers = buffers
+
+    @property
+    def size(self) -> int:
+        return len(self.payload) + sum(buf.nbytes for buf in self.buffers)
+
+
+def _pickle_out_of_band(data: Any) -> Optional[_OutOfBandPickle]:
+    """Pickles the data using protocol 5 with out-of-band buffers.
+
+    Returns:
+        The pickled data or ``None`` if protocol 5 is not supported by
+        the running Python version or if the data does not contain any
+        buffers that can be pickled out-of-band.
+
+    Raises:
+        PicklingError: If the data could not be pickled.
+    """
+    if pickle.HIGHEST_PROTOCOL < 5:
+        return None
+
+    pickle_buffers = []
+    payload = pickle.dumps(data, protocol=5, buffer_callback=pickle_buffers.append)
+    if not pickle_buffers:
+        return None
+
+    return _OutOfBandPickle(payload, [buf.raw() for buf in pickle_buffers])
+
+
+def _dataframe_to_arrow(data: Any) -> Optional[Tuple[pa.Table, Serialization]]:
+    """Converts a pandas or Polars DataFrame to a ``pa.Table``.
+
+    Returns:
+        The table and the :class:`Serialization` to use, or ``None`` if
+        `data` is not a DataFrame or could not be converted, e.g.
+        because of columns containing arbitrary Python objects.
+    """
+    # The libraries are only checked for if they are already imported,
+    # in which case the data could be one of their DataFrames.
+    pd = sys.modules.get("pandas")
+    if pd is not None and isinstance(data, pd.DataFrame):
+        try:
+            return pa.Table.from_pandas(data), Serialization.ARROW_PANDAS
+        except (
+            pa.ArrowInvalid,
+            pa.ArrowNotImplementedError,
+            pa.ArrowTypeError,
+            # E.g. in case of duplicate column names.
+            ValueError,
+        ):
+            return None
+
+    pl = sys.modules.get("polars")
+    if pl is not None and isinstance(data, pl.DataFrame):
+        return data.to_arrow(), Serialization.ARROW_POLARS
+
+    return None
+
+
 def _serialize(
     data: Any,
-) -> Tuple[bytes, Serialization]:
+) -> Tuple[Union[pa.Buffer, _OutOfBandPickle], Serialization]:
     """Serializes an object to a ``pa.Buffer``.
 
     The way the object is serialized depends on the nature of the
     object: ``pa.RecordBatch`` and ``pa.Table`` are serialized using
-    ``pyarrow`` functions. All other cases are serialized through the
-    ``pickle`` library.
+    ``pyarrow`` functions. pandas and Polars DataFrames are converted
+    to Arrow and serialized in the Arrow IPC file format (Feather), if
+    possible. All other cases are serialized through the
+    ``pickle`` library. Objects that support pickle protocol 5, e.g.
+    NumPy arrays, have their buffers pickled out-of-band, in which case
+    an :class:`_OutOfBandPickle` is returned instead of a buffer.
 
     Args:
         data: The object/data to be serialized.
@@ -215,7 +352,25 @@ def _serialize(
         otherwise an exception will be raised."
 
     """
-    if isinstance(data, (pa.RecordBatch, pa.Table)):
+    dataframe = _dataframe_to_arrow(data)
+    if dataframe is not None:
+        table, serialization = dataframe
+
+        output_buffer = pa.BufferOutputStream()
+        try:
+            feather.write_feather(
+                table,
+                output_buffer,
+                compression=Config.dataframe_compression or "uncompressed",
+            )
+        except pa.ArrowSerializationError:
+            raise error.SerializationError(
+                f"Could not serialize data of type {type(data)}."
+            )
+
+        serialized = output_buffer.getvalue()
+
+    elif isinstance(data, (pa.RecordBatch, pa.Table)):
         # Use the intended pyarrow functionalities when possible.
         if isinstance(data, pa.Table):
             serialization = Serialization.ARROW_TABLE
@@ -236,25 +391,87 @@ def _serialize(
 
     else:
         # All other cases use the pickle library.
-        serialization = Serialization.PICKLE
-
-        # Use the best protocol possible, for reference see:
-        # https://docs.python.org/3/library/pickle.html#pickle-protocols
         try:
-            serialized = pickle.dumps(data, pickle.DEFAULT_PROTOCOL)
+            # Large buffers, e.g. of NumPy arrays and pandas
+            # DataFrames, are kept out-of-band to avoid copying them.
+            serialized = None
+            if Config.pickle_out_of_band:
+                serialized = _pickle_out_of_band(data)
+
+            if serialized is not None:
+                serialization = Serialization.PICKLE_OUT_OF_BAND
+            else:
+                serialization = Serialization.PICKLE
+
+                # Use the best protocol possible, for reference see:
+                # https://docs.python.org/3/library/pickle.html#pickle-protocols
+                serialized = pickle.dumps(data, pickle.DEFAULT_PROTOCOL)
+
+                # NOTE: zero-copy view on the bytes.
+                serialized = pa.py_buffer(serialized)
         except pickle.PicklingError:
             raise error.SerializationError(
                 f"Could not pickle data of type {type(data)}."
             )
 
-        # NOTE: zero-copy view on the bytes.
-        serialized = pa.py_buffer(serialized)
-
     return serialized, serialization
 
 
+def _output_out_of_band_pickle_to_disk(obj: _OutOfBandPickle, file_path: str) -> None:
+    """Outputs an out-of-band pickle to disk.
+
+    The buffers are written, aligned, to a separate ``.buffers`` file.
+    The data file contains the layout of the buffers inside said file,
+    followed by the in-band pickled data.
+    """
+    layout = []
+    with open(f"{file_path}.buffers", "wb") as f:
+        offset = 0
+        for buf in obj.buffers:
+            padding = -offset % _OUT_OF_BAND_BUFFER_ALIGNMENT
+            f.write(b"\0" * padding)
+            offset += padding
+
+            f.write(buf)
+            layout.extend([offset, buf.nbytes])
+            offset += buf.nbytes
+
+    with open(file_path, "wb") as f:
+        f.write(struct.pack(f"<Q{len(layout)}Q", len(obj.buffers), *layout))
+        f.write(obj.payload)
+
+
+def _deserialize_out_of_band_pickle(file_path: str) -> Any:
+    """Loads an out-of-band pickle from disk.
+
+    The buffers file is memory mapped copy-on-write, thus buffers are
+    not copied unless the deserialized objects are written to.
+    """
+    with open(file_path, "rb") as f:
+        (n_buffers,) = struct.unpack("<Q", f.read(8))
+        layout = struct.unpack(f"<{2 * n_buffers}Q", f.read(16 * n_buffers))
+        payload = f.read()
+
+    buffers_file_path = f"{file_path}.buffers"
+    if os.path.getsize(buffers_file_path) == 0:
+        # Empty files cannot be memory mapped.
+        return pickle.loads(payload, buffers=[bytearray() for _ in range(n_buffers)])
+
+    with open(buffers_file_path, "rb") as f:
+        # NOTE: the mapping stays alive, also after closing the file,
+        # for as long as objects reference its buffers.
+        view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY))
+
+    buffers = [
+        view[offset : offset + size] for offset, size in zip(layout[::2], layout[1::2])
+    ]
+    return pickle.loads(payload, buffers=buffers)
+
+
 def _output_to_disk(
-    obj: pa.Buffer, full_path: str, serialization: Serialization
+    obj: Union[pa.Buffer, _OutOfBandPickle],
+    full_path: str,
+    serialization: Serialization,
 ) -> None:
     """Outputs a serialized object to disk to the specified path.
 
@@ -267,7 +484,9 @@ def _output_to_disk(
     Raises:
         ValueError: If the specified serialization is not valid.
     """
-    if isinstance(serialization, Serialization):
+    if serialization == Serialization.PICKLE_OUT_OF_BAND:
+        _output_out_of_band_pickle_to_disk(obj, f"{full_path}.{serialization.name}")
+    elif isinstance(serialization, Serialization):
         with pa.OSFile(f"{full_path}.{serialization.name}", "wb") as f:
             f.write(obj)
     else:
@@ -328,15 +547,7 @@ def output_to_disk(
     if name is None:
         name = Config._RESERVED_UNNAMED_OUTPUTS_STR
 
-    try:
-        with open(Config.PIPELINE_DEFINITION_PATH, "r") as f:
-            pipeline_definition = json.load(f)
-    except FileNotFoundError:
-        raise error.PipelineDefinitionNotFoundError(
-            f"Could not open {Config.PIPELINE_DEFINITION_PATH}."
-        )
-
-    pipeline = Pipeline.from_json(pipeline_definition)
+    pipeline = _load_pipeline()
 
     try:
         step_uuid = get_step_uuid(pipeline)
@@ -353,15 +564,7 @@ def output_to_disk(
     os.makedirs(step_data_dir, exist_ok=True)
 
     # The HEAD file serves to resolve the transfer method.
-    head_file = os.path.join(step_data_dir, "HEAD")
-    with open(head_file, "w") as f:
-        metadata = [
-            datetime.utcnow().isoformat(timespec="seconds"),
-            serialization.name,
-            name,
-        ]
-        metadata = Config.__METADATA_SEPARATOR__.join(metadata)
-        f.write(metadata)
+    _write_head_file(step_data_dir, serialization, name)
 
     # Full path to write the actual data to.
     full_path = os.path.join(step_data_dir, step_uuid)
@@ -402,6 +605,14 @@ def _deserialize_output_disk(full_path: str, serialization: str) -> Any:
         # normal python file.
         with open(file_path, "rb") as input_file:
             return pickle.load(input_file)
+    elif serialization == Serialization.PICKLE_OUT_OF_BAND.name:
+        return _deserialize_out_of_band_pickle(file_path)
+    elif serialization == Serialization.ARROW_PANDAS.name:
+        return feather.read_table(file_path, memory_map=True).to_pandas()
+    elif serialization == Serialization.ARROW_POLARS.name:
+        import polars
+
+        return polars.from_arrow(feather.read_table(file_path, memory_map=True))
     else:
         raise ValueError(
             f"The specified serialization of '{serialization}' is unsupported."
@@ -628,12 +839,177 @@ def _resolve(
     )
 
 
+def _map_concurrently(
+    func: Callable[[Any], Any], items: Iterable[Any], max_workers: int
+) -> List[Any]:
+    """Applies `func` to every item using a pool of threads.
+
+    The returned results are in the same order as the given `items`.
+    In case any call raised an exception, the exception of the first
+    failing item (in order) is re-raised.
+
+    Args:
+        func: Function to call on every item.
+        items: Items to apply `func` to.
+        max_workers: Maximum number of threads to use. If ``1`` (or
+            less), then no threads are used at all.
+
+    """
+    items = list(items)
+    if max_workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(func, items))
+
+
+def _print_retrieval_message(parent, incoming_step_data: Any) -> None:
+    parent_title = parent.properties["title"]
+    if incoming_step_data is None:
+        print(f'Failed to retrieve input from step: "{parent_title}"')
+    else:
+        print(f'Retrieved input from step: "{parent_title}"')
+
+
+def _get_incoming_step_data(
+    get_output_method: Callable,
+    args: Sequence[Any],
+    kwargs: Dict[str, Any],
+    ignore_failure: bool,
+) -> Any:
+    # Either raise an error on failure of getting output or continue
+    # with other steps.
+    try:
+        return get_output_method(*args, **kwargs)
+    except error.OutputNotFoundError as e:
+        if not ignore_failure:
+            raise error.OutputNotFoundError(e)
+
+        return None
+
+
+class _LazyInput:
+    """Handle to the output of an incoming step.
+
+    The output is only retrieved (and deserialized) on the first call
+    to :meth:`load`, subsequent calls return the same object.
+    """
+
+    def __init__(
+        self,
+        parent,
+        get_output_method: Callable,
+        args: Sequence[Any],
+        kwargs: Dict[str, Any],
+        ignore_failure: bool,
+        verbose: bool,
+    ):
+        self._parent = parent
+        self._get_output_method = get_output_method
+        self._args = args
+        self._kwargs = kwargs
+        self._ignore_failure = ignore_failure
+        self._verbose = verbose
+
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._data = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def load(self) -> Any:
+        with self._lock:
+            if not self._loaded:
+                self._data = _get_incoming_step_data(
+                    self._get_output_method,
+                    self._args,
+                    self._kwargs,
+                    self._ignore_failure,
+                )
+                self._loaded = True
+
+                if self._verbose:
+                    _print_retrieval_message(self._parent, self._data)
+
+        return self._data
+
+
+class _LazyUnnamedInputs(abc.Sequence):
+    """Ordered unnamed inputs that are loaded on access."""
+
+    def __init__(self, inputs: List[_LazyInput]):
+        self._inputs = inputs
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [inp.load() for inp in self._inputs[index]]
+        return self._inputs[index].load()
+
+    def __len__(self) -> int:
+        return len(self._inputs)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} of {len(self)} inputs>"
+
+
+class LazyInputs(abc.Mapping):
+    """Read-only mapping of inputs that are loaded on first access.
+
+    Returned by :meth:`get_inputs` when called with ``lazy=True``. It
+    has the same keys as the dictionary returned in the eager case, but
+    the data of an incoming step is only deserialized once its key is
+    accessed. Outputs stored through Arrow are memory-mapped, pickled
+    outputs are unpickled on access.
+
+    Example:
+        >>> inputs = get_inputs(lazy=True)
+        >>> # Only the data of the "config" input is loaded.
+        >>> config = inputs["config"]
+        >>> # Unnamed inputs are loaded one by one on indexing.
+        >>> first = inputs["unnamed"][0]
+
+    """
+
+    def __init__(self, named: Dict[str, _LazyInput], unnamed: List[_LazyInput]):
+        self._named = named
+        self._unnamed = _LazyUnnamedInputs(unnamed)
+
+    def __getitem__(self, name: str) -> Any:
+        if name == Config._RESERVED_UNNAMED_OUTPUTS_STR:
+            return self._unnamed
+        return self._named[name].load()
+
+    def __iter__(self):
+        yield Config._RESERVED_UNNAMED_OUTPUTS_STR
+        yield from self._named
+
+    def __len__(self) -> int:
+        return len(self._named) + 1
+
+    def is_loaded(self, name: str) -> bool:
+        """Returns whether the data of the given input was loaded."""
+        if name == Config._RESERVED_UNNAMED_OUTPUTS_STR:
+            return all(inp.loaded for inp in self._unnamed._inputs)
+        return self._named[name].loaded
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} with keys {list(self)}>"
+
+
 def get_inputs(
     ignore_failure: bool = False,
     verbose: bool = False,
-) -> Dict[str, Any]:
+    max_workers: Optional[int] = None,
+    lazy: bool = False,
+) -> Union[Dict[str, Any], LazyInputs]:
     """Gets all data sent from incoming steps.
 
+    The outputs of the incoming steps are resolved and retrieved
+    concurrently, so that the time it takes to get all inputs is
+    roughly that of the slowest incoming step.
+
     Warning:
         Only call :meth:`get_inputs` once! When auto eviction is
         configured data might no longer be available. Either cache the
@@ -648,6 +1024,15 @@ def get_inputs(
             :exc:`OutputNotFoundError`
         verbose: If ``True`` print all the steps from which the current
             step has retrieved data.
+        max_workers: Maximum number of incoming steps to retrieve data
+            from concurrently. Defaults to
+            ``Config.get_inputs_max_workers``. Pass ``1`` to retrieve
+            the data of the incoming steps one after another.
+        lazy: If ``True`` only check for the existence (and name
+            collisions) of the outputs of the incoming steps and return
+            a :class:`LazyInputs` mapping instead, which retrieves the
+            data of an incoming step when it is first accessed. Useful
+            when a step does not use all its inputs.
 
     Returns:
         Dictionary with input data for this step. We differentiate
@@ -677,6 +1062,9 @@ def get_inputs(
                 "named_2" : [1, 2, 3]
             }
 
+        In case of ``lazy=True`` a :class:`LazyInputs` mapping with the
+        same keys is returned.
+
     Raises:
         InputNameCollisionError: Multiple steps have outputted data with
             the same name.
@@ -691,26 +1079,16 @@ def get_inputs(
         _print_warning_message(_GET_INPUTS_CALLED_TWICE_WARNING)
     _get_inputs_called = True
 
-    try:
-        with open(Config.PIPELINE_DEFINITION_PATH, "r") as f:
-            pipeline_definition = json.load(f)
-    except FileNotFoundError:
-        raise error.PipelineDefinitionNotFoundError(
-            f"Could not open {Config.PIPELINE_DEFINITION_PATH}."
-        )
+    if max_workers is None:
+        max_workers = Config.get_inputs_max_workers
 
-    pipeline = Pipeline.from_json(pipeline_definition)
+    pipeline = _load_pipeline()
     try:
         step_uuid = get_step_uuid(pipeline)
     except error.StepUUIDResolveError:
         raise error.StepUUIDResolveError("Failed to determine from where to get data.")
 
-    collisions_dict = defaultdict(list)
-    get_output_methods = []
-
-    # Check for collisions before retrieving any data.
-    for parent in pipeline.get_step_by_uuid(step_uuid).parents:
-
+    def resolve_parent(parent):
         # For each parent get what function to use to retrieve its
         # output data and metadata related to said data.
         parent_uuid = parent.properties["uuid"]
@@ -727,10 +1105,17 @@ def get_inputs(
             )
             raise error.OutputNotFoundError(msg)
 
-        # Maintain the output methods in order, but wait with calling
-        # them so that we can first check for collisions.
-        get_output_methods.append((parent, get_output_method, args, kwargs, metadata))
+        return parent, get_output_method, args, kwargs, metadata
+
+    # Maintain the output methods in order, but wait with calling them
+    # so that we can first check for collisions.
+    get_output_methods = _map_concurrently(
+        resolve_parent, pipeline.get_step_by_uuid(step_uuid).parents, max_workers
+    )
 
+    # Check for collisions before retrieving any data.
+    collisions_dict = defaultdict(list)
+    for parent, _, _, _, metadata in get_output_methods:
         if metadata["name"] != Config._RESERVED_UNNAMED_OUTPUTS_STR:
             collisions_dict[metadata["name"]].append(parent.properties["title"])
 
@@ -747,32 +1132,37 @@ def get_inputs(
             f"Name collisions between input data coming from different steps: {msg}"
         )
 
-    # TODO: maybe instead of for loop we could first get the receive
-    #       method and then do batch receive. For example memory allows
-    #       to do get_buffers which operates in batch.
+    if lazy:
+        named_inputs = {}
+        unnamed_inputs = []
+        for parent, get_output_method, args, kwargs, metadata in get_output_methods:
+            lazy_input = _LazyInput(
+                parent, get_output_method, args, kwargs, ignore_failure, verbose
+            )
+            if metadata["name"] == Config._RESERVED_UNNAMED_OUTPUTS_STR:
+                unnamed_inputs.append(lazy_input)
+            else:
+                named_inputs[metadata["name"]] = lazy_input
+        return LazyInputs(named_inputs, unnamed_inputs)
+
+    def get_parent_output(get_output_method_info):
+        _, get_output_method, args, kwargs, _ = get_output_method_info
+        return _get_incoming_step_data(get_output_method, args, kwargs, ignore_failure)
+
+    incoming_steps_data = _map_concurrently(
+        get_parent_output, get_output_methods, max_workers
+    )
+
     # NOTE: the order in which the `parents` list is traversed is
     # indirectly set in the UI. The order is important since it
     # determines the order in which unnamed inputs are received in
     # the next step.
     data = {Config._RESERVED_UNNAMED_OUTPUTS_STR: []}  # type: Dict[str, Any]
-    for parent, get_output_method, args, kwargs, metadata in get_output_methods:
-
-        # Either raise an error on failure of getting output or
-        # continue with other steps.
-        try:
-            incoming_step_data = get_output_method(*args, **kwargs)
-        except error.OutputNotFoundError as e:
-            if not ignore_failure:
-                raise error.OutputNotFoundError(e)
-
-            incoming_step_data = None
-
+    for (parent, _, _, _, metadata), incoming_step_data in zip(
+        get_output_methods, incoming_steps_data
+    ):
         if verbose:
-            parent_title = parent.properties["title"]
-            if incoming_step_data is None:
-                print(f'Failed to retrieve input from step: "{parent_title}"')
-            else:
-                print(f'Retrieved input from step: "{parent_title}"')
+            _print_retrieval_message(parent, incoming_step_data)
 
         # Populate the return dictionary, where nameless data gets
         # appended to a list and named data becomes a (name, data) pair.
@@ -830,6 +1220,194 @@ def output(
     )
 
 
+@contextlib.contextmanager
+def output_stream(
+    schema: pa.Schema,
+    name: Optional[str],
+) -> Iterator[pa.RecordBatchStreamWriter]:
+    """Outputs Arrow data in chunks to be retrieved by the next step.
+
+    Yields a ``pa.RecordBatchStreamWriter`` that writes record batches
+    straight to disk, without materializing the full dataset in memory.
+    The output is only made available to the next step once the context
+    is exited without errors. The data is retrieved as a ``pa.Table``
+    through :meth:`get_inputs`, or batch by batch through
+    :meth:`get_input_batches`.
+
+    Note:
+        Just like :meth:`output`, using :meth:`output_stream` will
+        overwrite any previously outputted data of the step.
+
+    Args:
+        schema: The schema of the record batches that will be written.
+        name: Name of the output data. As a string, it becomes the name
+            of the data, when ``None``, the data is considered nameless.
+            This affects the way the data can be later retrieved using
+            :func:`get_inputs`.
+
+    Raises:
+        DataInvalidNameError: The name of the output data is invalid,
+            e.g because it is a reserved name (``"unnamed"``) or because
+            it contains a reserved substring.
+        PipelineDefinitionNotFoundError: If the pipeline definition file
+            could not be found.
+        StepUUIDResolveError: The step's UUID cannot be resolved and
+            thus it cannot determine where to output data to.
+
+    Example:
+        >>> with output_stream(schema, name="my_data") as writer:
+        ...     for batch in produce_batches():
+        ...         writer.write_batch(batch)
+    """
+    try:
+        _check_data_name_validity(name)
+    except (ValueError, TypeError) as e:
+        raise error.DataInvalidNameError(e)
+
+    _warn_multiple_data_output_if_necessary(name)
+
+    if name is None:
+        name = Config._RESERVED_UNNAMED_OUTPUTS_STR
+
+    pipeline = _load_pipeline()
+
+    try:
+        step_uuid = get_step_uuid(pipeline)
+    except error.StepUUIDResolveError:
+        raise error.StepUUIDResolveError("Failed to determine where to output data to.")
+
+    step_data_dir = Config.get_step_data_dir(step_uuid)
+    os.makedirs(step_data_dir, exist_ok=True)
+
+    # Batches are read back as a table, see `_deserialize_output_disk`.
+    serialization = Serialization.ARROW_TABLE
+    file_path = os.path.join(step_data_dir, f"{step_uuid}.{serialization.name}")
+    # The stream is written to a temporary file since a previously
+    # written HEAD file could resolve to `file_path` while the stream
+    # is being written.
+    tmp_file_path = os.path.join(
+        step_data_dir, f".{step_uuid}.{serialization.name}.tmp"
+    )
+    try:
+        with pa.OSFile(tmp_file_path, "wb") as sink:
+            writer = pa.RecordBatchStreamWriter(sink, schema)
+            try:
+                yield writer
+            finally:
+                writer.close()
+    except BaseException:
+        if os.path.exists(tmp_file_path):
+            os.remove(tmp_file_path)
+        raise
+
+    # Only make the output available, by renaming the file and writing
+    # the HEAD file, once all the data is on disk. The rename is atomic
+    # so that a previous output that is being read is never changed.
+    os.replace(tmp_file_path, file_path)
+    _write_head_file(step_data_dir, serialization, name)
+
+
+def _iter_batches_disk(step_uuid: str, serialization: str) -> Iterator[pa.RecordBatch]:
+    """Yields the record batches of an Arrow output on disk.
+
+    Raises:
+        DiskOutputNotFoundError: If output from `step_uuid` cannot be
+            found.
+        DeserializationError: If the data could not be deserialized.
+    """
+    step_data_dir = Config.get_step_data_dir(step_uuid)
+    file_path = os.path.join(step_data_dir, f"{step_uuid}.{serialization}")
+
+    try:
+        input_file = pa.memory_map(file_path, "rb")
+    except FileNotFoundError:
+        raise error.DiskOutputNotFoundError(
+            f'Output from incoming step "{step_uuid}" cannot be found. '
+            "Try rerunning it."
+        )
+
+    with input_file:
+        try:
+            stream = pa.ipc.open_stream(input_file)
+        except IOError:
+            raise error.DeserializationError(
+                f'Output from incoming step "{step_uuid}" ({file_path}) '
+                "could not be deserialized."
+            )
+
+        # Batches are zero-copy views on the memory mapped file.
+        for batch in stream:
+            yield batch
+
+
+def get_input_batches(name: str) -> Iterator[pa.RecordBatch]:
+    """Gets the data of a named input batch by batch.
+
+    Counterpart of :meth:`output_stream`, but works for any data that
+    was outputted through Arrow, e.g. a ``pa.Table``. The batches are
+    read from a memory mapped file, so that the full dataset is never
+    materialized in memory.
+
+    Args:
+        name: The name with which the incoming step outputted the data.
+
+    Returns:
+        An iterator over the ``pa.RecordBatch`` objects of the data.
+
+    Raises:
+        DeserializationError: If the data was not outputted through
+            Arrow and can thus not be read batch by batch.
+        InputNameCollisionError: Multiple steps have outputted data with
+            the given name.
+        OutputNotFoundError: If no incoming step has outputted data with
+            the given name.
+        StepUUIDResolveError: The step's UUID cannot be resolved and
+            thus it cannot determine what inputs to get.
+
+    Example:
+        >>> for batch in get_input_batches("my_data"):
+        ...     process(batch)
+    """
+    pipeline = _load_pipeline()
+    try:
+        step_uuid = get_step_uuid(pipeline)
+    except error.StepUUIDResolveError:
+        raise error.StepUUIDResolveError("Failed to determine from where to get data.")
+
+    matches = []
+    for parent in pipeline.get_step_by_uuid(step_uuid).parents:
+        try:
+            *_, metadata = _resolve(parent.properties["uuid"], consumer=step_uuid)
+        except error.OutputNotFoundError:
+            continue
+        if metadata["name"] == name:
+            matches.append((parent, metadata))
+
+    if not matches:
+        raise error.OutputNotFoundError(
+            f'No incoming step has outputted data with name "{name}".'
+        )
+    elif len(matches) > 1:
+        step_names = sorted(parent.properties["title"] for parent, _ in matches)
+        raise error.InputNameCollisionError(
+            "Name collisions between input data coming from different steps: "
+            f"\n{name}: {step_names}"
+        )
+
+    parent, metadata = matches[0]
+    serialization = metadata["serialization"]
+    if serialization not in [
+        Serialization.ARROW_TABLE.name,
+        Serialization.ARROW_BATCH.name,
+    ]:
+        raise error.DeserializationError(
+            f'Input "{name}" was serialized as {serialization} and cannot be '
+            "read batch by batch."
+        )
+
+    return _iter_batches_disk(parent.properties["uuid"], serialization)
+
+
 # TODO: Once we are set on the API we could specify __all__. For now we
 #       will stick with the leading _underscore convention to indicate
 #       private methods.
@@ -1,6 +1,7 @@
 """
 uuid-1, uuid-3 --> uuid-2
 """
+import os
 import time
 from unittest.mock import patch
 
@@ -393,3 +394,241 @@ def test_output_no_memory_store(mock_get_step_uuid):
     input_data = transfer.get_inputs()
     input_data = input_data[orchest.Config._RESERVED_UNNAMED_OUTPUTS_STR][0]
     assert (input_data == data_1).all()
+
+
+@pytest.mark.parametrize("max_workers", [1, 2, 8], ids=["sequential", "2", "8"])
+@patch("orchest.transfer.get_step_uuid")
+@patch("orchest.Config.STEP_DATA_DIR", "tests/userdir/.data/{step_uuid}")
+def test_get_inputs_concurrently(mock_get_step_uuid, max_workers):
+    """Test that concurrent retrieval respects the receive order."""
+    orchest.Config.PIPELINE_DEFINITION_PATH = "tests/userdir/pipeline-order.json"
+
+    # Do as if we are uuid-3
+    data_3 = generate_data(KILOBYTE)
+    mock_get_step_uuid.return_value = "uuid-3______________"
+    transfer.output(data_3, name=None)
+
+    # Do as if we are uuid-1
+    data_1 = generate_pandas_df(20)
+    mock_get_step_uuid.return_value = "uuid-1______________"
+    transfer.output(data_1, name="output1")
+
+    # Do as if we are uuid-2
+    mock_get_step_uuid.return_value = "uuid-2______________"
+    input_data = transfer.get_inputs(max_workers=max_workers)
+    assert list(input_data.keys()) == [
+        orchest.Config._RESERVED_UNNAMED_OUTPUTS_STR,
+        "output1",
+    ]
+    assert input_data["output1"].equals(data_1)
+    unnamed = input_data[orchest.Config._RESERVED_UNNAMED_OUTPUTS_STR]
+    assert len(unnamed) == 1
+    assert (unnamed[0] == data_3).all()
+
+
+@patch("orchest.transfer.get_step_uuid")
+@patch("orchest.Config.STEP_DATA_DIR", "tests/userdir/.data/{step_uuid}")
+def test_get_inputs_lazy(mock_get_step_uuid):
+    orchest.Config.PIPELINE_DEFINITION_PATH = "tests/userdir/pipeline-order.json"
+
+    # Do as if we are uuid-3
+    data_3 = get_test_table()
+    mock_get_step_uuid.return_value = "uuid-3______________"
+    transfer.output(data_3, name=None)
+
+    # Do as if we are uuid-1
+    data_1 = generate_data(KILOBYTE)
+    mock_get_step_uuid.return_value = "uuid-1______________"
+    transfer.output(data_1, name="output1")
+
+    # Do as if we are uuid-2
+    mock_get_step_uuid.return_value = "uuid-2______________"
+    input_data = transfer.get_inputs(lazy=True)
+    assert isinstance(input_data, transfer.LazyInputs)
+    assert list(input_data) == [orchest.Config._RESERVED_UNNAMED_OUTPUTS_STR, "output1"]
+    assert not input_data.is_loaded("output1")
+    assert not input_data.is_loaded(orchest.Config._RESERVED_UNNAMED_OUTPUTS_STR)
+
+    assert (input_data["output1"] == data_1).all()
+    assert input_data.is_loaded("output1")
+    assert not input_data.is_loaded(orchest.Config._RESERVED_UNNAMED_OUTPUTS_STR)
+
+    unnamed = input_data[orchest.Config._RESERVED_UNNAMED_OUTPUTS_STR]
+    assert len(unnamed) == 1
+    assert unnamed[0].equals(data_3)
+    assert input_data.is_loaded(orchest.Config._RESERVED_UNNAMED_OUTPUTS_STR)
+
+
+@patch("orchest.transfer.get_step_uuid")
+@patch("orchest.Config.STEP_DATA_DIR", "tests/userdir/.data/{step_uuid}")
+def test_get_inputs_lazy_name_collision(mock_get_step_uuid):
+    orchest.Config.PIPELINE_DEFINITION_PATH = "tests/userdir/pipeline-order.json"
+
+    for step_uuid in ["uuid-1______________", "uuid-3______________"]:
+        mock_get_step_uuid.return_value = step_uuid
+        transfer.output(generate_data(KILOBYTE), name="same-name")
+
+    # Collisions are detected before any data is accessed.
+    mock_get_step_uuid.return_value = "uuid-2______________"
+    with pytest.raises(orchest.error.InputNameCollisionError):
+        transfer.get_inputs(lazy=True)
+
+
+@patch("orchest.transfer.get_step_uuid")
+@patch("orchest.Config.STEP_DATA_DIR", "tests/userdir/.data/{step_uuid}")
+def test_output_stream(mock_get_step_uuid):
+    orchest.Config.PIPELINE_DEFINITION_PATH = "tests/userdir/pipeline-basic.json"
+    batch = get_test_record_batch()
+
+    # Do as if we are uuid-1
+    mock_get_step_uuid.return_value = "uuid-1______________"
+    with transfer.output_stream(batch.schema, name="stream") as writer:
+        for _ in range(3):
+            writer.write_batch(batch)
+
+    # Do as if we are uuid-2
+    mock_get_step_uuid.return_value = "uuid-2______________"
+    batches = list(transfer.get_input_batches("stream"))
+    assert len(batches) == 3
+    assert all(b.equals(batch) for b in batches)
+
+    input_data = transfer.get_inputs()
+    assert input_data["stream"].equals(pa.Table.from_batches([batch] * 3))
+
+    with pytest.raises(orchest.error.OutputNotFoundError):
+        transfer.get_input_batches("other-name")
+
+
+@patch("orchest.transfer.get_step_uuid")
+@patch("orchest.Config.STEP_DATA_DIR", "tests/userdir/.data/{step_uuid}")
+def test_output_stream_failure(mock_get_step_uuid):
+    orchest.Config.PIPELINE_DEFINITION_PATH = "tests/userdir/pipeline-basic.json"
+    batch = get_test_record_batch()
+
+    # Do as if we are uuid-1
+    mock_get_step_uuid.return_value = "uuid-1______________"
+    transfer.output(generate_data(KILOBYTE), name="stream")
+
+    with pytest.raises(RuntimeError):
+        with transfer.output_stream(batch.schema, name="stream") as writer:
+            writer.write_batch(batch)
+            raise RuntimeError()
+
+    # The previous output is still the one being resolved.
+    mock_get_step_uuid.return_value = "uuid-2______________"
+    with pytest.raises(orchest.error.DeserializationError):
+        transfer.get_input_batches("stream")
+
+
+@patch("orchest.transfer.get_step_uuid")
+@patch("orchest.Config.STEP_DATA_DIR", "tests/userdir/.data/{step_uuid}")
+def test_output_stream_failure_keeps_previous_stream(mock_get_step_uuid):
+    orchest.Config.PIPELINE_DEFINITION_PATH = "tests/userdir/pipeline-basic.json"
+    batch = get_test_record_batch()
+
+    # Do as if we are uuid-1
+    mock_get_step_uuid.return_value = "uuid-1______________"
+    with transfer.output_stream(batch.schema, name="stream") as writer:
+        writer.write_batch(batch)
+
+    with pytest.raises(RuntimeError):
+        with transfer.output_stream(batch.schema, name="stream") as writer:
+            for _ in range(3):
+                writer.write_batch(batch)
+            raise RuntimeError()
+
+    # The previous stream is untouched and still the one being resolved.
+    mock_get_step_uuid.return_value = "uuid-2______________"
+    batches = list(transfer.get_input_batches("stream"))
+    assert len(batches) == 1
+    assert batches[0].equals(batch)
+    assert not os.path.exists(
+        "tests/userdir/.data/uuid-1______________/"
+        ".uuid-1______________.ARROW_TABLE.tmp"
+    )
+
+
+@pytest.mark.parametrize(
+    "data_1",
+    [
+        generate_data(KILOBYTE),
+        np.asfortranarray(np.random.rand(10, 5, 2)),
+        np.array([], dtype="float64"),
+        generate_pandas_df(20),
+        {"a": np.random.rand(3), "b": [np.arange(5), "string"]},
+    ],
+    ids=["basic", "fortran-ndarray", "empty", "pandas", "nested"],
+)
+@patch("orchest.transfer.get_step_uuid")
+@patch("orchest.Config.STEP_DATA_DIR", "tests/userdir/.data/{step_uuid}")
+def test_pickle_out_of_band(mock_get_step_uuid, data_1):
+    orchest.Config.PIPELINE_DEFINITION_PATH = "tests/userdir/pipeline-basic.json"
+
+    _, serialization = transfer._serialize(data_1)
+    assert serialization == transfer.Serialization.PICKLE_OUT_OF_BAND
+
+    # Do as if we are uuid-1
+    mock_get_step_uuid.return_value = "uuid-1______________"
+    transfer.output(data_1, name=None)
+
+    # Do as if we are uuid-2
+    mock_get_step_uuid.return_value = "uuid-2______________"
+    input_data = transfer.get_inputs()
+    input_data = input_data[orchest.Config._RESERVED_UNNAMED_OUTPUTS_STR][0]
+
+    if isinstance(data_1, pd.DataFrame):
+        assert input_data.equals(data_1)
+    elif isinstance(data_1, dict):
+        assert (input_data["a"] == data_1["a"]).all()
+        assert (input_data["b"][0] == data_1["b"][0]).all()
+        assert input_data["b"][1] == data_1["b"][1]
+    else:
+        assert (input_data == data_1).all()
+        # The array is backed by a copy-on-write memory map.
+        input_data[...] = 0
+
+
+@pytest.mark.parametrize("compression", [None, "lz4", "zstd"])
+@patch("orchest.transfer.get_step_uuid")
+@patch("orchest.Config.STEP_DATA_DIR", "tests/userdir/.data/{step_uuid}")
+def test_pandas_arrow(mock_get_step_uuid, compression):
+    orchest.Config.PIPELINE_DEFINITION_PATH = "tests/userdir/pipeline-basic.json"
+
+    # Columns with arbitrary Python objects can't be converted to Arrow.
+    data_1 = generate_pandas_df(20).drop(columns=["C10"])
+    _, serialization = transfer._serialize(data_1)
+    assert serialization == transfer.Serialization.ARROW_PANDAS
+
+    # Do as if we are uuid-1
+    mock_get_step_uuid.return_value = "uuid-1______________"
+    with patch("orchest.Config.dataframe_compression", compression):
+        transfer.output(data_1, name=None)
+
+    # Do as if we are uuid-2
+    mock_get_step_uuid.return_value = "uuid-2______________"
+    input_data = transfer.get_inputs()
+    input_data = input_data[orchest.Config._RESERVED_UNNAMED_OUTPUTS_STR][0]
+    assert isinstance(input_data, pd.DataFrame)
+    assert input_data.equals(data_1)
+
+
+@patch("orchest.transfer.get_step_uuid")
+@patch("orchest.Config.STEP_DATA_DIR", "tests/userdir/.data/{step_uuid}")
+def test_polars_arrow(mock_get_step_uuid):
+    pl = pytest.importorskip("polars")
+    orchest.Config.PIPELINE_DEFINITION_PATH = "tests/userdir/pipeline-basic.json"
+
+    data_1 = pl.DataFrame({"f0": [1, 2, 3], "f1": ["foo", None, "baz"]})
+    _, serialization = transfer._serialize(data_1)
+    assert serialization == transfer.Serialization.ARROW_POLARS
+
+    # Do as if we are uuid-1
+    mock_get_step_uuid.return_value = "uuid-1______________"
+    transfer.output(data_1, name=None)
+
+    # Do as if we are uuid-2
+    mock_get_step_uuid.return_value = "uuid-2______________"
+    input_data = transfer.get_inputs()
+    input_data = input_data[orchest.Config._RESERVED_UNNAMED_OUTPUTS_STR][0]
+    assert isinstance(input_data, pl.DataFrame)
+    assert input_data.equals(data_1)
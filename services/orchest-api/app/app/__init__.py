@@ -206,6 +206,7 @@ def create_required_directories() -> None:
         _config.USERDIR_ENV_IMG_BUILDS,
         _config.USERDIR_JUPYTER_IMG_BUILDS,
         _config.USERDIR_JUPYTERLAB,
+        _config.USERDIR_STEP_OUTPUT_CACHE,
         os.path.join(_config.USERDIR_JUPYTERLAB, "user-settings"),
         os.path.join(_config.USERDIR_JUPYTERLAB, "lab"),
     ]:
@@ -1,3 +1,4 @@
+import os
 import uuid
 from datetime import datetime
 from typing import Optional
@@ -8,10 +9,11 @@ from flask_restx import Namespace, Resource
 from sqlalchemy import desc, func, or_
 
 import app.models as models
+from _orchest.internals import config as _config
 from _orchest.internals.two_phase_executor import TwoPhaseExecutor, TwoPhaseFunction
 from app import schema
 from app.connections import db
-from app.core import events
+from app.core import environment_image_builds, events
 from app.utils import get_logger, update_status_db, upsert_cluster_node
 
 api = Namespace("environment-builds", description="Managing environment builds")
@@ -64,34 +66,47 @@ class EnvironmentImageBuildList(Resource):
         for that environment.  This implies that only an environment
         build can be active (queued or actually started) for a given
         environment.
+
+        A request with `skip_if_unchanged` doesn't produce a build if
+        the latest build of the environment succeeded and its image has
+        been built from the same environment definition, i.e. base
+        image, setup script and files in the build context, i.e. the
+        files the setup script depends on or the entire project. The
+        latest build is returned instead.
         """
 
-        # Keep only unique requests.
+        # Keep only unique requests, a duplicate that doesn't allow
+        # skipping the build takes precedence.
         post_data = request.get_json()
-        builds_requests = post_data["environment_image_build_requests"]
-        builds_requests = set(
-            [
-                (req["project_uuid"], req["environment_uuid"], req["project_path"])
-                for req in builds_requests
-            ]
-        )
+        unique_requests = {}
+        for req in post_data["environment_image_build_requests"]:
+            key = (req["project_uuid"], req["environment_uuid"], req["project_path"])
+            unique_requests[key] = unique_requests.get(key, True) and bool(
+                req.get("skip_if_unchanged", False)
+            )
         builds_requests = [
             {
-                "project_uuid": req[0],
-                "environment_uuid": req[1],
-                "project_path": req[2],
+                "project_uuid": key[0],
+                "environment_uuid": key[1],
+                "project_path": key[2],
+                "skip_if_unchanged": skip_if_unchanged,
             }
-            for req in builds_requests
+            for key, skip_if_unchanged in unique_requests.items()
         ]
 
         defined_builds = []
         failed_requests = []
+        # Shared by the requests so that the files of a project are
+        # only listed once when checking if its environments changed.
+        project_files_cache = {}
         # Start a celery task for each unique environment build request.
         for build_request in builds_requests:
             try:
                 with TwoPhaseExecutor(db.session) as tpe:
                     defined_builds.append(
-                        CreateEnvironmentImageBuild(tpe).transaction(build_request)
+                        CreateEnvironmentImageBuild(tpe).transaction(
+                            build_request, project_files_cache
+                        )
                     )
             except Exception:
                 failed_requests.append(build_request)
@@ -150,15 +165,16 @@ class EnvironmentImageBuild(Resource):
                 return
 
             if status_update["status"] == "SUCCESS":
+                build = models.EnvironmentImageBuild.query.filter_by(**filter_by).one()
                 db.session.add(
                     models.EnvironmentImage(
                         project_uuid=project_uuid,
                         environment_uuid=environment_uuid,
                         tag=int(image_tag),
                         stored_in_registry=False,
+                        fingerprint=build.fingerprint,
                     )
                 )
-                build = models.EnvironmentImageBuild.query.filter_by(**filter_by).one()
                 if build.cluster_node is None:
                     raise Exception("Build cluster_node not set.")
                 db.session.add(
@@ -278,8 +294,60 @@ class ProjectEnvironmentMostRecentBuild(Resource):
         return {"environment_image_builds": environment_image_builds}
 
 
+def _get_unchanged_environment_image_build(
+    build_request, project_files_cache: Optional[dict] = None
+) -> Optional[models.EnvironmentImageBuild]:
+    """Gets the latest build if the environment didn't change since.
+
+    Only a successful build whose image is still active is considered,
+    i.e. the environment is not being built and the image is the one
+    that would be replaced by a new build. See
+    `get_environment_fingerprint` for project_files_cache.
+    """
+    latest_build = (
+        models.EnvironmentImageBuild.query.filter_by(
+            project_uuid=build_request["project_uuid"],
+            environment_uuid=build_request["environment_uuid"],
+        )
+        .order_by(desc(models.EnvironmentImageBuild.image_tag))
+        .first()
+    )
+    if latest_build is None or latest_build.status != "SUCCESS":
+        return None
+
+    image = models.EnvironmentImage.query.filter_by(
+        project_uuid=latest_build.project_uuid,
+        environment_uuid=latest_build.environment_uuid,
+        tag=latest_build.image_tag,
+        marked_for_removal=False,
+    ).one_or_none()
+    if image is None or image.fingerprint is None:
+        return None
+
+    fingerprint = environment_image_builds.get_environment_fingerprint(
+        os.path.join(_config.USERDIR_PROJECTS, build_request["project_path"]),
+        build_request["environment_uuid"],
+        build_request["project_uuid"],
+        project_files_cache=project_files_cache,
+    )
+    if fingerprint != image.fingerprint:
+        return None
+    return latest_build
+
+
 class CreateEnvironmentImageBuild(TwoPhaseFunction):
-    def _transaction(self, build_request):
+    def _transaction(self, build_request, project_files_cache=None):
+        self.collateral_kwargs["task_id"] = None
+        if build_request.get("skip_if_unchanged", False):
+            unchanged_build = _get_unchanged_environment_image_build(
+                build_request, project_files_cache
+            )
+            if unchanged_build is not None:
+                logger.info(
+                    f"Skipping build of {unchanged_build}, the environment "
+                    "didn't change since its latest image has been built."
+                )
+                return unchanged_build.as_dict()
 
         # Abort any environment build of this environment that is
         # already running, given by the status of PENDING/STARTED.
@@ -358,12 +426,16 @@ class CreateEnvironmentImageBuild(TwoPhaseFunction):
 
     def _collateral(
         self,
-        task_id: str,
-        project_uuid: str,
-        environment_uuid: str,
-        image_tag: str,
-        project_path: str,
+        task_id: Optional[str],
+        project_uuid: Optional[str] = None,
+        environment_uuid: Optional[str] = None,
+        image_tag: Optional[str] = None,
+        project_path: Optional[str] = None,
     ):
+        # The build has been skipped.
+        if task_id is None:
+            return
+
         celery = current_app.config["CELERY"]
         celery_job_kwargs = {
             "project_uuid": project_uuid,
@@ -26,12 +26,16 @@ from app.utils import (
     get_env_vars_update,
     get_proj_pip_env_variables,
     page_to_pagination_data,
+    terminate_pipeline_run_workflow,
     update_status_db,
 )
 
 api = Namespace("jobs", description="Managing jobs")
 api = schema.register_schema(api)
 
+# Number of pipeline run tasks sent over a single broker connection.
+_SEND_TASKS_CHUNK_SIZE = 100
+
 
 @api.route("/")
 class JobList(Resource):
@@ -887,6 +891,10 @@ class RunJob(TwoPhaseFunction):
 
         # To be later used by the collateral effect function.
         tasks_to_launch = []
+        # All runs and their steps are inserted in bulk, since jobs with
+        # many parameter combinations can have thousands of runs.
+        non_interactive_runs = []
+        pipeline_steps = []
 
         # run_index is the index of the run within the runs of this job
         # scheduling/execution.
@@ -905,58 +913,58 @@ class RunJob(TwoPhaseFunction):
                     pipeline_def["steps"][step_uuid]["parameters"] = step_parameters
 
             # Instantiate a pipeline object given the specs, definition
-            # and parameters.
-            pipeline_run_spec = copy.deepcopy(job.pipeline_run_spec)
-            pipeline_run_spec["pipeline_definition"] = pipeline_def
-            pipeline = construct_pipeline(**pipeline_run_spec)
+            # and parameters. The run spec is not modified, thus there
+            # is no need to copy it.
+            pipeline = construct_pipeline(
+                **{**job.pipeline_run_spec, "pipeline_definition": pipeline_def}
+            )
 
             # Specify the task_id beforehand to avoid race conditions
             # between the task and its presence in the db.
             task_id = str(uuid.uuid4())
             tasks_to_launch.append((task_id, pipeline))
 
-            non_interactive_run = {
-                "job_uuid": job.uuid,
-                "uuid": task_id,
-                "pipeline_uuid": job.pipeline_uuid,
-                "project_uuid": job.project_uuid,
-                "status": "PENDING",
-                "parameters": run_parameters,
-                "parameters_text_search_values": list(run_parameters.values()),
-                "job_run_index": job.total_scheduled_executions,
-                "job_run_pipeline_run_index": run_index,
-                "pipeline_run_index": job.total_scheduled_pipeline_runs,
-                "env_variables": job.env_variables,
-            }
-            job.total_scheduled_pipeline_runs += 1
-
-            db.session.add(models.NonInteractivePipelineRun(**non_interactive_run))
-            # Need to flush because otherwise the bulk insertion of
-            # pipeline steps will lead to foreign key errors.
-            # https://docs.sqlalchemy.org/en/13/orm/persistence_techniques.html#bulk-operations-caveats
-            db.session.flush()
-
-            events.register_job_pipeline_run_created(
-                job.project_uuid, job.uuid, task_id
+            non_interactive_runs.append(
+                {
+                    "type": "NonInteractivePipelineRun",
+                    "job_uuid": job.uuid,
+                    "uuid": task_id,
+                    "pipeline_uuid": job.pipeline_uuid,
+                    "project_uuid": job.project_uuid,
+                    "status": "PENDING",
+                    "parameters": run_parameters,
+                    "parameters_text_search_values": list(run_parameters.values()),
+                    "job_run_index": job.total_scheduled_executions,
+                    "job_run_pipeline_run_index": run_index,
+                    "pipeline_run_index": job.total_scheduled_pipeline_runs,
+                    "env_variables": job.env_variables,
+                }
             )
+            job.total_scheduled_pipeline_runs += 1
 
             # TODO: this code is also in `namespace_runs`. Could
             #       potentially be put in a function for modularity.
             # Set an initial value for the status of the pipeline
             # steps that will be run.
-            step_uuids = [s.properties["uuid"] for s in pipeline.steps]
-            pipeline_steps = []
-            for step_uuid in step_uuids:
+            for step in pipeline.steps:
                 pipeline_steps.append(
-                    models.PipelineRunStep(
-                        **{
-                            "run_uuid": task_id,
-                            "step_uuid": step_uuid,
-                            "status": "PENDING",
-                        }
-                    )
+                    {
+                        "run_uuid": task_id,
+                        "step_uuid": step.properties["uuid"],
+                        "status": "PENDING",
+                    }
                 )
-            db.session.bulk_save_objects(pipeline_steps)
+
+        # The runs need to be inserted before their steps and events,
+        # otherwise the insertion will lead to foreign key errors.
+        # https://docs.sqlalchemy.org/en/13/orm/persistence_techniques.html#bulk-operations-caveats
+        db.session.bulk_insert_mappings(
+            models.NonInteractivePipelineRun, non_interactive_runs
+        )
+        db.session.bulk_insert_mappings(models.PipelineRunStep, pipeline_steps)
+        events.register_job_pipeline_runs_created(
+            job.project_uuid, job.uuid, [task_id for task_id, _ in tasks_to_launch]
+        )
 
         job.total_scheduled_executions += 1
         # Must run after total_scheduled_executions has been updated.
@@ -991,32 +999,36 @@ class RunJob(TwoPhaseFunction):
         if not tasks_to_launch:
             return
 
-        # Launch each task through celery.
+        # Launch each task through celery. Tasks are sent in chunks,
+        # every chunk reusing a single connection to the broker.
         celery = current_app.config["CELERY"]
-
-        for task_id, pipeline in tasks_to_launch:
-            celery_job_kwargs = {
-                "job_uuid": job["uuid"],
-                "project_uuid": job["project_uuid"],
-                "pipeline_definition": pipeline.to_dict(),
-                "run_config": run_config,
-            }
-
-            # Due to circular imports we use the task name instead of
-            # importing the function directly.
-            task_args = {
-                "name": "app.core.tasks.start_non_interactive_pipeline_run",
-                "kwargs": celery_job_kwargs,
-                "task_id": task_id,
-            }
-            res = celery.send_task(**task_args)
-            # NOTE: this is only if a backend is configured. The task
-            # does not return anything. Therefore we can forget its
-            # result and make sure that the Celery backend releases
-            # recourses (for storing and transmitting results)
-            # associated to the task. Uncomment the line below if
-            # applicable.
-            res.forget()
+        chunk_size = _SEND_TASKS_CHUNK_SIZE
+        for i in range(0, len(tasks_to_launch), chunk_size):
+            with celery.producer_or_acquire() as producer:
+                for task_id, pipeline in tasks_to_launch[i : i + chunk_size]:
+                    celery_job_kwargs = {
+                        "job_uuid": job["uuid"],
+                        "project_uuid": job["project_uuid"],
+                        "pipeline_definition": pipeline.to_dict(),
+                        "run_config": run_config,
+                    }
+
+                    # Due to circular imports we use the task name
+                    # instead of importing the function directly.
+                    task_args = {
+                        "name": "app.core.tasks.start_non_interactive_pipeline_run",
+                        "kwargs": celery_job_kwargs,
+                        "task_id": task_id,
+                        "producer": producer,
+                    }
+                    res = celery.send_task(**task_args)
+                    # NOTE: this is only if a backend is configured. The
+                    # task does not return anything. Therefore we can
+                    # forget its result and make sure that the Celery
+                    # backend releases recourses (for storing and
+                    # transmitting results) associated to the task.
+                    # Uncomment the line below if applicable.
+                    res.forget()
 
     def _revert(self):
         job = self.collateral_kwargs["job"]
@@ -1125,6 +1137,8 @@ class AbortJob(TwoPhaseFunction):
             # It is responsibility of the task to terminate by reading
             # its aborted status.
             res.abort()
+            # Wakes up the task, which is watching the workflow.
+            terminate_pipeline_run_workflow(run_uuid)
 
 
 class CreateJob(TwoPhaseFunction):
@@ -5,6 +5,7 @@ project, a good amount of other models depend on such a concept.
 """
 from flask import abort, current_app, request
 from flask_restx import Namespace, Resource
+from sqlalchemy import func
 from sqlalchemy.orm import undefer
 
 import app.models as models
@@ -18,7 +19,7 @@ from app.apis.namespace_jobs import DeleteJob
 from app.apis.namespace_runs import AbortPipelineRun
 from app.apis.namespace_sessions import StopInteractiveSession
 from app.connections import db
-from app.core import events
+from app.core import events, step_output_cache
 
 api = Namespace("projects", description="Managing Projects")
 api = schema.register_schema(api)
@@ -63,6 +64,64 @@ class ProjectList(Resource):
         return project, 201
 
 
+def _count_per_project(model, **counts):
+    """Returns a subquery counting the rows of a model per project.
+
+    Args:
+        model: Model having a `project_uuid` column.
+        **counts: Maps the name of every count to the criterion of the
+            rows it counts, None to count all rows.
+    """
+    columns = []
+    for name, criterion in counts.items():
+        count = func.count() if criterion is None else func.count().filter(criterion)
+        columns.append(count.label(name))
+    return (
+        db.session.query(model.project_uuid, *columns)
+        .group_by(model.project_uuid)
+        .subquery()
+    )
+
+
+@api.route("/entity-counts")
+class ProjectEntityCounts(Resource):
+    @api.doc("get_project_entity_counts")
+    @api.marshal_with(schema.projects_entity_counts)
+    def get(self):
+        """Get the number of jobs, sessions and pipelines of projects.
+
+        The counts of all projects are computed through a single query,
+        pass `project_uuid` to only get the counts of one project.
+        """
+        subqueries = [
+            _count_per_project(
+                models.Job,
+                job_count=None,
+                active_job_count=models.Job.status.in_(["PENDING", "STARTED"]),
+            ),
+            _count_per_project(models.InteractiveSession, session_count=None),
+            _count_per_project(models.Pipeline, pipeline_count=None),
+        ]
+
+        query = db.session.query(
+            models.Project.uuid.label("project_uuid"),
+            *[
+                func.coalesce(column, 0).label(column.name)
+                for subquery in subqueries
+                for column in subquery.c
+                if column.name != "project_uuid"
+            ],
+        )
+        for subquery in subqueries:
+            query = query.outerjoin(
+                subquery, subquery.c.project_uuid == models.Project.uuid
+            )
+        if "project_uuid" in request.args:
+            query = query.filter(models.Project.uuid == request.args["project_uuid"])
+
+        return {"projects": [row._asdict() for row in query]}, 200
+
+
 @api.route("/<string:project_uuid>")
 @api.param("project_uuid", "uuid of the project")
 class Project(Resource):
@@ -215,5 +274,7 @@ class DeleteProject(TwoPhaseFunction):
         events.register_project_deleted_event(project_uuid)
         models.Project.query.filter_by(uuid=project_uuid).delete()
 
-    def _collateral(self):
-        pass
+        self.collateral_kwargs["project_uuid"] = project_uuid
+
+    def _collateral(self, project_uuid: str):
+        step_output_cache.delete_project_cache(project_uuid)
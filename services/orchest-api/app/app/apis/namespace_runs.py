@@ -17,7 +17,11 @@ from app import schema
 from app.connections import db
 from app.core import environments, events
 from app.core.pipelines import Pipeline, construct_pipeline
-from app.utils import get_proj_pip_env_variables, update_status_db
+from app.utils import (
+    get_proj_pip_env_variables,
+    terminate_pipeline_run_workflow,
+    update_status_db,
+)
 
 api = Namespace("runs", description="Manages interactive pipeline runs")
 api = schema.register_schema(api)
@@ -170,6 +174,8 @@ class AbortPipelineRun(TwoPhaseFunction):
         # aborted status.
         res.abort()
         celery.control.revoke(run_uuid)
+        # Wakes up the task, which is watching the workflow.
+        terminate_pipeline_run_workflow(run_uuid)
 
 
 class AbortInteractivePipelineRun(TwoPhaseFunction):
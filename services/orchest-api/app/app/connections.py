@@ -18,7 +18,9 @@ def _get_k8s_api_client() -> ApiClient:
     )
     # See urllib3 poolmanager.py usage of "retries".
     configuration.retries = _retry_strategy
-    a = ApiClient(configuration=configuration)
+    # Requests made with `async_req=True` are executed by a pool of
+    # `pool_threads` threads, which defaults to 1.
+    a = ApiClient(configuration=configuration, pool_threads=8)
     return a
 
 
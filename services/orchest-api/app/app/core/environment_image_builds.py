@@ -1,14 +1,23 @@
+import contextlib
+import fcntl
+import hashlib
 import json
 import os
+import re
+import shlex
+import shutil
+import subprocess
+import uuid
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import requests
 from celery.contrib.abortable import AbortableAsyncResult
 
+from _orchest.internals import blob_store
 from _orchest.internals import config as _config
-from _orchest.internals.utils import copytree, rmtree
+from _orchest.internals.utils import rmtree
 from app import models
 from app import utils as app_utils
 from app.connections import k8s_core_api
@@ -17,6 +26,8 @@ from app.core.sio_streamed_task import SioStreamedTask
 from config import CONFIG_CLASS
 
 __ENV_BUILD_FULL_LOGS_DIRECTORY = "/tmp/environment_image_builds_logs"
+# Snapshots of entire projects, shared by the builds of a project.
+_SHARED_SNAPSHOTS_DIR = os.path.join(_config.USERDIR_ENV_IMG_BUILDS, "shared")
 
 _logger = app_utils.get_logger()
 
@@ -28,11 +39,14 @@ def update_environment_image_build_status(
     image_tag: str,
     status: str,
     cluster_node: Optional[str] = None,
+    fingerprint: Optional[str] = None,
 ) -> Any:
     """Update environment build status."""
     data = {"status": status}
     if cluster_node is not None:
         data["cluster_node"] = cluster_node
+    if fingerprint is not None:
+        data["fingerprint"] = fingerprint
 
     if data["status"] == "STARTED":
         data["started_time"] = datetime.utcnow().isoformat()
@@ -49,7 +63,14 @@ def update_environment_image_build_status(
 
 
 def write_environment_dockerfile(
-    base_image, task_uuid, project_uuid, env_uuid, work_dir, bash_script, path
+    base_image,
+    task_uuid,
+    project_uuid,
+    env_uuid,
+    work_dir,
+    bash_script,
+    path,
+    context_paths: Optional[List[str]] = None,
 ):
     """Write a custom dockerfile with the given specifications.
 
@@ -63,7 +84,8 @@ def write_environment_dockerfile(
 
     This dockerfile is built in an ad-hoc way to later be able to only
     log messages related to the user script. Note that the produced
-    dockerfile will make it so that the entire context is copied.
+    dockerfile will make it so that the entire context is copied, unless
+    `context_paths` are given.
 
     Args:
         base_image: Base image of the docker file.
@@ -75,6 +97,11 @@ def write_environment_dockerfile(
         work_dir: Working directory.
         bash_script: Script to run in a RUN command.
         path: Where to save the file.
+        context_paths: Paths, relative to the context, that the setup
+            script depends on. If given, only these paths and the setup
+            script are copied, one by one, so that the layer of the
+            setup script stays cached as long as these files don't
+            change.
 
     Returns:
 
@@ -101,7 +128,11 @@ def write_environment_dockerfile(
     # image that is to be built, this allows the user defined script
     # defined through orchest to make use of files that are part of its
     # project, e.g. a requirements.txt or other scripts.
-    statements.append("COPY . .")
+    if context_paths is None:
+        statements.append("COPY . .")
+    else:
+        for context_path in [*context_paths, bash_script]:
+            statements.append(f"COPY {json.dumps([context_path, f'./{context_path}'])}")
 
     # Permission statements.
     ps = [
@@ -225,15 +256,401 @@ def check_environment_correctness(project_uuid, environment_uuid, project_path):
             )
 
 
+# Files that declare the dependencies of a project, they are part of the
+# build context whenever they exist.
+_DEPENDENCY_FILES = [
+    "requirements.txt",
+    "environment.yml",
+    "environment.yaml",
+    "Pipfile",
+    "Pipfile.lock",
+]
+# Lets a setup script declare the files it depends on, e.g.
+# "# orchest-build-context: requirements.txt src/".
+_BUILD_CONTEXT_DIRECTIVE = re.compile(r"^\s*#\s*orchest-build-context:(.*)$")
+
+
+def _split_shell_words(line: str) -> List[str]:
+    try:
+        return shlex.split(line, comments=True)
+    except ValueError:
+        # E.g. a quote that is closed on another line.
+        return line.split("#", 1)[0].split()
+
+
+def _resolve_project_path(project_path: str, word: str) -> Optional[str]:
+    """Returns the normalized relative path a word refers to, if any."""
+    if not word or os.path.isabs(word) or any(c in word for c in "$`*?"):
+        return None
+    relpath = os.path.normpath(word)
+    if relpath == ".." or relpath.startswith(f"..{os.sep}"):
+        return None
+    if not os.path.lexists(os.path.join(project_path, relpath)):
+        return None
+    return relpath
+
+
+def get_setup_script_context_paths(
+    project_path: str, setup_script_path: str
+) -> Optional[List[str]]:
+    """Gets the project paths the setup script of an environment needs.
+
+    The paths are the ones declared through the build context directive
+    of the setup script, the dependency files of the project and the
+    existing paths the setup script refers to, e.g. `requirements.txt`
+    in `pip install -r requirements.txt`. The shell scripts referred to
+    are searched for paths as well.
+
+    Args:
+        project_path: Absolute path of the project.
+        setup_script_path: Absolute path of the setup script.
+
+    Returns:
+        The sorted paths, relative to the project, or None if the entire
+        project should be part of the build context. That is the case
+        if the setup script doesn't declare its build context and the
+        "dependencies" build context is not configured, or if the setup
+        script refers to the project directory itself, e.g. through
+        `pip install .`.
+    """
+    with open(setup_script_path) as f:
+        setup_script = f.read()
+
+    declared = False
+    words = []
+    for line in setup_script.splitlines():
+        match = _BUILD_CONTEXT_DIRECTIVE.match(line)
+        if match is not None:
+            declared = True
+            words.extend(_split_shell_words(match.group(1)))
+    if not declared and CONFIG_CLASS.ENV_IMAGE_BUILD_CONTEXT != "dependencies":
+        return None
+
+    paths = {
+        path
+        for path in _DEPENDENCY_FILES
+        if os.path.isfile(os.path.join(project_path, path))
+    }
+    scripts = [setup_script]
+    while scripts:
+        for line in scripts.pop().splitlines():
+            for word in _split_shell_words(line):
+                # Options like --requirement=requirements.txt.
+                words.extend([word, word.split("=", 1)[-1]])
+
+        for word in words:
+            path = _resolve_project_path(project_path, word)
+            if path is None or path in paths:
+                continue
+            if path == ".":
+                return None
+            paths.add(path)
+            full_path = os.path.join(project_path, path)
+            if path.endswith(".sh") and os.path.isfile(full_path):
+                with open(full_path) as f:
+                    scripts.append(f.read())
+        words = []
+
+    return sorted(paths)
+
+
+def _get_base_image(environment_properties: dict) -> str:
+    base_image: str = environment_properties["base_image"]
+    # Workaround for common.tsx not using the orchest version.
+    if "orchest/" in base_image:
+        if ":" not in base_image.split("orchest/")[1]:
+            base_image = f"{base_image}:{CONFIG_CLASS.ORCHEST_VERSION}"
+    return base_image
+
+
+def _hash_project_path(project_path: str, path: str) -> Dict[str, str]:
+    """Hashes a file, or the files within a directory, of the project.
+
+    Returns:
+        A mapping from the paths, relative to the project, to the hash
+        of their content, or to the target of symlinks.
+    """
+    hashes = {}
+    full_path = os.path.join(project_path, path)
+    if os.path.isdir(full_path) and not os.path.islink(full_path):
+        file_paths = []
+        for root, dirs, files in os.walk(full_path):
+            rel_root = os.path.relpath(root, project_path)
+            # Symlinks to directories are not followed.
+            file_paths.extend(
+                os.path.join(rel_root, name)
+                for name in dirs
+                if os.path.islink(os.path.join(root, name))
+            )
+            file_paths.extend(os.path.join(rel_root, name) for name in files)
+    else:
+        file_paths = [path]
+
+    for file_path in file_paths:
+        full_path = os.path.join(project_path, file_path)
+        if os.path.islink(full_path):
+            hashes[file_path] = f"symlink:{os.readlink(full_path)}"
+            continue
+        with open(full_path, "rb") as f:
+            file_hash = hashlib.sha256()
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                file_hash.update(chunk)
+        hashes[file_path] = file_hash.hexdigest()
+    return hashes
+
+
+def _is_in_project_build_context(path: str) -> bool:
+    # See the .dockerignore written by `_write_build_files`.
+    return not (
+        path in [".orchest", ".dockerignore"]
+        or path.startswith(".orchest/")
+        or path.startswith(".orchest-reserved-")
+    )
+
+
+def get_environment_fingerprint(
+    project_path: str,
+    environment_uuid: str,
+    project_uuid: Optional[str] = None,
+    snapshot_id: Optional[str] = None,
+    project_files_cache: Optional[Dict[str, Dict[str, str]]] = None,
+) -> Optional[str]:
+    """Fingerprints what the image of an environment is built from.
+
+    The fingerprint covers the base image, the setup script and the
+    content of the project paths the setup script depends on, see
+    `get_setup_script_context_paths`, but not what the setup script
+    fetches, e.g. packages that are not pinned. If the entire project
+    is part of the build context, all the project files that end up in
+    the build context are covered, their hashes are taken from the blob
+    store of the project, see `blob_store.get_project_files`.
+
+    Args:
+        project_path: Absolute path of the project, or of a build
+            context snapshot of the project.
+        environment_uuid:
+        project_uuid: Required to fingerprint environments that depend
+            on the entire project.
+        snapshot_id: Id of the shared snapshot at project_path, if
+            any, whose files are then taken from its manifest.
+        project_files_cache: Project files by project path, filled and
+            reused across calls so that fingerprinting multiple
+            environments of a project lists its files only once.
+
+    Returns:
+        The hex digest of the environment definition, or None if it
+        can't be fingerprinted, e.g. because the setup script depends
+        on the entire project and no project_uuid is given or because
+        a file can't be read.
+    """
+    environment_path = os.path.join(
+        project_path, ".orchest", "environments", environment_uuid
+    )
+    setup_script_path = os.path.join(
+        environment_path, _config.ENV_SETUP_SCRIPT_FILE_NAME
+    )
+    try:
+        with open(os.path.join(environment_path, "properties.json")) as f:
+            base_image = _get_base_image(json.load(f))
+
+        context_paths = get_setup_script_context_paths(project_path, setup_script_path)
+        setup_script = _hash_project_path(
+            environment_path, _config.ENV_SETUP_SCRIPT_FILE_NAME
+        )
+        if context_paths is not None:
+            files = {}
+            for path in context_paths:
+                files.update(_hash_project_path(project_path, path))
+        elif project_uuid is None:
+            return None
+        else:
+            if snapshot_id is not None:
+                files = blob_store.get_snapshot_files(project_uuid, snapshot_id)
+            elif project_files_cache is None:
+                files = blob_store.get_project_files(project_uuid, project_path)
+            else:
+                if project_path not in project_files_cache:
+                    project_files_cache[project_path] = blob_store.get_project_files(
+                        project_uuid, project_path
+                    )
+                files = project_files_cache[project_path]
+            files = {
+                path: value
+                for path, value in files.items()
+                if _is_in_project_build_context(path)
+            }
+    except (OSError, ValueError, KeyError, subprocess.CalledProcessError) as e:
+        _logger.info(f"Could not fingerprint environment {environment_uuid}: {e}.")
+        return None
+
+    description = {
+        # The way images are built can change between versions.
+        "orchest_version": CONFIG_CLASS.ORCHEST_VERSION,
+        "base_image": base_image,
+        "setup_script": setup_script,
+        "entire_project": context_paths is None,
+        "files": files,
+    }
+    description = json.dumps(description, sort_keys=True)
+    return hashlib.sha256(description.encode("utf-8")).hexdigest()
+
+
+def _copy_context_paths(project_path: str, snapshot_path: str, paths: List[str]):
+    """Copies paths of the project, excluding the .gitignore patterns.
+
+    Raises:
+        OSError if the copy failed.
+    """
+    copy_cmd = ["rsync", "-aWHAX", "--relative"]
+    gitignore_path = os.path.join(project_path, ".gitignore")
+    if os.path.isfile(gitignore_path):
+        copy_cmd.append(f"--exclude-from={gitignore_path}")
+    # The "/./" tells rsync which part of the path to recreate.
+    copy_cmd.extend(os.path.join(project_path, ".", path) for path in paths)
+    copy_cmd.append(snapshot_path + "/")
+
+    os.makedirs(snapshot_path, exist_ok=True)
+    exit_code = subprocess.call(copy_cmd, stderr=subprocess.STDOUT)
+    if exit_code != 0:
+        raise OSError(f"Failed to copy {paths} to {snapshot_path}, :{exit_code}.")
+
+
+@contextlib.contextmanager
+def _shared_snapshots_lock(project_uuid: str) -> Iterator[str]:
+    """Locks the shared build context snapshots of a project.
+
+    The lock is a file lock, since the builds of a project can run in
+    different processes.
+
+    Yields:
+        The directory containing the shared snapshots of the project.
+    """
+    snapshots_dir = os.path.join(_SHARED_SNAPSHOTS_DIR, project_uuid)
+    os.makedirs(snapshots_dir, exist_ok=True)
+    with open(os.path.join(_SHARED_SNAPSHOTS_DIR, f"{project_uuid}.lock"), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield snapshots_dir
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _acquire_shared_snapshot(
+    task_uuid: str, project_uuid: str, userdir_project_path: str
+) -> str:
+    """Gets a snapshot of the entire project to be used by a build.
+
+    Builds of the same project share the snapshot as long as the project
+    doesn't change, e.g. when all environments of the project are built
+    at once. The files of the snapshot are hardlinked from the blob
+    store of the project, see `blob_store`, so that only files that
+    changed since the last snapshot of the project are copied.
+
+    Returns:
+        The path of the snapshot, to be released through
+        `release_build_context` once the build is done.
+    """
+    with _shared_snapshots_lock(project_uuid) as snapshots_dir:
+        snapshot_path = blob_store.create_shared_snapshot(
+            project_uuid, userdir_project_path, snapshots_dir, use_gitignore=True
+        )
+        # Keep track of the builds using the snapshot so that it's only
+        # removed once unused.
+        users_dir = f"{snapshot_path}.builds"
+        os.makedirs(users_dir, exist_ok=True)
+        Path(os.path.join(users_dir, task_uuid)).touch()
+    return snapshot_path
+
+
+def release_build_context(
+    task_uuid: str, project_uuid: str, build_context: Dict[str, Any]
+) -> None:
+    """Releases the snapshot of a build context.
+
+    A snapshot that isn't shared is removed, a shared one is removed
+    once no build uses it anymore.
+    """
+    snapshot_path = build_context["snapshot_path"]
+    if not build_context["shared_snapshot"]:
+        rmtree(snapshot_path, ignore_errors=True)
+        return
+
+    with _shared_snapshots_lock(project_uuid):
+        users_dir = f"{snapshot_path}.builds"
+        try:
+            os.remove(os.path.join(users_dir, task_uuid))
+        except FileNotFoundError:
+            pass
+        if os.path.isdir(users_dir) and not os.listdir(users_dir):
+            os.rmdir(users_dir)
+            blob_store.remove_snapshot(
+                project_uuid, os.path.basename(snapshot_path), snapshot_path
+            )
+
+
+def _snapshot_project(
+    task_uuid: str, project_uuid: str, userdir_project_path: str, environment_uuid: str
+) -> Tuple[Dict[str, Any], Optional[List[str]]]:
+    """Snapshots the project files that are part of the build context.
+
+    Returns:
+        The build context, with its snapshot path, and the context
+        paths, see `get_setup_script_context_paths`.
+    """
+    if not os.path.isdir(userdir_project_path):
+        raise OSError(f"Project path {userdir_project_path} does not exist")
+
+    environment_path = os.path.join(".orchest", "environments", environment_uuid)
+    setup_script_path = os.path.join(
+        userdir_project_path, environment_path, _config.ENV_SETUP_SCRIPT_FILE_NAME
+    )
+    try:
+        context_paths = get_setup_script_context_paths(
+            userdir_project_path, setup_script_path
+        )
+    except OSError:
+        # Reported by the environment correctness checks.
+        context_paths = None
+
+    if context_paths is None:
+        snapshot_path = _acquire_shared_snapshot(
+            task_uuid, project_uuid, userdir_project_path
+        )
+        return {"snapshot_path": snapshot_path, "shared_snapshot": True}, None
+
+    # Only a few files are needed, they are copied for this build only.
+    snapshot_path = os.path.join(_config.USERDIR_ENV_IMG_BUILDS, task_uuid)
+    if os.path.isdir(snapshot_path):
+        rmtree(snapshot_path)
+    _copy_context_paths(
+        userdir_project_path, snapshot_path, [environment_path, *context_paths]
+    )
+    return {"snapshot_path": snapshot_path, "shared_snapshot": False}, context_paths
+
+
+def _copy_file_atomically(source: str, target: str) -> None:
+    # The target can be read by a build that shares the snapshot.
+    tmp_target = f"{target}.tmp-{uuid.uuid4()}"
+    shutil.copyfile(source, tmp_target)
+    os.replace(tmp_target, target)
+
+
 def prepare_build_context(task_uuid, project_uuid, environment_uuid, project_path):
     """Prepares the build context for a given environment.
 
     Prepares the build context by taking a snapshot of the project
-    directory, and using this snapshot as a context in which the ad-hoc
-    docker file will be placed. This dockerfile is built in a way to
-    respect the environment properties (base image, user bash script,
-    etc.) while also allowing to log only the messages that are related
-    to the user script while building the image.
+    directory, or only of the files the setup script depends on, see
+    `get_setup_script_context_paths`, and using this snapshot as a
+    context in which the ad-hoc docker file will be placed. This
+    dockerfile is built in a way to respect the environment properties
+    (base image, user bash script, etc.) while also allowing to log only
+    the messages that are related to the user script while building the
+    image.
+
+    Snapshots of the entire project are shared by concurrent builds of
+    the project, the files of a build are therefore named after the
+    build or the environment and the snapshot is only to be removed
+    through `release_build_context`.
 
     Args:
         task_uuid:
@@ -251,16 +668,14 @@ def prepare_build_context(task_uuid, project_uuid, environment_uuid, project_pat
     env_builds_dir = _config.USERDIR_ENV_IMG_BUILDS
     # K8S_TODO: remove this?
     Path(env_builds_dir).mkdir(parents=True, exist_ok=True)
-    # Make a snapshot of the project state, used for the context.
-    snapshot_path = f"{env_builds_dir}/{task_uuid}"
-    if os.path.isdir(snapshot_path):
-        rmtree(snapshot_path)
 
     try:
         # The project path we receive is relative to the projects
         # directory.
         userdir_project_path = os.path.join(_config.USERDIR_PROJECTS, project_path)
-        copytree(userdir_project_path, snapshot_path, use_gitignore=True)
+        build_context, context_paths = _snapshot_project(
+            task_uuid, project_uuid, userdir_project_path, environment_uuid
+        )
     except OSError as e:
         # This is a temporary band-aid to the fact that, currently, a
         # project rename can happen while builds are queued. We use the
@@ -273,8 +688,28 @@ def prepare_build_context(task_uuid, project_uuid, environment_uuid, project_pat
         _logger.error(e)
         proj = models.Project.query.filter_by(uuid=project_uuid).one()
         userdir_project_path = os.path.join(_config.USERDIR_PROJECTS, proj.name)
-        copytree(userdir_project_path, snapshot_path, use_gitignore=True)
+        build_context, context_paths = _snapshot_project(
+            task_uuid, project_uuid, userdir_project_path, environment_uuid
+        )
 
+    try:
+        _write_build_files(
+            build_context, task_uuid, project_uuid, environment_uuid, context_paths
+        )
+    except Exception:
+        release_build_context(task_uuid, project_uuid, build_context)
+        raise
+    return build_context
+
+
+def _write_build_files(
+    build_context: Dict[str, Any],
+    task_uuid: str,
+    project_uuid: str,
+    environment_uuid: str,
+    context_paths: Optional[List[str]],
+) -> None:
+    snapshot_path = build_context["snapshot_path"]
     # Sanity checks, if not respected exception will be raised.
     check_environment_correctness(project_uuid, environment_uuid, snapshot_path)
 
@@ -285,30 +720,29 @@ def prepare_build_context(task_uuid, project_uuid, environment_uuid, project_pat
 
     # Build the docker file and move it to the context.
     with open(os.path.join(environment_path, "properties.json")) as json_file:
-        environment_properties = json.load(json_file)
-        base_image: str = environment_properties["base_image"]
-        # Workaround for common.tsx not using the orchest version.
-        if "orchest/" in base_image:
-            if ":" not in base_image.split("orchest/")[1]:
-                base_image = f"{base_image}:{CONFIG_CLASS.ORCHEST_VERSION}"
+        base_image = _get_base_image(json.load(json_file))
+
+    # Fingerprint the snapshot, not the project, since the project
+    # could have changed since the snapshot has been taken.
+    fingerprint = get_environment_fingerprint(
+        snapshot_path,
+        environment_uuid,
+        project_uuid,
+        os.path.basename(snapshot_path) if build_context["shared_snapshot"] else None,
+    )
 
-    # Use the task_uuid to avoid clashing with user stuff.
+    # The name of the setup script doesn't depend on the task so that
+    # the layer that copies it can be cached.
     bash_script_name = (
         f".orchest-reserved-env-setup-script-{project_uuid}-{environment_uuid}.sh"
     )
-    snapshot_setup_script_path = os.path.join(snapshot_path, bash_script_name)
     # Move the startup script to the context.
-    os.system(
-        'cp "%s" "%s"'
-        % (
-            os.path.join(environment_path, _config.ENV_SETUP_SCRIPT_FILE_NAME),
-            snapshot_setup_script_path,
-        )
+    _copy_file_atomically(
+        os.path.join(environment_path, _config.ENV_SETUP_SCRIPT_FILE_NAME),
+        os.path.join(snapshot_path, bash_script_name),
     )
 
-    dockerfile_name = (
-        f".orchest-reserved-env-dockerfile-{project_uuid}-{environment_uuid}"
-    )
+    dockerfile_name = f".orchest-reserved-env-dockerfile-{task_uuid}"
 
     write_environment_dockerfile(
         base_image,
@@ -318,19 +752,28 @@ def prepare_build_context(task_uuid, project_uuid, environment_uuid, project_pat
         _config.PROJECT_DIR,
         bash_script_name,
         os.path.join(snapshot_path, dockerfile_name),
+        context_paths,
     )
 
-    # Hide stuff from the user.
-    with open(os.path.join(snapshot_path, ".dockerignore"), "w") as docker_ignore:
+    # Hide stuff from the user, including the files of other builds
+    # sharing the snapshot. A Dockerfile specific ignore file is used
+    # since other builds can share the snapshot, it takes precedence
+    # over the .dockerignore of the project.
+    with open(
+        os.path.join(snapshot_path, f"{dockerfile_name}.dockerignore"), "w"
+    ) as docker_ignore:
         docker_ignore.write(".dockerignore\n")
         docker_ignore.write(".orchest\n")
-        docker_ignore.write(f"{dockerfile_name}\n")
-
-    return {
-        "snapshot_path": snapshot_path,
-        "base_image": base_image,
-        "dockerfile_path": dockerfile_name,
-    }
+        docker_ignore.write(".orchest-reserved-*\n")
+        docker_ignore.write(f"!{bash_script_name}\n")
+
+    build_context.update(
+        {
+            "base_image": base_image,
+            "dockerfile_path": dockerfile_name,
+            "fingerprint": fingerprint,
+        }
+    )
 
 
 def build_environment_image_task(
@@ -358,6 +801,7 @@ def build_environment_image_task(
     """
     with requests.sessions.Session() as session:
 
+        build_context = None
         try:
             update_environment_image_build_status(
                 session, project_uuid, environment_uuid, image_tag, "STARTED"
@@ -402,8 +846,10 @@ def build_environment_image_task(
                 abort_lambda=lambda: AbortableAsyncResult(task_uuid).is_aborted(),
             )
 
-            # Cleanup.
-            rmtree(build_context["snapshot_path"])
+            # Cleanup, the snapshot can be shared with other builds.
+            release_build_context(task_uuid, project_uuid, build_context)
+            fingerprint = build_context["fingerprint"]
+            build_context = None
 
             pod_name = image_utils.image_build_task_to_pod_name(task_uuid)
             pod = k8s_core_api.read_namespaced_pod(
@@ -416,12 +862,15 @@ def build_environment_image_task(
                 image_tag,
                 status,
                 pod.spec.node_name,
+                fingerprint if status == "SUCCESS" else None,
             )
 
         # Catch all exceptions because we need to make sure to set the
         # build state to failed.
         except Exception as e:
             _logger.error(e)
+            if build_context is not None:
+                release_build_context(task_uuid, project_uuid, build_context)
             update_environment_image_build_status(
                 session, project_uuid, environment_uuid, image_tag, "FAILURE"
             )
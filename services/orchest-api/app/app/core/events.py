@@ -4,6 +4,8 @@ Upon the registration of an event in the db, deliveries are created
 accordingly based on any subscribers subscribed to the event type that
 happened.
 """
+from typing import Dict, List, Optional, Tuple
+
 from app import models
 from app import types as app_types
 from app import utils as app_utils
@@ -14,50 +16,67 @@ _logger = app_utils.get_logger()
 
 
 def _register_event(ev: models.Event) -> None:
+    _register_events([ev])
+
+
+def _register_events(evs: List[models.Event]) -> None:
+    """Adds the events and their deliveries to the db in one go.
+
+    Subscribers are only looked up once for events of the same type
+    related to the same project and job.
+    """
     # So that any FK created in the same transaction and referenced by
-    # the event is visible to the event.
+    # the events is visible to the events.
     db.session.flush()
 
-    db.session.add(ev)
-
-    project_uuid = None
-    job_uuid = None
-    if isinstance(ev, models.ProjectEvent):
-        project_uuid = ev.project_uuid
-    # Don't use a else if, JobEvent ISA ProjectEvent.
-    if isinstance(ev, models.JobEvent):
-        job_uuid = ev.job_uuid
+    db.session.add_all(evs)
 
     # So that the event.uuid is generated and visible as a FK.
     db.session.flush()
-    _logger.info(ev)
-
-    subscribers = notifications.get_subscribers_subscribed_to_event(
-        ev.type, project_uuid=project_uuid, job_uuid=job_uuid
-    )
-    for sub in subscribers:
-        if isinstance(sub, models.AnalyticsSubscriber):
-            if app_utils.OrchestSettings()["TELEMETRY_DISABLED"]:
-                _logger.info(
-                    "Telemetry is disabled, skipping event delivery to analytics."
-                )
-                continue
-            payload = ev.to_telemetry_payload()
-        else:
-            payload = ev.to_notification_payload()
-
-        _logger.info(
-            f"Scheduling delivery for event {ev.uuid}, event type: {ev.type} for "
-            f"deliveree {sub.uuid} of type {sub.type}."
-        )
 
-        delivery = models.Delivery(
-            event=ev.uuid,
-            deliveree=sub.uuid,
-            status="SCHEDULED",
-            notification_payload=payload,
-        )
-        db.session.add(delivery)
+    subscribers_cache: Dict[Tuple[str, Optional[str], Optional[str]], list] = {}
+    for ev in evs:
+        project_uuid = None
+        job_uuid = None
+        if isinstance(ev, models.ProjectEvent):
+            project_uuid = ev.project_uuid
+        # Don't use a else if, JobEvent ISA ProjectEvent.
+        if isinstance(ev, models.JobEvent):
+            job_uuid = ev.job_uuid
+
+        _logger.info(ev)
+
+        subscribers_key = (ev.type, project_uuid, job_uuid)
+        if subscribers_key not in subscribers_cache:
+            subscribers_cache[
+                subscribers_key
+            ] = notifications.get_subscribers_subscribed_to_event(
+                ev.type, project_uuid=project_uuid, job_uuid=job_uuid
+            )
+        for sub in subscribers_cache[subscribers_key]:
+            if isinstance(sub, models.AnalyticsSubscriber):
+                if app_utils.OrchestSettings()["TELEMETRY_DISABLED"]:
+                    _logger.info(
+                        "Telemetry is disabled, skipping event delivery to "
+                        "analytics."
+                    )
+                    continue
+                payload = ev.to_telemetry_payload()
+            else:
+                payload = ev.to_notification_payload()
+
+            _logger.info(
+                f"Scheduling delivery for event {ev.uuid}, event type: {ev.type} "
+                f"for deliveree {sub.uuid} of type {sub.type}."
+            )
+
+            delivery = models.Delivery(
+                event=ev.uuid,
+                deliveree=sub.uuid,
+                status="SCHEDULED",
+                notification_payload=payload,
+            )
+            db.session.add(delivery)
 
 
 def _register_one_off_job_event(type: str, project_uuid: str, job_uuid: str) -> None:
@@ -267,11 +286,22 @@ def _register_one_off_job_pipeline_run_event(
 def _register_cron_job_run_pipeline_run_event(
     type: str, project_uuid: str, job_uuid: str, pipeline_run_uuid: str
 ):
+    _register_events(
+        _get_cron_job_run_pipeline_run_events(
+            type, project_uuid, job_uuid, [pipeline_run_uuid]
+        )
+    )
+
+
+def _get_cron_job_run_pipeline_run_events(
+    type: str, project_uuid: str, job_uuid: str, pipeline_run_uuids: List[str]
+) -> List[models.CronJobRunPipelineRunEvent]:
+    # All the pipeline runs are expected to belong to the same job run.
     run_index = (
         db.session.query(models.NonInteractivePipelineRun.job_run_index)
         .filter(
             models.NonInteractivePipelineRun.job_uuid == job_uuid,
-            models.NonInteractivePipelineRun.uuid == pipeline_run_uuid,
+            models.NonInteractivePipelineRun.uuid == pipeline_run_uuids[0],
         )
         .one()
     ).job_run_index
@@ -286,15 +316,17 @@ def _register_cron_job_run_pipeline_run_event(
     total_pipeline_runs = (
         run_started_event.total_pipeline_runs if run_started_event is not None else None
     )
-    ev = models.CronJobRunPipelineRunEvent(
-        type=type,
-        project_uuid=project_uuid,
-        job_uuid=job_uuid,
-        pipeline_run_uuid=pipeline_run_uuid,
-        run_index=run_index,
-        total_pipeline_runs=total_pipeline_runs,
-    )
-    _register_event(ev)
+    return [
+        models.CronJobRunPipelineRunEvent(
+            type=type,
+            project_uuid=project_uuid,
+            job_uuid=job_uuid,
+            pipeline_run_uuid=pipeline_run_uuid,
+            run_index=run_index,
+            total_pipeline_runs=total_pipeline_runs,
+        )
+        for pipeline_run_uuid in pipeline_run_uuids
+    ]
 
 
 def register_job_pipeline_run_created(
@@ -317,6 +349,38 @@ def register_job_pipeline_run_created(
         )
 
 
+def register_job_pipeline_runs_created(
+    project_uuid: str, job_uuid: str, pipeline_run_uuids: List[str]
+) -> None:
+    """Adds a job ppl run created event for every run, doesn't commit.
+
+    Equivalent to calling `register_job_pipeline_run_created` for every
+    run, which are expected to belong to the same job run, but flushes
+    the events in one go.
+    """
+    if not pipeline_run_uuids:
+        return
+
+    if _is_cron_job(job_uuid):
+        evs = _get_cron_job_run_pipeline_run_events(
+            "project:cron-job:run:pipeline-run:created",
+            project_uuid,
+            job_uuid,
+            pipeline_run_uuids,
+        )
+    else:
+        evs = [
+            models.OneOffJobPipelineRunEvent(
+                type="project:one-off-job:pipeline-run:created",
+                project_uuid=project_uuid,
+                job_uuid=job_uuid,
+                pipeline_run_uuid=pipeline_run_uuid,
+            )
+            for pipeline_run_uuid in pipeline_run_uuids
+        ]
+    _register_events(evs)
+
+
 def register_job_pipeline_run_started(
     project_uuid: str, job_uuid: str, pipeline_run_uuid: str
 ) -> None:
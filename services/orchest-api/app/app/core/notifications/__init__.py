@@ -122,12 +122,14 @@ def process_notifications_deliveries_task() -> None:
 
     logger.info(f"Found {len(webhook_deliveries)} webhook deliveries to deliver.")
 
-    for delivery in webhook_deliveries:
-        try:
-            webhooks.deliver(delivery.uuid)
-        # Don't let failures affect other deliveries.
-        except Exception as e:
-            logger.error(e)
+    # Deliveries of different webhooks are delivered concurrently, so
+    # that a slow webhook doesn't hold up the others.
+    try:
+        webhooks.deliver_many([delivery.uuid for delivery in webhook_deliveries])
+    # Don't let failures affect analytics deliveries.
+    except Exception as e:
+        logger.error(e)
+        db.session.rollback()
 
     analytics_deliveries = (
         (db.session.query(models.Delivery.uuid))
@@ -8,13 +8,16 @@ at least the following:
     deliver(delivery_uuid).
 
 """
+import collections
 import datetime
 import hashlib
 import hmac
 import json
 import secrets
+import threading
 import uuid
-from typing import List, Optional, Set
+from concurrent import futures
+from typing import Dict, List, Optional, Set, Tuple
 
 import requests
 import validators
@@ -29,6 +32,19 @@ from app.core.notifications import utils as notification_utils
 
 logger = app_utils.get_logger()
 
+# Maximum number of webhooks that are delivered to concurrently.
+_MAX_CONCURRENT_DELIVERIES = 16
+# Maximum number of hosts a worker keeps connections to, the least
+# recently used host is dropped first.
+_MAX_POOLED_HOSTS = 32
+# Deliveries are claimed for this long, deliveries claimed by a worker
+# that died are delivered again once their claim expires.
+_CLAIM_DURATION = datetime.timedelta(minutes=10)
+
+_executor: Optional[futures.ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_worker_state = threading.local()
+
 
 def create_webhook(webhook_spec: dict) -> models.Webhook:
     """Adds a Webhook model to the db, does not commit.
@@ -154,13 +170,9 @@ def update_webhook(uuid: str, mutation: dict) -> None:
         setattr(webhook, key, value)
 
 
-def _create_delivery_payload(delivery: models.Delivery) -> dict:
-
-    webhook = (
-        models.Webhook.query.options(noload(models.Webhook.subscriptions))
-        .filter(models.Webhook.uuid == delivery.deliveree)
-        .one()
-    )
+def _create_delivery_payload(
+    delivery: models.Delivery, webhook: models.Webhook
+) -> dict:
 
     payload = {
         "delivered_for": marshal(webhook, schema.webhook),
@@ -204,7 +216,7 @@ def _inject_headers(
 def _prepare_request(
     delivery: models.Delivery, deliveree: models.Webhook
 ) -> requests.PreparedRequest:
-    payload = _create_delivery_payload(delivery)
+    payload = _create_delivery_payload(delivery, deliveree)
 
     # Prepare the request, then sign the body.
     if deliveree.content_type == models.Webhook.ContentType.URLENCODED.value:
@@ -275,12 +287,234 @@ def send_test_ping_delivery(deliveree_uuid: str) -> Optional[requests.Response]:
         return None
 
 
+def _get_session() -> requests.Session:
+    """Gets the session of the current delivery worker.
+
+    Sessions aren't thread safe, every worker thread has its own. The
+    session is kept across deliveries so that connections to a host
+    are reused instead of being established for every delivery, the
+    connections of at most `_MAX_POOLED_HOSTS` hosts are kept.
+    """
+    session = getattr(_worker_state, "session", None)
+    if session is None:
+        session = requests.Session()
+        # A worker sends a single request at a time.
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=_MAX_POOLED_HOSTS, pool_maxsize=1
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _worker_state.session = session
+    return session
+
+
+def _get_executor() -> futures.ThreadPoolExecutor:
+    """Gets the delivery workers, which are kept across deliveries."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = futures.ThreadPoolExecutor(
+                max_workers=_MAX_CONCURRENT_DELIVERIES,
+                thread_name_prefix="webhook-delivery",
+            )
+    return _executor
+
+
+def _send_deliveree_requests(
+    requests_to_send: List[Tuple[str, requests.PreparedRequest, bool]]
+) -> Dict[str, str]:
+    """Sends the requests of a single deliveree, in order.
+
+    Once a request fails, the subsequent requests are not sent so that
+    the deliveree receives its deliveries in the order in which they
+    were scheduled.
+
+    Args:
+        requests_to_send: Ordered list of (delivery uuid, request,
+            verify_ssl) tuples.
+
+    Returns:
+        A mapping from delivery uuid to the outcome of the delivery,
+        one of "DELIVERED", "FAILED" or "SKIPPED".
+
+    """
+    outcomes = {}
+    for delivery_uuid, request, verify_ssl in requests_to_send:
+        if "FAILED" in outcomes.values():
+            outcomes[delivery_uuid] = "SKIPPED"
+            continue
+
+        try:
+            response = _get_session().send(request, verify=verify_ssl, timeout=5)
+            if response.status_code >= 200 and response.status_code <= 299:
+                logger.info(f"Delivered {delivery_uuid}.")
+                outcomes[delivery_uuid] = "DELIVERED"
+            else:
+                raise self_errors.DeliveryFailed(
+                    f"Failed to deliver {delivery_uuid}: {response.status_code}."
+                )
+        except Exception as e:
+            logger.error(e)
+            outcomes[delivery_uuid] = "FAILED"
+    return outcomes
+
+
+def _send_requests(
+    requests_by_deliveree: Dict[str, List[Tuple[str, requests.PreparedRequest, bool]]],
+) -> Dict[str, str]:
+    """Sends the requests of different deliverees concurrently.
+
+    The requests of a deliveree are sent sequentially by a single
+    worker, see `_send_deliveree_requests`, so that a slow or
+    unreachable deliveree only holds up its own deliveries.
+
+    Returns:
+        A mapping from delivery uuid to the outcome of the delivery.
+
+    """
+    outcomes = {}
+    for deliveree_outcomes in _get_executor().map(
+        _send_deliveree_requests, requests_by_deliveree.values()
+    ):
+        outcomes.update(deliveree_outcomes)
+    return outcomes
+
+
+def _claim_deliveries(
+    delivery_uuids: List[str],
+) -> Dict[str, List[Tuple[str, requests.PreparedRequest, bool]]]:
+    """Claims the due deliveries and prepares their requests.
+
+    Will commit to the database. Deliveries are claimed by postponing
+    them by `_CLAIM_DURATION`, so that other workers don't deliver them
+    concurrently, without holding their row locks while the requests
+    are sent. Postponing them all by the same duration keeps their
+    order.
+
+    Returns:
+        The requests of the claimed deliveries by deliveree, see
+        `_send_requests`.
+
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    deliveries = (
+        models.Delivery.query.with_for_update(skip_locked=True)
+        .filter(
+            models.Delivery.uuid.in_(delivery_uuids),
+            models.Delivery.status.in_(["SCHEDULED", "RESCHEDULED"]),
+            models.Delivery.scheduled_at <= now,
+        )
+        .order_by(models.Delivery.scheduled_at)
+        .all()
+    )
+    if not deliveries:
+        db.session.commit()
+        return {}
+
+    webhooks = {
+        webhook.uuid: webhook
+        for webhook in models.Webhook.query.options(
+            noload(models.Webhook.subscriptions)
+        ).filter(models.Webhook.uuid.in_({d.deliveree for d in deliveries}))
+    }
+
+    requests_by_deliveree = collections.defaultdict(list)
+    for delivery in deliveries:
+        deliveree = webhooks.get(delivery.deliveree)
+        if deliveree is None:
+            logger.error(f"Deliveree of delivery {delivery.uuid} isn't a webhook.")
+            continue
+        logger.info(f"Delivering {delivery.uuid}.")
+        request = _prepare_request(delivery, deliveree)
+        requests_by_deliveree[deliveree.uuid].append(
+            (delivery.uuid, request, deliveree.verify_ssl)
+        )
+        delivery.scheduled_at = delivery.scheduled_at + _CLAIM_DURATION
+
+    db.session.commit()
+    return requests_by_deliveree
+
+
+def _update_deliveries(outcomes: Dict[str, str]) -> None:
+    """Updates the deliveries given the outcomes of their requests.
+
+    Will commit to the database, all status updates are committed at
+    once. A failed delivery is rescheduled in the future with a capped
+    exponential backoff, the deliveries of the same deliveree that
+    were skipped because of it are rescheduled right after it to
+    preserve their order.
+
+    Args:
+        outcomes: A mapping from delivery uuid to the outcome of the
+            delivery, see `_send_deliveree_requests`.
+
+    """
+    if not outcomes:
+        return
+
+    deliveries = (
+        models.Delivery.query.filter(models.Delivery.uuid.in_(list(outcomes)))
+        .order_by(models.Delivery.scheduled_at)
+        .all()
+    )
+
+    failed_delivery = {}
+    for delivery in deliveries:
+        outcome = outcomes[delivery.uuid]
+        if outcome == "DELIVERED":
+            # Not really useful to set_delivered() atm since it will
+            # get deleted, but we might add some collateral effects or
+            # other logic to set_delivered in the future.
+            delivery.set_delivered()
+            db.session.delete(delivery)
+        elif outcome == "FAILED":
+            delivery.reschedule()
+            failed_delivery[delivery.deliveree] = delivery
+            logger.info(f"Rescheduling {delivery.uuid} at {delivery.scheduled_at}.")
+        elif outcome == "SKIPPED":
+            # Keep the order of the deliveries, the deliveries are
+            # iterated in order of scheduled_at.
+            failed = failed_delivery[delivery.deliveree]
+            delivery.status = "RESCHEDULED"
+            delivery.scheduled_at = failed.scheduled_at + datetime.timedelta(
+                microseconds=1
+            )
+            failed_delivery[delivery.deliveree] = delivery
+            logger.info(f"Rescheduling {delivery.uuid} at {delivery.scheduled_at}.")
+
+    db.session.commit()
+
+
+def deliver_many(delivery_uuids: List[str]) -> None:
+    """Delivers webhook deliveries. Will commit to the database.
+
+    Deliveries of different webhooks are sent concurrently, deliveries
+    of the same webhook are sent in order of `scheduled_at`. Deliveries
+    are claimed before being sent, see `_claim_deliveries`, and updated
+    once sent, see `_update_deliveries`.
+
+    See `deliver` for the content of a delivery.
+
+    Args:
+        delivery_uuids: Deliveries to be delivered, the associated
+            deliverees must be Webhooks.
+
+    """
+    requests_by_deliveree = _claim_deliveries(delivery_uuids)
+    if not requests_by_deliveree:
+        logger.info("No need to deliver any delivery.")
+        return
+
+    outcomes = _send_requests(requests_by_deliveree)
+    _update_deliveries(outcomes)
+
+
 def deliver(delivery_uuid: str) -> None:
     """Delivers a webhook delivery. Will commit to the database.
 
     If the delivery fails it's rescheduled in the future with a capped
-    exponential backoff. This function will commit to the database to
-    ensure that each delivery get its own transaction.
+    exponential backoff. Use `deliver_many` to deliver multiple
+    deliveries at once.
 
     The delivery is performed by sending a json or form encoded body and
     with the following headers:
@@ -299,45 +533,16 @@ def deliver(delivery_uuid: str) -> None:
         ValueError: If the associated deliveree isn't a Webhook.
 
     """
-    logger.info(f"Delivering {delivery_uuid}.")
-
-    delivery = (
-        models.Delivery.query.with_for_update(skip_locked=True)
-        .filter(
-            models.Delivery.uuid == delivery_uuid,
-            models.Delivery.status.in_(["SCHEDULED", "RESCHEDULED"]),
-        )
-        .first()
-    )
-    if delivery is None:
-        logger.info(f"No need to deliver {delivery_uuid}.")
-        return
-
-    deliveree = models.Webhook.query.filter(
-        models.Webhook.uuid == delivery.deliveree
+    delivery = models.Delivery.query.filter(
+        models.Delivery.uuid == delivery_uuid
     ).first()
-    if deliveree is None:
-        raise ValueError("Deliveree of delivery isn't of type webhook.")
-
-    request = _prepare_request(delivery, deliveree)
-
-    with requests.Session() as session:
-        try:
-            response = session.send(request, verify=deliveree.verify_ssl, timeout=5)
-            if response.status_code >= 200 and response.status_code <= 299:
-                logger.info(f"Delivered {delivery_uuid}.")
-                delivery.set_delivered()
-                # Not really useful to set_delivered() atm since it will
-                # get deleted, but we might add some collateral effects
-                # or other logic to set_delivered in the future.
-                db.session.delete(delivery)
-            else:
-                raise self_errors.DeliveryFailed(
-                    f"Failed to deliver {delivery_uuid}: {response.status_code}."
-                )
-        except Exception as e:
-            logger.error(e)
-            delivery.reschedule()
-            logger.info(f"Rescheduling {delivery_uuid} at {delivery.scheduled_at}.")
+    if delivery is not None:
+        deliveree = (
+            db.session.query(models.Webhook.uuid)
+            .filter(models.Webhook.uuid == delivery.deliveree)
+            .first()
+        )
+        if deliveree is None:
+            raise ValueError("Deliveree of delivery isn't of type webhook.")
 
-    db.session.commit()
+    deliver_many([delivery_uuid])
@@ -10,13 +10,14 @@ perform a pipeline run given a Pipeline instance and some configuration
 parameters.
 
 """
+import collections
 import json
 import os
-import time
-from typing import Any, Dict, List, Set
+from typing import Any, Dict, Iterator, List, Optional, Set
 
+import urllib3
 from celery.contrib.abortable import AbortableAsyncResult
-from kubernetes import client
+from kubernetes import client, watch
 
 import app.utils as utils
 from _orchest.internals import config as _config
@@ -26,13 +27,19 @@ from app import models
 from app.apis.namespace_jobs import UpdateJobPipelineRun
 from app.apis.namespace_runs import UpdateInteractivePipelineRun
 from app.connections import db, k8s_core_api, k8s_custom_obj_api
-from app.core import pod_scheduling
+from app.core import pod_scheduling, step_output_cache
 from app.core.pipelines import Pipeline, PipelineStep
 from app.types import RunConfig
 from config import CONFIG_CLASS
 
 logger = utils.get_logger()
 
+# Seconds after which the watch on the workflow of a pipeline run is
+# restarted if the workflow didn't change. This bounds the time it takes
+# to notice that a run has been aborted or deleted in case its workflow
+# is not terminated.
+_WORKFLOW_WATCH_TIMEOUT = 10
+
 
 def _step_to_workflow_manifest_task(
     pipeline: Pipeline, step: PipelineStep, run_config: RunConfig
@@ -383,6 +390,196 @@ def _pipeline_has_reached_end_state(run_config: Dict[str, Any], run_uuid: str) -
     return run is None or run.status in ["SUCCESS", "FAILURE", "ABORTED"]
 
 
+def _watch_workflow(namespace: str, name: str) -> Iterator[Optional[Dict[str, Any]]]:
+    """Yields the workflow with the given name every time it changes.
+
+    The workflow is listed first to get its current state and the
+    resourceVersion to watch from. The watch is resumed from the last
+    seen resourceVersion when it times out or when the connection is
+    lost. If that resourceVersion has expired, i.e. the k8s API returns
+    a 410 Gone, the workflow is listed again.
+
+    Yields:
+        The workflow, including its status, every time it changes. None
+        if it didn't change within `_WORKFLOW_WATCH_TIMEOUT` seconds.
+        The generator returns once the workflow no longer exists.
+
+    """
+    field_selector = f"metadata.name={name}"
+    resource_version = None
+    while True:
+        if resource_version is None:
+            resp = k8s_custom_obj_api.list_namespaced_custom_object(
+                "argoproj.io",
+                "v1alpha1",
+                namespace,
+                "workflows",
+                field_selector=field_selector,
+            )
+            if not resp["items"]:
+                return
+            resource_version = resp["metadata"]["resourceVersion"]
+            yield resp["items"][0]
+
+        w = watch.Watch()
+        try:
+            for event in w.stream(
+                k8s_custom_obj_api.list_namespaced_custom_object,
+                "argoproj.io",
+                "v1alpha1",
+                namespace,
+                "workflows",
+                field_selector=field_selector,
+                resource_version=resource_version,
+                timeout_seconds=_WORKFLOW_WATCH_TIMEOUT,
+            ):
+                workflow = event["object"]
+                resource_version = workflow["metadata"]["resourceVersion"]
+                if event["type"] == "DELETED":
+                    return
+                yield workflow
+        except client.rest.ApiException as e:
+            if e.status != 410:
+                raise
+            logger.info(f"Watch on workflow {name} expired, resyncing.")
+            resource_version = None
+            continue
+        except urllib3.exceptions.HTTPError as e:
+            logger.warning(f"Lost watch on workflow {name}, reconnecting: {e}.")
+            continue
+
+        yield None
+
+
+def _get_argo_node_step_uuid(
+    argo_node: Dict[str, Any], run_as_container_set: bool
+) -> Optional[str]:
+    """Returns the uuid of the step the Argo node is running.
+
+    Returns:
+        None if the node is not running a step, e.g. the node of the
+        DAG itself.
+
+    """
+    if run_as_container_set:
+        if argo_node.get("type", "") != "Container":
+            return None
+
+        # Argo doesn't allow to work with templates for a containerSet.
+        # Thus we fall back to the name we gave to steps, which includes
+        # its uuid.
+        step_uuid = argo_node.get("displayName")
+        if step_uuid is None:
+            # Should never happen.
+            raise Exception(
+                f"Did not find `displayName` in Argo workflow node: {argo_node}."
+            )
+        return step_uuid.replace("step-", "")
+
+    # The nodes includes the entire "pipeline" node.
+    if argo_node["templateName"] != "step":
+        return None
+    # The step was not run because the workflow failed.
+    if "inputs" not in argo_node:
+        return None
+    if argo_node.get("type", "") != "Pod":
+        return None
+
+    for param in argo_node["inputs"]["parameters"]:
+        if param["name"] == "step_uuid":
+            return param["value"]
+
+    # Should never happen.
+    raise Exception(
+        f"Did not find `step_uuid` in parameters of Argo node: {argo_node}."
+    )
+
+
+def _get_step_status_updates(
+    workflow: Dict[str, Any],
+    pipeline: Pipeline,
+    steps_to_start: Set[str],
+    steps_to_finish: Set[str],
+    run_as_container_set: bool,
+) -> Dict[str, List[str]]:
+    """Returns the step status transitions given the workflow state.
+
+    Args:
+        workflow: The Argo workflow, including its status.
+        pipeline: The pipeline that is being run.
+        steps_to_start: The steps that have not yet started, steps
+            that are transitioned to STARTED or an end state are
+            removed from it.
+        steps_to_finish: The steps that have not yet finished, steps
+            that are transitioned to an end state are removed from it.
+        run_as_container_set: Whether the pipeline is run as a
+            containerSet.
+
+    Returns:
+        A mapping from a step status to the UUIDs of the steps that
+        transitioned to that status. Steps that were stopped because
+        the workflow was terminated, i.e. the run was aborted, are
+        ABORTED rather than FAILURE.
+
+    """
+    status_updates: Dict[str, List[str]] = collections.defaultdict(list)
+    is_terminated = workflow.get("spec", {}).get("shutdown") is not None
+    workflow_nodes: dict = workflow.get("status", {}).get("nodes", {})
+    for argo_node in workflow_nodes.values():
+        step_uuid = _get_argo_node_step_uuid(argo_node, run_as_container_set)
+        if step_uuid is None:
+            continue
+
+        pipeline_step = pipeline.get_step(step_uuid)
+        argo_node_status = argo_node["phase"]
+        argo_node_message = argo_node.get("message", "")
+        step_status_update = None
+
+        # Argo does not fail a step if the container is stuck in a
+        # waiting state. Doesn't look like the pull backoff behavior can
+        # be tuned.
+        if (
+            argo_node_status in ["Pending", "Running"]
+            and step_uuid in steps_to_finish
+            and (
+                "ImagePullBackOff" in argo_node_message
+                or "ErrImagePull" in argo_node_message
+            )
+        ):
+            step_status_update = "FAILURE"
+
+        elif (
+            argo_node_status == "Running"
+            and step_uuid in steps_to_start
+            # Strictly speaking only needed in single-node context as
+            # otherwise Argo takes care of correctly putting a Step in
+            # "Running".
+            and _is_step_allowed_to_run(pipeline_step, steps_to_finish)
+        ):
+            step_status_update = "STARTED"
+            steps_to_start.remove(step_uuid)
+
+        elif (
+            argo_node_status in ["Succeeded", "Failed", "Error"]
+            and step_uuid in steps_to_finish
+        ):
+            step_status_update = {
+                "Succeeded": "SUCCESS",
+                "Failed": "ABORTED" if is_terminated else "FAILURE",
+                "Error": "ABORTED" if is_terminated else "FAILURE",
+            }[argo_node_status]
+
+        if step_status_update is not None:
+            if step_status_update in ["FAILURE", "ABORTED", "SUCCESS"]:
+                steps_to_finish.remove(step_uuid)
+                if step_uuid in steps_to_start:
+                    steps_to_start.remove(step_uuid)
+
+            status_updates[step_status_update].append(step_uuid)
+
+    return status_updates
+
+
 def run_pipeline_workflow(
     session_uuid: str, task_id: str, pipeline: Pipeline, *, run_config: RunConfig
 ):
@@ -392,121 +589,76 @@ def run_pipeline_workflow(
 
     steps_to_start = {step.properties["uuid"] for step in pipeline.steps}
     steps_to_finish = set(steps_to_start)
+    succeeded_steps = set()
     had_failed_steps = False
+    had_aborted_steps = False
     run_as_container_set = _run_as_container_set(pipeline)
+    cache_step_outputs = step_output_cache.is_enabled(pipeline, run_config)
     try:
-        manifest = _pipeline_to_workflow_manifest(
-            session_uuid, f"pipeline-run-task-{task_id}", pipeline, run_config
-        )
-        try:
-            k8s_custom_obj_api.create_namespaced_custom_object(
-                "argoproj.io", "v1alpha1", namespace, "workflows", body=manifest
+        if cache_step_outputs:
+            # NOTE: The keys are computed before the run since running
+            # a step can change its file, e.g. notebooks store their
+            # outputs in place.
+            step_keys = step_output_cache.compute_step_keys(pipeline, run_config)
+            cached_steps = step_output_cache.restore_cached_steps(
+                pipeline, run_config, step_keys
             )
-        # It's difficult to reproduce but it looks like that, on some
-        # cases during a restart, rabbitmq has given the task to the
-        # worker again, likely due to the worker losing connection (?).
-        # This makes it so that the workflow is not cancelled and failed
-        # unnecessarily.
-        except client.rest.ApiException as api_exception:
-            if not (
-                api_exception.status == 409 and "AlreadyExists" in api_exception.body
-            ):
-                raise api_exception
-
-        while steps_to_finish:
-            resp = k8s_custom_obj_api.get_namespaced_custom_object(
-                "argoproj.io",
-                "v1alpha1",
-                namespace,
-                "workflows",
+            if cached_steps:
+                utils.update_steps_status(task_id, cached_steps, "CACHED")
+                db.session.commit()
+                steps_to_start -= cached_steps
+                steps_to_finish -= cached_steps
+
+        # Only the steps that are not cached are part of the workflow.
+        # The entire pipeline is still used to track the status of the
+        # steps, a cached step counts as finished.
+        if steps_to_finish:
+            manifest = _pipeline_to_workflow_manifest(
+                session_uuid,
                 f"pipeline-run-task-{task_id}",
+                pipeline.get_induced_subgraph(steps_to_finish),
+                run_config,
             )
-            workflow_nodes: dict = resp.get("status", {}).get("nodes", {})
-            for argo_node in workflow_nodes.values():
-                if run_as_container_set:
-                    if argo_node.get("type", "") != "Container":
-                        continue
-
-                    # Argo doesn't allow to work with templates for a
-                    # containerSet. Thus we fall back to the name we
-                    # gave to steps, which includes its uuid.
-                    step_uuid = argo_node.get("displayName")
-                    if step_uuid is None:
-                        # Should never happen.
-                        raise Exception(
-                            "Did not find `displayName` in Argo workflow node:"
-                            f" {argo_node}."
-                        )
-                    else:
-                        step_uuid = step_uuid.replace("step-", "")
-
-                else:
-                    # The nodes includes the entire "pipeline" node.
-                    if argo_node["templateName"] != "step":
-                        continue
-                    # The step was not run because the workflow failed.
-                    if "inputs" not in argo_node:
-                        continue
-                    if argo_node.get("type", "") != "Pod":
-                        continue
-
-                    for param in argo_node["inputs"]["parameters"]:
-                        if param["name"] == "step_uuid":
-                            step_uuid = param["value"]
-                            break
-                    else:
-                        # Should never happen.
-                        raise Exception(
-                            "Did not find `step_uuid` in parameters of Argo node:"
-                            f" {argo_node}."
-                        )
-
-                pipeline_step = pipeline.get_step(step_uuid)
-                argo_node_status = argo_node["phase"]
-                argo_node_message = argo_node.get("message", "")
-                step_status_update = None
-
-                # Argo does not fail a step if the container is stuck in
-                # a waiting state. Doesn't look like the pull backoff
-                # behavior can be tuned.
-                if argo_node_status in ["Pending", "Running"] and (
-                    "ImagePullBackOff" in argo_node_message
-                    or "ErrImagePull" in argo_node_message
-                ):
-                    step_status_update = "FAILURE"
-
-                elif (
-                    argo_node_status == "Running"
-                    and step_uuid in steps_to_start
-                    # Strictly speaking only needed in single-node
-                    # context as otherwise Argo takes care of correctly
-                    # putting a Step in "Running".
-                    and _is_step_allowed_to_run(pipeline_step, steps_to_finish)
-                ):
-                    step_status_update = "STARTED"
-                    steps_to_start.remove(step_uuid)
-
-                elif (
-                    argo_node_status in ["Succeeded", "Failed", "Error"]
-                    and step_uuid in steps_to_finish
+            try:
+                k8s_custom_obj_api.create_namespaced_custom_object(
+                    "argoproj.io", "v1alpha1", namespace, "workflows", body=manifest
+                )
+            # It's difficult to reproduce but it looks like that, on
+            # some cases during a restart, rabbitmq has given the task
+            # to the worker again, likely due to the worker losing
+            # connection (?). This makes it so that the workflow is not
+            # cancelled and failed unnecessarily.
+            except client.rest.ApiException as api_exception:
+                if not (
+                    api_exception.status == 409
+                    and "AlreadyExists" in api_exception.body
                 ):
-                    step_status_update = {
-                        "Succeeded": "SUCCESS",
-                        "Failed": "FAILURE",
-                        "Error": "FAILURE",
-                    }[argo_node_status]
-
-                if step_status_update is not None:
-                    if step_status_update == "FAILURE":
-                        had_failed_steps = True
-
-                    if step_status_update in ["FAILURE", "ABORTED", "SUCCESS"]:
-                        steps_to_finish.remove(step_uuid)
-                        if step_uuid in steps_to_start:
-                            steps_to_start.remove(step_uuid)
-
-                    utils.update_steps_status(task_id, [step_uuid], step_status_update)
-                    db.session.commit()
+                    raise api_exception
+
+        # The workflow is watched rather than polled, the status of the
+        # run is only checked when the workflow changes or the watch
+        # times out. Aborting a run terminates its workflow, which
+        # wakes up the watch. The watch ends right away if there is no
+        # workflow, i.e. when all steps are cached.
+        workflows = _watch_workflow(namespace, f"pipeline-run-task-{task_id}")
+        for workflow in workflows:
+            # The transitions observed in this state of the workflow are
+            # applied at once, grouped by status, to avoid an UPDATE and
+            # commit per step for wide pipelines.
+            status_updates = _get_step_status_updates(
+                workflow if workflow is not None else {},
+                pipeline,
+                steps_to_start,
+                steps_to_finish,
+                run_as_container_set,
+            )
+            if status_updates:
+                for status, step_uuids in status_updates.items():
+                    utils.update_steps_status(task_id, step_uuids, status)
+                db.session.commit()
+            had_failed_steps = had_failed_steps or "FAILURE" in status_updates
+            had_aborted_steps = had_aborted_steps or "ABORTED" in status_updates
+            succeeded_steps.update(status_updates.get("SUCCESS", []))
 
             if not steps_to_finish or had_failed_steps:
                 break
@@ -514,14 +666,29 @@ def run_pipeline_workflow(
             if _pipeline_has_reached_end_state(run_config, task_id):
                 logger.info(f"Run {task_id} was aborted or deleted, exiting task.")
                 break
-
-            time.sleep(0.25)
+        else:
+            if steps_to_finish:
+                logger.warning(f"Workflow of run {task_id} was deleted while running.")
+        workflows.close()
 
         if steps_to_finish:
             utils.update_steps_status(task_id, steps_to_finish, "ABORTED")
             db.session.commit()
 
-        pipeline_status = "SUCCESS" if not had_failed_steps else "FAILURE"
+        if cache_step_outputs and succeeded_steps:
+            step_output_cache.store_step_outputs(run_config, step_keys, succeeded_steps)
+
+        if had_failed_steps:
+            pipeline_status = "FAILURE"
+        elif steps_to_finish or had_aborted_steps:
+            # The run was aborted, or its workflow was deleted without
+            # the run being aborted, in which case the run failed.
+            if _pipeline_has_reached_end_state(run_config, task_id):
+                pipeline_status = "ABORTED"
+            else:
+                pipeline_status = "FAILURE"
+        else:
+            pipeline_status = "SUCCESS"
         _update_pipeline_run_status(run_config, task_id, pipeline_status)
 
     except Exception as e:
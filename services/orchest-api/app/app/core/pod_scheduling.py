@@ -11,7 +11,9 @@ pushed to the registry already to schedule everything that is part of
 the "interactive" scope of Orchest (interactive pipeline runs, sessions,
 services, shells, etc.) to nodes that already have the image to avoid
 the user waiting for the image to be pulled. The "non-interactive" scope
-is less constrained.
+is less constrained. Among the nodes that have the image, the node is
+picked by a scoring strategy, by default taking into account the load of
+the nodes, the recent placements and where the project already runs.
 
 For the time being the pre-pull init container is injected in both
 interactive and non-interactive scopes, to account for the fact that k8s
@@ -21,14 +23,17 @@ For the image builder, a node selector is injected if the worker plane
 labels are defined.
 
 """
+import collections
 import json
 import random
+import threading
 import time
 from enum import Enum
 from functools import lru_cache
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, TypedDict, Union
 
 from flask import current_app
+from kubernetes.utils import parse_quantity
 
 from _orchest.internals import config as _config
 from _orchest.internals import utils as _utils
@@ -123,7 +128,266 @@ def _is_jupyter_image_in_registry(tag: Union[int, str]) -> bool:
     ).scalar()
 
 
-def _get_node_affinity_to_random_node(node_names: List[str]) -> Dict[str, Any]:
+class NodeLoad(TypedDict):
+    """The load of a node, as seen at the time of listing its pods."""
+
+    # Cores and bytes.
+    allocatable_cpu: float
+    allocatable_memory: float
+    requested_cpu: float
+    requested_memory: float
+    orchest_pods: int
+    # Number of pods of every project with pods on the node.
+    project_pods: Dict[str, int]
+
+
+def _get_pod_requests(pod) -> Tuple[float, float]:
+    """Returns the (cpu, memory) requested by a pod.
+
+    Like the k8s scheduler, init containers count through the largest
+    of their requests since they run one after the other.
+    """
+
+    def container_requests(container) -> Tuple[float, float]:
+        requests = (container.resources and container.resources.requests) or {}
+        return (
+            float(parse_quantity(requests.get("cpu", 0))),
+            float(parse_quantity(requests.get("memory", 0))),
+        )
+
+    containers = [container_requests(c) for c in pod.spec.containers or []]
+    init_containers = [container_requests(c) for c in pod.spec.init_containers or []]
+    cpu = sum(c[0] for c in containers)
+    memory = sum(c[1] for c in containers)
+    for init_cpu, init_memory in init_containers:
+        cpu = max(cpu, init_cpu)
+        memory = max(memory, init_memory)
+    return cpu, memory
+
+
+def _get_k8s_nodes_load() -> Dict[str, NodeLoad]:
+    return _get_k8s_nodes_load_cached_with_ttl(ttl_period=int(time.time() // 2))
+
+
+@lru_cache(maxsize=1)
+def _get_k8s_nodes_load_cached_with_ttl(ttl_period: int) -> Dict[str, NodeLoad]:
+    nodes_load: Dict[str, NodeLoad] = {}
+    for node in k8s_core_api.list_node().items:
+        allocatable = node.status.allocatable or {}
+        nodes_load[node.metadata.name] = {
+            "allocatable_cpu": float(parse_quantity(allocatable.get("cpu", 0))),
+            "allocatable_memory": float(parse_quantity(allocatable.get("memory", 0))),
+            "requested_cpu": 0.0,
+            "requested_memory": 0.0,
+            "orchest_pods": 0,
+            "project_pods": {},
+        }
+
+    # Pods that are done no longer hold on to their requests.
+    pods = k8s_core_api.list_pod_for_all_namespaces(
+        field_selector="status.phase!=Succeeded,status.phase!=Failed"
+    )
+    for pod in pods.items:
+        node_load = nodes_load.get(pod.spec.node_name)
+        if node_load is None:
+            continue
+        cpu, memory = _get_pod_requests(pod)
+        node_load["requested_cpu"] += cpu
+        node_load["requested_memory"] += memory
+        if pod.metadata.namespace == _config.ORCHEST_NAMESPACE:
+            node_load["orchest_pods"] += 1
+            project_uuid = (pod.metadata.labels or {}).get("project_uuid")
+            if project_uuid is not None:
+                project_pods = node_load["project_pods"]
+                project_pods[project_uuid] = project_pods.get(project_uuid, 0) + 1
+
+    return nodes_load
+
+
+class PlacementHistory:
+    """Records the nodes recently picked by this process.
+
+    The load of the nodes is cached and pods take a while to be
+    scheduled, placements which are not reflected in the load yet would
+    otherwise all end up on the same node. The history is per process,
+    concurrent processes only see each other's placements through the
+    load of the nodes.
+    """
+
+    def __init__(self, window: float = 60) -> None:
+        self.window = window
+        self._lock = threading.Lock()
+        # (time, node name, project uuid), oldest first.
+        self._placements: Deque[Tuple[float, str, Optional[str]]] = collections.deque()
+        self._last_node_of_project: Dict[str, str] = {}
+
+    def _prune(self, now: float) -> None:
+        while self._placements and self._placements[0][0] <= now - self.window:
+            self._placements.popleft()
+
+    def record(
+        self, node_name: str, project_uuid: Optional[str], now: Optional[float] = None
+    ) -> None:
+        now = time.time() if now is None else now
+        with self._lock:
+            self._prune(now)
+            self._placements.append((now, node_name, project_uuid))
+            if project_uuid is not None:
+                self._last_node_of_project[project_uuid] = node_name
+
+    def recent_placements(self, now: Optional[float] = None) -> Dict[str, float]:
+        """Returns the placements per node, decaying over the window.
+
+        A placement that just happened counts as 1, one that is about to
+        leave the window counts as almost 0.
+        """
+        now = time.time() if now is None else now
+        placements: Dict[str, float] = collections.defaultdict(float)
+        with self._lock:
+            self._prune(now)
+            for placed_at, node_name, _ in self._placements:
+                placements[node_name] += 1 - (now - placed_at) / self.window
+        return placements
+
+    def last_node_of_project(self, project_uuid: Optional[str]) -> Optional[str]:
+        if project_uuid is None:
+            return None
+        with self._lock:
+            return self._last_node_of_project.get(project_uuid)
+
+
+_placement_history = PlacementHistory()
+
+# Takes the candidate nodes, their load, the placement history, the
+# project of the pod (if any) and the current time, returns the score
+# of every candidate node, the higher the better.
+NodeScorer = Callable[
+    [List[str], Dict[str, NodeLoad], PlacementHistory, Optional[str], float],
+    Dict[str, float],
+]
+
+# Weights of the load-aware scoring, the free resources of a node are
+# worth between 0 and 1.
+_ORCHEST_POD_WEIGHT = 0.05
+_RECENT_PLACEMENT_WEIGHT = 0.1
+_LOCALITY_WEIGHT = 0.1
+
+
+def _score_nodes_randomly(
+    node_names: List[str],
+    nodes_load: Dict[str, NodeLoad],
+    history: PlacementHistory,
+    project_uuid: Optional[str],
+    now: float,
+) -> Dict[str, float]:
+    return {node: 0.0 for node in node_names}
+
+
+def _get_free_fraction(allocatable: float, requested: float) -> float:
+    if allocatable <= 0:
+        return 0.0
+    return min(max(1 - requested / allocatable, 0.0), 1.0)
+
+
+def _score_nodes_by_load(
+    node_names: List[str],
+    nodes_load: Dict[str, NodeLoad],
+    history: PlacementHistory,
+    project_uuid: Optional[str],
+    now: float,
+) -> Dict[str, float]:
+    """Scores nodes by their free resources, pods and locality.
+
+    Nodes with the most free cpu and memory, the fewest Orchest pods
+    and the fewest recent placements score best. Nodes on which the
+    project already has pods, or on which the project was last placed,
+    get a bonus since the data of the project is likely to be cached
+    there.
+    """
+    recent_placements = history.recent_placements(now)
+    last_node_of_project = history.last_node_of_project(project_uuid)
+    scores = {}
+    for node in node_names:
+        score = -_RECENT_PLACEMENT_WEIGHT * recent_placements.get(node, 0.0)
+
+        node_load = nodes_load.get(node)
+        if node_load is not None:
+            free_cpu = _get_free_fraction(
+                node_load["allocatable_cpu"], node_load["requested_cpu"]
+            )
+            free_memory = _get_free_fraction(
+                node_load["allocatable_memory"], node_load["requested_memory"]
+            )
+            score += (free_cpu + free_memory) / 2
+            score -= _ORCHEST_POD_WEIGHT * node_load["orchest_pods"]
+            has_project_pods = node_load["project_pods"].get(project_uuid, 0) > 0
+        else:
+            has_project_pods = False
+
+        if has_project_pods or node == last_node_of_project:
+            score += _LOCALITY_WEIGHT
+
+        scores[node] = score
+    return scores
+
+
+NODE_SCORERS: Dict[str, NodeScorer] = {
+    "random": _score_nodes_randomly,
+    "load-aware": _score_nodes_by_load,
+}
+
+
+def select_node(
+    node_names: List[str],
+    nodes_load: Dict[str, NodeLoad],
+    history: PlacementHistory,
+    project_uuid: Optional[str],
+    strategy: str,
+    now: Optional[float] = None,
+) -> str:
+    """Selects the node to place a pod on and records the placement.
+
+    Ties between the best scoring nodes are broken randomly.
+
+    Args:
+        node_names: The candidate nodes, can't be empty.
+        nodes_load: The load of (a subset of) the candidate nodes.
+        history: Placement history to take into account and record the
+            placement in.
+        project_uuid: The project the pod belongs to, if any.
+        strategy: One of `NODE_SCORERS`.
+        now: The current time, defaults to `time.time()`.
+
+    Returns:
+        The name of the selected node.
+
+    """
+    now = time.time() if now is None else now
+    scores = NODE_SCORERS[strategy](node_names, nodes_load, history, project_uuid, now)
+    best_score = max(scores.values())
+    best_nodes = [node for node in node_names if scores[node] >= best_score - 1e-9]
+    node = random.choice(best_nodes)
+    history.record(node, project_uuid, now)
+    return node
+
+
+def _select_node(node_names: List[str], project_uuid: Optional[str]) -> str:
+    strategy = current_app.config["NODE_SCORING_STRATEGY"]
+    if strategy == "random":
+        nodes_load = {}
+    else:
+        try:
+            nodes_load = _get_k8s_nodes_load()
+        except Exception as e:
+            # Scheduling should not fail because of the scoring.
+            logger.warning(f"Failed to get the load of the nodes: {e}.")
+            nodes_load = {}
+    return select_node(
+        node_names, nodes_load, _placement_history, project_uuid, strategy
+    )
+
+
+def _get_node_affinity_to_node(node_name: str) -> Dict[str, Any]:
     # Need to set a specific node at the application level:
     # https://github.com/kubernetes/kubernetes/issues/78238.
     return {
@@ -135,7 +399,7 @@ def _get_node_affinity_to_random_node(node_names: List[str]) -> Dict[str, Any]:
                             {
                                 "key": "metadata.name",
                                 "operator": "In",
-                                "values": [random.choice(node_names)],
+                                "values": [node_name],
                             }
                         ]
                     }
@@ -258,7 +522,12 @@ def _get_required_affinity(
                 "unforeseen state, no node affinity will be set."
             )
             return
-        return _get_node_affinity_to_random_node(ready_nodes_with_image)
+        project_uuid = None
+        if "orchest-env" in image:
+            project_uuid, _, _ = _utils.env_image_name_to_proj_uuid_env_uuid_tag(image)
+        return _get_node_affinity_to_node(
+            _select_node(ready_nodes_with_image, project_uuid)
+        )
 
     # Cases 2, 4.
     else:
@@ -274,9 +543,19 @@ def _get_required_affinity(
         return _get_node_affinity_to_label_selector(worker_plane_label_selector)
 
 
+# How many images a pre-pull init container pulls concurrently.
+_MAX_PARALLEL_PULLS = 4
+
+
 def _get_pre_pull_init_container_manifest(
-    image: str,
+    images: List[str],
 ) -> Dict[str, Any]:
+    """Gets an init container pulling the images onto the node.
+
+    The images are pulled concurrently, images that are already on the
+    node are skipped. The time it took to get every image is reported
+    in the logs of the init container.
+    """
     return {
         "name": "image-puller",
         "image": _config.CONTAINER_RUNTIME_IMAGE,
@@ -286,8 +565,12 @@ def _get_pre_pull_init_container_manifest(
         },
         "env": [
             {
-                "name": "IMAGE_TO_PULL",
-                "value": image,
+                "name": "IMAGES_TO_PULL",
+                "value": " ".join(images),
+            },
+            {
+                "name": "MAX_PARALLEL_PULLS",
+                "value": str(_MAX_PARALLEL_PULLS),
             },
             {
                 "name": "CONTAINER_RUNTIME",
@@ -324,7 +607,7 @@ def modify_pod_scheduling_behaviour(
 
     if _requires_pre_puller(image):
         init_containers = spec.get("initContainers", [])
-        init_containers.append(_get_pre_pull_init_container_manifest(image))
+        init_containers.append(_get_pre_pull_init_container_manifest([image]))
         spec["initContainers"] = init_containers
 
     required_affinity = _get_required_affinity(scope, image, plane)
@@ -346,7 +629,7 @@ def _modify_deployment_pod_scheduling_behaviour(
 
     if _requires_pre_puller(image):
         init_containers = spec.get("initContainers", [])
-        init_containers.append(_get_pre_pull_init_container_manifest(image))
+        init_containers.append(_get_pre_pull_init_container_manifest([image]))
         spec["initContainers"] = init_containers
 
     required_affinity = _get_required_affinity(scope, image, plane)
@@ -388,19 +671,16 @@ def _modify_pipeline_scheduling_behaviour_single_node(
         set([container["image"] for container in spec["containerSet"]["containers"]])
     )
 
-    # ENV_PERF_TODO: modify the pre-pull container to pull multiple
-    # images.
-    init_containers = spec.get("initContainers", [])
-    for i, img in enumerate(images):
-        init_container = _get_pre_pull_init_container_manifest(img)
-        init_container["name"] += f"-{i}"
-        init_containers.append(init_container)
-    spec["initContainers"] = init_containers
-
     # In case pipeline doesn't have any steps.
     if not images:
         return
 
+    # A single init container pulls all the images, init containers run
+    # one after the other.
+    init_containers = spec.get("initContainers", [])
+    init_containers.append(_get_pre_pull_init_container_manifest(images))
+    spec["initContainers"] = init_containers
+
     # By using only 1 image to specify affinity we are doing a bit of a
     # breach of abstraction, we are "using" the fact that we are in
     # single_node.
@@ -452,7 +732,7 @@ def _modify_pipeline_scheduling_behaviour_multi_node(
             pod_spec_patch["affinity"] = required_affinity
 
         init_containers = pod_spec_patch.get("initContainers", [])
-        init_containers.append(_get_pre_pull_init_container_manifest(image))
+        init_containers.append(_get_pre_pull_init_container_manifest([image]))
         # Quirkness of Argo? The volumes are already defined at the
         # template spec level but if they aren't set in the pod patch
         # the pod spec will be considered invalid.
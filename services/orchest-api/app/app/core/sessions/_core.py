@@ -1,9 +1,11 @@
 import time
 from contextlib import contextmanager
-from typing import Callable, List, Optional
+from typing import Callable, List, Optional, Set, Tuple
 
 import kubernetes
 import requests
+import urllib3
+from kubernetes import watch
 
 from _orchest.internals import config as _config
 from app import errors, utils
@@ -13,6 +15,8 @@ from app.types import NonInteractiveSessionConfig, SessionConfig, SessionType
 
 logger = utils.get_logger()
 
+_DEPLOYMENTS_WATCH_TIMEOUT = 5
+
 
 def launch(
     session_uuid: str,
@@ -125,84 +129,157 @@ def launch(
             )
         )
 
+    # RBAC resources are created first, so that the service accounts
+    # exist by the time the pods of the deployments are created.
+    logger.info("Creating session RBAC resources.")
+    _create_resources(
+        [(k8s_rbac_api.create_namespaced_role, m) for m in session_rbac_roles]
+        + [
+            (k8s_core_api.create_namespaced_service_account, m)
+            for m in session_rbac_service_accounts
+        ]
+        + [
+            (k8s_rbac_api.create_namespaced_role_binding, m)
+            for m in session_rbac_rolebindings
+        ]
+    )
+
+    logger.info("Creating user and orchest session services.")
+    deployment_manifests = (
+        user_session_service_k8s_deployment_manifests
+        + orchest_session_service_k8s_deployment_manifests
+    )
+    _create_resources(
+        [(k8s_apps_api.create_namespaced_deployment, m) for m in deployment_manifests]
+        + [
+            (k8s_core_api.create_namespaced_service, m)
+            for m in orchest_session_service_k8s_service_manifests
+            + user_session_service_k8s_service_manifests
+        ]
+        + [
+            (k8s_networking_api.create_namespaced_ingress, m)
+            for m in orchest_session_service_k8s_ingress_manifests
+            + user_session_service_k8s_ingress_manifests
+        ]
+    )
+
+    logger.info("Waiting for user and orchest session service deployments to be ready.")
+    _wait_for_deployments(
+        session_uuid,
+        {manifest["metadata"]["name"] for manifest in deployment_manifests},
+        should_abort,
+    )
+
+
+def _create_resources(creations: List[Tuple[Callable, dict]]) -> None:
+    """Creates resources concurrently.
+
+    Args:
+        creations: List of (create function, manifest) tuples, e.g.
+            (k8s_apps_api.create_namespaced_deployment, manifest).
+
+    Raises:
+        kubernetes.client.exceptions.ApiException: The first creation
+            that failed, once all creations have terminated.
+
+    """
     ns = _config.ORCHEST_NAMESPACE
+    threads = []
+    for create_f, manifest in creations:
+        logger.info(f'Creating {manifest["kind"]} {manifest["metadata"]["name"]}')
+        threads.append(create_f(ns, manifest, async_req=True))
 
-    logger.info("Creating session RBAC roles.")
-    for manifest in session_rbac_roles:
-        logger.info(f'Creating role {manifest["metadata"]["name"]}')
-        k8s_rbac_api.create_namespaced_role(ns, manifest)
-
-    logger.info("Creating session RBAC service accounts.")
-    for manifest in session_rbac_service_accounts:
-        logger.info(f'Creating service account {manifest["metadata"]["name"]}')
-        k8s_core_api.create_namespaced_service_account(ns, manifest)
-
-    logger.info("Creating session RBAC role bindings.")
-    for manifest in session_rbac_rolebindings:
-        logger.info(f'Creating role binding {manifest["metadata"]["name"]}')
-        k8s_rbac_api.create_namespaced_role_binding(ns, manifest)
-
-    logger.info("Creating Orchest session services deployments.")
-    for manifest in orchest_session_service_k8s_deployment_manifests:
-        logger.info(f'Creating deployment {manifest["metadata"]["name"]}')
-        k8s_apps_api.create_namespaced_deployment(
-            ns,
-            manifest,
-        )
+    # Make sure all requests have terminated before returning, also on
+    # failure, so that the caller can cleanup all created resources.
+    exceptions = []
+    for thread in threads:
+        try:
+            thread.get()
+        except Exception as e:
+            logger.error(str(e))
+            exceptions.append(e)
 
-    logger.info("Creating Orchest session services k8s services.")
-    for manifest in orchest_session_service_k8s_service_manifests:
-        logger.info(f'Creating service {manifest["metadata"]["name"]}')
-        k8s_core_api.create_namespaced_service(
-            ns,
-            manifest,
-        )
+    if exceptions:
+        raise exceptions[0]
 
-    logger.info("Creating Orchest session services k8s ingresses.")
-    for manifest in orchest_session_service_k8s_ingress_manifests:
-        logger.info(f'Creating ingress {manifest["metadata"]["name"]}')
-        k8s_networking_api.create_namespaced_ingress(
-            ns,
-            manifest,
-        )
 
-    logger.info("Creating user session services deployments.")
-    for manifest in user_session_service_k8s_deployment_manifests:
-        logger.info(f'Creating deployment {manifest["metadata"]["name"]}')
-        k8s_apps_api.create_namespaced_deployment(
-            ns,
-            manifest,
-        )
+def _is_deployment_ready(deployment: kubernetes.client.V1Deployment) -> bool:
+    return deployment.status.available_replicas == deployment.spec.replicas
 
-    logger.info("Creating user session services k8s services.")
-    for manifest in user_session_service_k8s_service_manifests:
-        logger.info(f'Creating service {manifest["metadata"]["name"]}')
-        k8s_core_api.create_namespaced_service(
-            ns,
-            manifest,
-        )
 
-    logger.info("Creating user session services k8s ingresses.")
-    for manifest in user_session_service_k8s_ingress_manifests:
-        logger.info(f'Creating ingress {manifest["metadata"]["name"]}')
-        k8s_networking_api.create_namespaced_ingress(
-            ns,
-            manifest,
-        )
+def _wait_for_deployments(
+    session_uuid: str, names: Set[str], should_abort: Callable
+) -> None:
+    """Waits for the deployments of the session to be available.
 
-    logger.info("Waiting for user and orchest session service deployments to be ready.")
-    for manifest in (
-        user_session_service_k8s_deployment_manifests
-        + orchest_session_service_k8s_deployment_manifests
-    ):
-        name = manifest["metadata"]["name"]
-        deployment = k8s_apps_api.read_namespaced_deployment_status(name, ns)
-        while deployment.status.available_replicas != deployment.spec.replicas:
-            if should_abort():
-                return
-            logger.info(f"Waiting for {name}.")
-            time.sleep(1)
-            deployment = k8s_apps_api.read_namespaced_deployment_status(name, ns)
+    The deployments are listed, then watched through a single watch
+    on the label selector of the session until they are all available.
+    The watch times out every `_DEPLOYMENTS_WATCH_TIMEOUT` seconds to
+    check `should_abort`.
+
+    Args:
+        session_uuid: The session the deployments belong to.
+        names: Names of the deployments to wait for.
+        should_abort: When it returns True, stops waiting.
+
+    Raises:
+        errors.SessionDeploymentsMissingError: If a deployment doesn't
+            exist or gets deleted while waiting, e.g. because the
+            session is being shut down.
+
+    """
+    ns = _config.ORCHEST_NAMESPACE
+    label_selector = f"session_uuid={session_uuid}"
+    not_ready = set(names)
+    resource_version = None
+    while not_ready:
+        if should_abort():
+            return
+
+        if resource_version is None:
+            deployments = k8s_apps_api.list_namespaced_deployment(
+                ns, label_selector=label_selector
+            )
+            resource_version = deployments.metadata.resource_version
+            missing = set(not_ready)
+            for deployment in deployments.items:
+                missing.discard(deployment.metadata.name)
+                if _is_deployment_ready(deployment):
+                    not_ready.discard(deployment.metadata.name)
+            if missing:
+                raise errors.SessionDeploymentsMissingError(
+                    f"Deployments {sorted(missing)} don't exist."
+                )
+            continue
+
+        logger.info(f"Waiting for {sorted(not_ready)}.")
+        w = watch.Watch()
+        try:
+            for event in w.stream(
+                k8s_apps_api.list_namespaced_deployment,
+                ns,
+                label_selector=label_selector,
+                resource_version=resource_version,
+                timeout_seconds=_DEPLOYMENTS_WATCH_TIMEOUT,
+            ):
+                deployment = event["object"]
+                name = deployment.metadata.name
+                resource_version = deployment.metadata.resource_version
+                if event["type"] == "DELETED" and name in not_ready:
+                    raise errors.SessionDeploymentsMissingError(
+                        f"Deployment {name} got deleted."
+                    )
+                if _is_deployment_ready(deployment):
+                    not_ready.discard(name)
+                if not not_ready:
+                    w.stop()
+        except kubernetes.client.exceptions.ApiException as e:
+            if e.status != 410:
+                raise
+            logger.info(f"Watch on session {session_uuid} expired, resyncing.")
+            resource_version = None
+        except urllib3.exceptions.HTTPError as e:
+            logger.warning(f"Lost watch on session {session_uuid}, reconnecting: {e}.")
 
 
 def shutdown(session_uuid: str, wait_for_completion: bool = False):
@@ -0,0 +1,274 @@
+"""Module about reusing the outputs of unchanged steps in job runs.
+
+A step is considered unchanged when its file content, its parameters,
+the pipeline parameters, its environment image, the user environment
+variables and the keys of its parents equal those of an earlier
+successful job run of the same pipeline. Such a step doesn't need to
+be executed again: its stored outputs are copied to the run directory
+and the step is marked as CACHED instead of being scheduled.
+
+Keys are computed once, before any step of the run is executed, since
+steps (notebooks in particular) write to their own file when run.
+
+The cache is opt-in through the `cache_step_outputs` pipeline setting
+and is only used by job runs (noninteractive runs), given that their
+run directories are isolated from one another.
+
+Entries are stored at:
+    <USERDIR_STEP_OUTPUT_CACHE>/<project>/<pipeline>/<step>/<key>/
+where the entry contains a copy of the data directory of the step.
+
+"""
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from typing import Dict, Iterable, List, Optional, Set
+
+from _orchest.internals import config as _config
+from _orchest.internals.utils import copytree
+from app import utils
+from app.core.pipelines import Pipeline, PipelineStep
+from app.types import RunConfig
+
+logger = utils.get_logger()
+
+
+def is_enabled(pipeline: Pipeline, run_config: RunConfig) -> bool:
+    """Returns whether step outputs should be cached for the run."""
+    return run_config["session_type"] == "noninteractive" and bool(
+        pipeline.properties["settings"].get("cache_step_outputs", False)
+    )
+
+
+def _get_step_data_dir(run_config: RunConfig, step_uuid: str) -> str:
+    # NOTE: Mirrors `Config.STEP_DATA_DIR` of the Orchest SDK, which
+    # writes the outputs of a step relative to the project directory.
+    return os.path.join(
+        run_config["project_dir"],
+        ".orchest",
+        "pipelines",
+        run_config["pipeline_uuid"],
+        "data",
+        step_uuid,
+    )
+
+
+def _get_cache_entry_dir(run_config: RunConfig, step_uuid: str, key: str) -> str:
+    return os.path.join(
+        _config.USERDIR_STEP_OUTPUT_CACHE,
+        run_config["project_uuid"],
+        run_config["pipeline_uuid"],
+        step_uuid,
+        key,
+    )
+
+
+def _hash_file(path: str) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            file_hash = hashlib.sha256()
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                file_hash.update(chunk)
+    except OSError:
+        return None
+
+    return file_hash.hexdigest()
+
+
+def compute_step_key(
+    pipeline: Pipeline,
+    step: PipelineStep,
+    run_config: RunConfig,
+    parent_keys: Dict[str, Optional[str]],
+) -> Optional[str]:
+    """Computes the cache key of a step given the current run directory.
+
+    Args:
+        pipeline: The entire pipeline.
+        step: The step to compute the key of.
+        run_config: The configuration of the run.
+        parent_keys: Mapping from step UUID to key, containing (at
+            least) the keys of the parents of the step.
+
+    Returns:
+        The hex digest identifying the step execution, None if the
+        step can't be cached, e.g. because its file doesn't exist or
+        one of its parents can't be cached.
+
+    """
+    parents = {
+        parent.properties["uuid"]: parent_keys.get(parent.properties["uuid"])
+        for parent in step.parents
+    }
+    if None in parents.values():
+        return None
+
+    step_file = os.path.join(
+        run_config["project_dir"],
+        os.path.split(run_config["pipeline_path"])[0],
+        step.properties["file_path"],
+    )
+    file_hash = _hash_file(step_file)
+    if file_hash is None:
+        return None
+
+    env_uuid_to_image: Dict[str, str] = run_config["env_uuid_to_image"]
+    description = {
+        "file": file_hash,
+        "step_parameters": step.properties.get("parameters", {}),
+        "pipeline_parameters": pipeline.get_params(),
+        "image": env_uuid_to_image.get(step.properties["environment"]),
+        "user_env_variables": run_config.get("user_env_variables", {}),
+        "parents": parents,
+    }
+    description = json.dumps(description, sort_keys=True, default=str)
+    return hashlib.sha256(description.encode("utf-8")).hexdigest()
+
+
+def _get_topological_order(pipeline: Pipeline) -> List[PipelineStep]:
+    # Steps are ordered by uuid so that the order is deterministic.
+    steps = sorted(pipeline.steps, key=lambda s: s.properties["uuid"])
+    children: Dict[str, List[PipelineStep]] = {s.properties["uuid"]: [] for s in steps}
+    for step in steps:
+        for parent in step.parents:
+            children[parent.properties["uuid"]].append(step)
+
+    in_degree = {s.properties["uuid"]: len(s.parents) for s in steps}
+    order = [s for s in steps if not s.parents]
+    for step in order:
+        for child in children[step.properties["uuid"]]:
+            in_degree[child.properties["uuid"]] -= 1
+            if in_degree[child.properties["uuid"]] == 0:
+                order.append(child)
+    return order
+
+
+def compute_step_keys(
+    pipeline: Pipeline, run_config: RunConfig
+) -> Dict[str, Optional[str]]:
+    """Computes the cache keys of all the steps of the pipeline.
+
+    Must be called before the steps are executed, the keys are then
+    passed to `restore_cached_steps` and `store_step_outputs`.
+
+    Returns:
+        A mapping from step UUID to key, see `compute_step_key`.
+
+    """
+    keys: Dict[str, Optional[str]] = {}
+    for step in _get_topological_order(pipeline):
+        step_uuid = step.properties["uuid"]
+        try:
+            keys[step_uuid] = compute_step_key(pipeline, step, run_config, keys)
+        except Exception as e:
+            logger.error(f"Failed to compute the cache key of step {step_uuid}: {e}")
+            keys[step_uuid] = None
+    return keys
+
+
+def restore_cached_steps(
+    pipeline: Pipeline, run_config: RunConfig, step_keys: Dict[str, Optional[str]]
+) -> Set[str]:
+    """Restores the outputs of unchanged steps to the run directory.
+
+    Steps are visited in topological order, a step can only be a cache
+    hit if all its parents are. Otherwise the outputs of a parent will
+    be recomputed during the run, which might change the outputs of
+    the step.
+
+    Args:
+        pipeline: The entire pipeline.
+        run_config: The configuration of the run.
+        step_keys: The keys of the steps, see `compute_step_keys`.
+
+    Returns:
+        The UUIDs of the steps whose outputs have been restored, these
+        steps don't need to be executed.
+
+    """
+    cached_steps = set()
+    for step in _get_topological_order(pipeline):
+        step_uuid = step.properties["uuid"]
+        if any(p.properties["uuid"] not in cached_steps for p in step.parents):
+            continue
+
+        try:
+            key = step_keys.get(step_uuid)
+            if key is None:
+                continue
+            entry_dir = _get_cache_entry_dir(run_config, step_uuid, key)
+            if not os.path.isdir(entry_dir):
+                continue
+
+            # NOTE: The outputs are copied instead of hardlinked since
+            # the SDK overwrites outputs in place, which would corrupt
+            # the cache entry if the step is ever run interactively
+            # from the run directory.
+            step_data_dir = _get_step_data_dir(run_config, step_uuid)
+            shutil.rmtree(step_data_dir, ignore_errors=True)
+            os.makedirs(os.path.dirname(step_data_dir), exist_ok=True)
+            copytree(entry_dir, step_data_dir)
+        except Exception as e:
+            logger.error(f"Failed to restore cached outputs of step {step_uuid}: {e}")
+            continue
+
+        cached_steps.add(step_uuid)
+
+    return cached_steps
+
+
+def store_step_outputs(
+    run_config: RunConfig,
+    step_keys: Dict[str, Optional[str]],
+    step_uuids: Iterable[str],
+) -> None:
+    """Stores the outputs of successfully executed steps.
+
+    Failing to store an entry is not fatal for the pipeline run, the
+    step will simply be executed again in the next run.
+
+    Args:
+        run_config: The configuration of the run.
+        step_keys: The keys of the steps as computed before the run,
+            see `compute_step_keys`.
+        step_uuids: UUIDs of the steps that have been executed
+            successfully during the run.
+
+    """
+    for step_uuid in step_uuids:
+        try:
+            key = step_keys.get(step_uuid)
+            if key is None:
+                continue
+            entry_dir = _get_cache_entry_dir(run_config, step_uuid, key)
+            if os.path.isdir(entry_dir):
+                continue
+
+            # Copy to a temporary directory first so that a partially
+            # written entry is never picked up by a concurrent run of
+            # the same job.
+            tmp_dir = f"{entry_dir}.tmp-{uuid.uuid4()}"
+            os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+            step_data_dir = _get_step_data_dir(run_config, step_uuid)
+            if os.path.isdir(step_data_dir):
+                copytree(step_data_dir, tmp_dir)
+            else:
+                os.makedirs(tmp_dir)
+
+            try:
+                os.rename(tmp_dir, entry_dir)
+            except OSError:
+                # Another run stored the same entry in the meantime.
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        except Exception as e:
+            logger.error(f"Failed to store outputs of step {step_uuid}: {e}")
+
+
+def delete_project_cache(project_uuid: str) -> None:
+    """Deletes all the cached step outputs of a project."""
+    shutil.rmtree(
+        os.path.join(_config.USERDIR_STEP_OUTPUT_CACHE, project_uuid),
+        ignore_errors=True,
+    )
@@ -12,7 +12,6 @@ from celery.utils.log import get_task_logger
 from kubernetes import client
 
 from _orchest.internals import config as _config
-from _orchest.internals.utils import copytree
 from app import create_app
 from app import errors as self_errors
 from app import models, utils
@@ -99,14 +98,19 @@ def run_pipeline(
         raise
     finally:
         # We get here either because the task was successful or was
-        # aborted, in any case, delete the workflow.
-        k8s_custom_obj_api.delete_namespaced_custom_object(
-            "argoproj.io",
-            "v1alpha1",
-            _config.ORCHEST_NAMESPACE,
-            "workflows",
-            f"pipeline-run-task-{task_id}",
-        )
+        # aborted, in any case, delete the workflow. The workflow does
+        # not exist if all steps of the run were cached.
+        try:
+            k8s_custom_obj_api.delete_namespaced_custom_object(
+                "argoproj.io",
+                "v1alpha1",
+                _config.ORCHEST_NAMESPACE,
+                "workflows",
+                f"pipeline-run-task-{task_id}",
+            )
+        except client.rest.ApiException as e:
+            if e.status != 404:
+                raise
 
     # The celery task has completed successfully. This is not related to
     # the success or failure of the pipeline itself.
@@ -150,10 +154,18 @@ def start_non_interactive_pipeline_run(
         project_uuid, pipeline_uuid, job_uuid, self.request.id
     )
 
-    # Copy the contents of `snapshot_dir` to the new (not yet existing
-    # folder) `run_dir`. No need to use_gitignore since the snapshot
-    # was copied with use_gitignore=True.
-    copytree(snapshot_dir, run_dir, use_gitignore=False)
+    with application.app_context():
+        run_dir_mode = utils.OrchestSettings()["JOB_RUN_DIRECTORY_MODE"]
+    pipeline_dir = os.path.dirname(run_config["pipeline_path"])
+    utils.create_job_run_dir(
+        snapshot_dir,
+        run_dir,
+        run_dir_mode,
+        step_file_paths=[
+            os.path.join(pipeline_dir, step["file_path"])
+            for step in pipeline_definition["steps"].values()
+        ],
+    )
 
     # Update the `run_config` for the interactive pipeline run. The
     # pipeline run should execute on the `run_dir` as its
@@ -173,8 +185,11 @@ def start_non_interactive_pipeline_run(
 
     # Overwrite the `pipeline.json`, that was copied from the snapshot,
     # with the new `pipeline.json` that contains the new parameters for
-    # every step.
+    # every step. The file is replaced instead of written in place
+    # given that it might be hardlinked to the snapshot.
     pipeline_json = os.path.join(run_dir, run_config["pipeline_path"])
+    if os.path.exists(pipeline_json):
+        os.remove(pipeline_json)
     with open(pipeline_json, "w") as f:
         json.dump(pipeline_definition, f, indent=4, sort_keys=True)
 
@@ -254,7 +269,12 @@ def delete_job_pipeline_run_directories(
     job_uuid: str,
     pipeline_run_uuids: List[str],
 ) -> str:
-    """Deletes a list of job pipeline run directories given uuids."""
+    """Deletes a list of job pipeline run directories given uuids.
+
+    Hardlinked run directories, see `_create_job_run_dir`, are deleted
+    the same way: removing a run directory only unlinks its files, the
+    snapshot and the other runs are unaffected.
+    """
     job_dir = os.path.join("/userdir", "jobs", project_uuid, pipeline_uuid, job_uuid)
     for ppl_run_uuid in pipeline_run_uuids:
         shutil.rmtree(os.path.join(job_dir, ppl_run_uuid), ignore_errors=True)
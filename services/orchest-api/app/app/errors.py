@@ -25,6 +25,10 @@ class SessionCleanupFailedError(Exception):
     pass
 
 
+class SessionDeploymentsMissingError(Exception):
+    pass
+
+
 class PodNeverReachedExpectedStatusError(Exception):
     pass
 
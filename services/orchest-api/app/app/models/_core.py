@@ -252,6 +252,11 @@ class EnvironmentImageBuild(BaseModel):
         nullable=True,
     )
 
+    # Fingerprint of the environment definition the image has been
+    # built from, reported by the build on success. See
+    # `environment_image_builds.get_environment_fingerprint`.
+    fingerprint = db.Column(db.String(64), nullable=True)
+
     __table_args__ = (
         Index("uuid_proj_env_index", "project_uuid", "environment_uuid"),
         # To find the latest tag.
@@ -330,6 +335,12 @@ class EnvironmentImage(BaseModel):
         server_default="True",
     )
 
+    # Fingerprint of the environment definition the image has been
+    # built from, None if unknown, e.g. because the setup script
+    # depends on the entire project. Used to avoid building an image
+    # that would be equivalent to this one.
+    fingerprint = db.Column(db.String(64), nullable=True)
+
     __table_args__ = (
         # To find all images of the environment of a project.
         Index(None, "project_uuid", "environment_uuid"),
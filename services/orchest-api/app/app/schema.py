@@ -81,6 +81,33 @@ projects = Model(
     {"projects": fields.List(fields.Nested(project), description="All projects")},
 )
 
+project_entity_counts = Model(
+    "ProjectEntityCounts",
+    {
+        "project_uuid": fields.String(required=True, description="UUID of project"),
+        "job_count": fields.Integer(required=True, description="Number of jobs"),
+        "active_job_count": fields.Integer(
+            required=True, description="Number of pending or started jobs"
+        ),
+        "session_count": fields.Integer(
+            required=True, description="Number of interactive sessions"
+        ),
+        "pipeline_count": fields.Integer(
+            required=True, description="Number of pipelines"
+        ),
+    },
+)
+
+projects_entity_counts = Model(
+    "ProjectsEntityCounts",
+    {
+        "projects": fields.List(
+            fields.Nested(project_entity_counts),
+            description="Entity counts of all projects",
+        )
+    },
+)
+
 environment = Model(
     "Environment",
     {
@@ -339,7 +366,7 @@ pipeline_run_pipeline_step = Model(
         "status": fields.String(
             required=True,
             description="Status of the step",
-            enum=_task_statuses,
+            enum=_task_statuses + ["CACHED"],
         ),
         "started_time": fields.String(
             required=True, description="Time at which the step started executing"
@@ -424,6 +451,10 @@ status_update = Model(
             required=False,
             description="Node on which the build took place.",
         ),
+        "fingerprint": fields.String(
+            required=False,
+            description="Fingerprint of the environment definition that was built.",
+        ),
     },
 )
 
@@ -706,6 +737,14 @@ environment_image_build_request = Model(
             required=True, description="UUID of the environment"
         ),
         "project_path": fields.String(required=True, description="Project path"),
+        "skip_if_unchanged": fields.Boolean(
+            required=False,
+            default=False,
+            description=(
+                "Do not build the environment if its latest image has been "
+                "built from the same environment definition."
+            ),
+        ),
     },
 )
 
@@ -30,6 +30,8 @@ class PipelineSettings(TypedDict):
     auto_eviction: bool
     data_passing_memory_size: str  # 1GB and similar.
     max_steps_parallelism: int
+    # Whether to reuse the outputs of unchanged steps in job runs.
+    cache_step_outputs: bool
 
 
 class ServiceDefinition(TypedDict):
@@ -1,6 +1,7 @@
 import logging
 import os
 import re
+import shutil
 import time
 import uuid
 from collections import ChainMap
@@ -24,9 +25,10 @@ from sqlalchemy.sql.functions import coalesce
 import app.models as models
 from _orchest.internals import config as _config
 from _orchest.internals import errors as _errors
+from _orchest.internals.utils import copytree, linktree
 from app import errors as self_errors
 from app import types as app_types
-from app.connections import db, k8s_core_api
+from app.connections import db, k8s_core_api, k8s_custom_obj_api
 from config import CONFIG_CLASS
 
 
@@ -81,7 +83,7 @@ def update_status_db(
             if data.get("started_time") is not None
             else datetime.utcnow()
         )
-    elif data["status"] in ["SUCCESS", "FAILURE"]:
+    elif data["status"] in ["SUCCESS", "FAILURE", "CACHED"]:
         data["finished_time"] = (
             datetime.fromisoformat(data["finished_time"])
             if data.get("finished_time") is not None
@@ -218,6 +220,27 @@ def wait_for_pod_status(
         raise self_errors.PodNeverReachedExpectedStatusError()
 
 
+def terminate_pipeline_run_workflow(run_uuid: str) -> None:
+    """Terminates the Argo workflow of a pipeline run, if it exists.
+
+    Terminating the workflow stops its running steps and notifies the
+    celery task of the run, which is watching the workflow.
+    """
+    try:
+        k8s_custom_obj_api.patch_namespaced_custom_object(
+            "argoproj.io",
+            "v1alpha1",
+            _config.ORCHEST_NAMESPACE,
+            "workflows",
+            f"pipeline-run-task-{run_uuid}",
+            body={"spec": {"shutdown": "Terminate"}},
+        )
+    except k8s_client.ApiException as e:
+        # The workflow does not exist (yet) or has already been deleted.
+        if e.status != 404:
+            raise
+
+
 def fuzzy_filter_non_interactive_pipeline_runs(
     query: query,
     fuzzy_filter: str,
@@ -441,6 +464,15 @@ class OrchestSettings:
             "condition": None,
             "apply-runtime-changes-function": lambda prev, new: False,
         },
+        # How the directories of job pipeline runs are created from the
+        # job snapshot, see `tasks.start_non_interactive_pipeline_run`.
+        "JOB_RUN_DIRECTORY_MODE": {
+            "default": "copy",
+            "type": str,
+            "condition": lambda x: x in ["copy", "hardlink"],
+            "condition-msg": 'one of ["copy", "hardlink"]',
+            "apply-runtime-changes-function": lambda prev, new: True,
+        },
         # When True, Orchest is paused, which currently means that the
         # job scheduler will not run.
         "PAUSED": {
@@ -819,6 +851,101 @@ def get_job_run_dir_path(
     return os.path.join(job_dir, run_uuid)
 
 
+def _unshare_files(run_dir: str, paths: Iterable[str]) -> None:
+    """Replaces hardlinked files of a run directory by copies."""
+    paths = {os.path.normpath(path) for path in paths}
+    for root, dirs, files in os.walk(run_dir):
+        if root == run_dir and ".orchest" in dirs:
+            # Copied already.
+            dirs.remove(".orchest")
+        paths.update(
+            os.path.relpath(os.path.join(root, name), run_dir)
+            for name in files
+            if name.endswith(".ipynb")
+        )
+
+    for path in paths:
+        if os.path.isabs(path) or path.startswith(os.pardir):
+            continue
+        path = os.path.join(run_dir, path)
+        if not os.path.isfile(path) or os.path.islink(path):
+            continue
+        tmp_path = f"{path}.tmp-{uuid.uuid4()}"
+        shutil.copy2(path, tmp_path)
+        os.replace(tmp_path, path)
+
+
+def _get_unshared_snapshot(snapshot_dir: str) -> str:
+    """Returns a copy of the snapshot that run directories can link to.
+
+    The files of a job snapshot are hardlinks to the blob store of the
+    project, see `blob_store.create_snapshot`, which is shared with the
+    snapshots of the other jobs of the project and with environment
+    image builds. Run directories are thus linked to a copy of the
+    snapshot that belongs to the job, which is created once, next to
+    the snapshot.
+    """
+    unshared_dir = f"{snapshot_dir}-unshared"
+    if os.path.isdir(unshared_dir):
+        return unshared_dir
+
+    # Runs of the job are created concurrently, the copy is made under
+    # a temporary name so that it is only used once complete.
+    tmp_dir = f"{unshared_dir}.tmp-{uuid.uuid4()}"
+    try:
+        copytree(snapshot_dir, tmp_dir, use_gitignore=False)
+        os.rename(tmp_dir, unshared_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        # Another run created the copy in the meantime.
+        if not os.path.isdir(unshared_dir):
+            raise
+    return unshared_dir
+
+
+def create_job_run_dir(
+    snapshot_dir: str,
+    run_dir: str,
+    mode: str,
+    step_file_paths: Iterable[str] = (),
+) -> None:
+    """Creates the directory of a job pipeline run from the snapshot.
+
+    Args:
+        snapshot_dir: The snapshot of the job.
+        run_dir: The not yet existing directory of the run.
+        mode: "copy" to copy the snapshot or "hardlink" to hardlink
+            the files of a copy of the snapshot that is private to the
+            job, see `JOB_RUN_DIRECTORY_MODE` and
+            `_get_unshared_snapshot`. In "hardlink" mode, the
+            `.orchest` directory, which contains the step outputs and
+            logs, the step files and the notebooks are copied, since
+            the run writes to them in place, e.g. a notebook runner
+            stores the outputs of the notebook in it.
+        step_file_paths: The paths of the files of the steps of the
+            pipeline, relative to the run directory.
+
+    """
+    if mode == "hardlink":
+        try:
+            linktree(_get_unshared_snapshot(snapshot_dir), run_dir)
+            run_orchest_dir = os.path.join(run_dir, ".orchest")
+            if os.path.isdir(run_orchest_dir):
+                shutil.rmtree(run_orchest_dir)
+                copytree(os.path.join(snapshot_dir, ".orchest"), run_orchest_dir)
+            _unshare_files(run_dir, step_file_paths)
+            return
+        except OSError as e:
+            # E.g. the file system doesn't support hardlinks.
+            logger.error(f"Failed to hardlink {snapshot_dir}, copying instead: {e}")
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+    # Copy the contents of `snapshot_dir` to the new (not yet existing
+    # folder) `run_dir`. No need to use_gitignore since the snapshot
+    # was copied with use_gitignore=True.
+    copytree(snapshot_dir, run_dir, use_gitignore=False)
+
+
 def get_env_vars_update(
     old_env_vars: Dict[str, str], new_env_vars: Dict[str, str]
 ) -> List[app_types.Change]:
@@ -0,0 +1,211 @@
+"""Replays pod placements against a fake node inventory.
+
+Simulates interactive pods, e.g. sessions and kernels, arriving at a
+cluster of nodes that have background load, and places every pod with
+each of the node scoring strategies of `app.core.pod_scheduling`.
+Like in the orchest-api, the scoring only sees the load of the nodes
+as it was when the load was last cached. The same seeded trace is
+replayed for every strategy so that the results are comparable.
+
+Usage, from the directory containing this module:
+    python -m benchmarks.node_scoring --nodes 6 --pods 500
+
+"""
+import argparse
+import json
+import random
+import statistics
+from typing import Dict, List, Optional
+
+from app.core import pod_scheduling
+
+# (cpu, memory) requested by a pod and its weight in the trace.
+_POD_SIZES = [
+    ((0.5, 1 * 2**30), 6),
+    ((2.0, 4 * 2**30), 3),
+    ((4.0, 16 * 2**30), 1),
+]
+
+
+def _make_inventory(n_nodes: int, rng: random.Random) -> Dict[str, dict]:
+    inventory = {}
+    for i in range(n_nodes):
+        large = i % 3 == 0
+        cpu, memory = (16.0, 64 * 2**30) if large else (8.0, 32 * 2**30)
+        inventory[f"node-{i}"] = {
+            "allocatable_cpu": cpu,
+            "allocatable_memory": memory,
+            # Load of workloads other than Orchest.
+            "background_cpu": rng.uniform(0, 0.3) * cpu,
+            "background_memory": rng.uniform(0, 0.3) * memory,
+        }
+    return inventory
+
+
+def _make_trace(
+    n_pods: int,
+    n_projects: int,
+    node_names: List[str],
+    mean_interval: float,
+    mean_duration: float,
+    rng: random.Random,
+) -> List[dict]:
+    # The image of a project is only on some of the nodes.
+    nodes_with_image = {
+        f"project-{i}": sorted(
+            rng.sample(node_names, max(1, (len(node_names) * 2 + 2) // 3))
+        )
+        for i in range(n_projects)
+    }
+    sizes, weights = zip(*_POD_SIZES)
+    trace = []
+    now = 0.0
+    for _ in range(n_pods):
+        now += rng.expovariate(1 / mean_interval)
+        project_uuid = f"project-{rng.randrange(n_projects)}"
+        cpu, memory = rng.choices(sizes, weights)[0]
+        trace.append(
+            {
+                "time": now,
+                "duration": rng.expovariate(1 / mean_duration),
+                "project_uuid": project_uuid,
+                "candidates": nodes_with_image[project_uuid],
+                "cpu": cpu,
+                "memory": memory,
+            }
+        )
+    return trace
+
+
+def _get_nodes_load(
+    inventory: Dict[str, dict], running: List[dict]
+) -> Dict[str, pod_scheduling.NodeLoad]:
+    nodes_load = {}
+    for node, info in inventory.items():
+        nodes_load[node] = {
+            "allocatable_cpu": info["allocatable_cpu"],
+            "allocatable_memory": info["allocatable_memory"],
+            "requested_cpu": info["background_cpu"],
+            "requested_memory": info["background_memory"],
+            "orchest_pods": 0,
+            "project_pods": {},
+        }
+    for pod in running:
+        node_load = nodes_load[pod["node"]]
+        node_load["requested_cpu"] += pod["cpu"]
+        node_load["requested_memory"] += pod["memory"]
+        node_load["orchest_pods"] += 1
+        project_pods = node_load["project_pods"]
+        project_pods[pod["project_uuid"]] = project_pods.get(pod["project_uuid"], 0) + 1
+    return nodes_load
+
+
+def replay(
+    strategy: str,
+    inventory: Dict[str, dict],
+    trace: List[dict],
+    cache_ttl: float,
+    seed: int,
+) -> dict:
+    """Places the pods of the trace and returns placement statistics."""
+    # Ties are broken through the global random module.
+    random.seed(seed)
+    history = pod_scheduling.PlacementHistory()
+    running: List[dict] = []
+    cached_load: Optional[Dict[str, pod_scheduling.NodeLoad]] = None
+    cached_at = float("-inf")
+
+    cpu_spreads = []
+    peak_cpu_utilization = 0.0
+    peak_pods_on_node = 0
+    local_placements = 0
+    for pod in trace:
+        now = pod["time"]
+        running = [p for p in running if p["time"] + p["duration"] > now]
+        if now - cached_at >= cache_ttl:
+            cached_load = _get_nodes_load(inventory, running)
+            cached_at = now
+
+        previous_nodes = {
+            p["node"] for p in running if p["project_uuid"] == pod["project_uuid"]
+        }
+        node = pod_scheduling.select_node(
+            pod["candidates"],
+            cached_load,
+            history,
+            pod["project_uuid"],
+            strategy,
+            now=now,
+        )
+        local_placements += node in previous_nodes
+        running.append(dict(pod, node=node))
+
+        # Measure the actual, not the cached, load after the placement.
+        nodes_load = _get_nodes_load(inventory, running)
+        utilizations = [
+            load["requested_cpu"] / load["allocatable_cpu"]
+            for load in nodes_load.values()
+        ]
+        cpu_spreads.append(max(utilizations) - min(utilizations))
+        peak_cpu_utilization = max(peak_cpu_utilization, max(utilizations))
+        peak_pods_on_node = max(
+            peak_pods_on_node, max(load["orchest_pods"] for load in nodes_load.values())
+        )
+
+    return {
+        "strategy": strategy,
+        "pods": len(trace),
+        "mean_cpu_utilization_spread": round(statistics.mean(cpu_spreads), 4),
+        "peak_cpu_utilization": round(peak_cpu_utilization, 4),
+        "peak_pods_on_node": peak_pods_on_node,
+        "local_placements": round(local_placements / len(trace), 4),
+    }
+
+
+def main(
+    n_nodes: int,
+    n_pods: int,
+    n_projects: int,
+    mean_interval: float,
+    mean_duration: float,
+    cache_ttl: float,
+    seed: int,
+) -> List[dict]:
+    rng = random.Random(seed)
+    inventory = _make_inventory(n_nodes, rng)
+    trace = _make_trace(
+        n_pods, n_projects, list(inventory), mean_interval, mean_duration, rng
+    )
+    results = []
+    for strategy in pod_scheduling.NODE_SCORERS:
+        result = replay(strategy, inventory, trace, cache_ttl, seed)
+        results.append(result)
+        print(json.dumps(result))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=6)
+    parser.add_argument("--pods", type=int, default=500)
+    parser.add_argument("--projects", type=int, default=10)
+    parser.add_argument(
+        "--mean-interval", type=float, default=5, help="Seconds between pods."
+    )
+    parser.add_argument(
+        "--mean-duration", type=float, default=120, help="Seconds a pod runs."
+    )
+    parser.add_argument(
+        "--cache-ttl", type=float, default=2, help="Seconds the load is cached."
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(
+        args.nodes,
+        args.pods,
+        args.projects,
+        args.mean_interval,
+        args.mean_duration,
+        args.cache_ttl,
+        args.seed,
+    )
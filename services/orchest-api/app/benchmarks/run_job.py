@@ -0,0 +1,187 @@
+"""Benchmarks the start of a job against its number of runs.
+
+Records the latency of `RunJob`, i.e. the time during which the job is
+locked to create its pipeline runs and their steps, for jobs with an
+increasing number of parameter combinations. Celery is replaced by a
+stand-in that records the sent tasks, so that only the orchest-api and
+its database are measured.
+
+Expects a postgres database service to be running, like the tests do,
+a new database is created and dropped at the end of the benchmark.
+
+Usage, from the directory containing this module:
+    python -m benchmarks.run_job --combinations 10 100 1000 2000
+
+"""
+import argparse
+import contextlib
+import copy
+import json
+import os
+import statistics
+import time
+import uuid
+from typing import Iterator, List
+
+from flask_migrate import upgrade
+from sqlalchemy_utils import drop_database
+
+from app import create_app, models
+from app.apis import namespace_jobs
+from app.connections import db
+from config import CONFIG_CLASS
+
+_PIPELINE_STEPS = 10
+
+
+class _CeleryStandIn:
+    def __init__(self):
+        self.sent_tasks = []
+
+    @contextlib.contextmanager
+    def producer_or_acquire(self, producer=None):
+        yield producer
+
+    def send_task(self, name, kwargs, task_id, **_):
+        self.sent_tasks.append(task_id)
+        return self
+
+    def forget(self):
+        pass
+
+
+def _pipeline_definition(pipeline_uuid: str) -> dict:
+    steps = {}
+    for i in range(_PIPELINE_STEPS):
+        step_uuid = str(uuid.uuid4())
+        steps[step_uuid] = {
+            "uuid": step_uuid,
+            "title": f"step-{i}",
+            "file_path": f"step-{i}.py",
+            "environment": "env-uuid",
+            "incoming_connections": [],
+            "parameters": {"alpha": 0},
+        }
+    return {
+        "name": "benchmark",
+        "uuid": pipeline_uuid,
+        "settings": {},
+        "parameters": {"learning_rate": 0.1},
+        "steps": steps,
+    }
+
+
+def _create_job(n_combinations: int) -> str:
+    project_uuid = str(uuid.uuid4())
+    pipeline_uuid = str(uuid.uuid4())
+    snapshot_uuid = str(uuid.uuid4())
+    job_uuid = str(uuid.uuid4())
+
+    pipeline_definition = _pipeline_definition(pipeline_uuid)
+    step_uuid = next(iter(pipeline_definition["steps"]))
+    parameters = [
+        {"pipeline_parameters": {"learning_rate": i}, step_uuid: {"alpha": i}}
+        for i in range(n_combinations)
+    ]
+
+    db.session.add(models.Project(uuid=project_uuid, name=project_uuid))
+    db.session.flush()
+    db.session.add(
+        models.Pipeline(uuid=pipeline_uuid, project_uuid=project_uuid, name="p")
+    )
+    db.session.add(
+        models.Snapshot(
+            uuid=snapshot_uuid,
+            project_uuid=project_uuid,
+            pipelines={},
+            project_env_variables={},
+            pipelines_env_variables={},
+        )
+    )
+    db.session.flush()
+    db.session.add(
+        models.Job(
+            uuid=job_uuid,
+            name="benchmark",
+            pipeline_name="benchmark",
+            project_uuid=project_uuid,
+            pipeline_uuid=pipeline_uuid,
+            snapshot_uuid=snapshot_uuid,
+            parameters=parameters,
+            pipeline_definition=pipeline_definition,
+            pipeline_run_spec={
+                "run_type": "full",
+                "uuids": [],
+                "run_config": {},
+            },
+            env_variables={},
+            status="PENDING",
+            strategy_json={},
+        )
+    )
+    db.session.commit()
+    return job_uuid
+
+
+@contextlib.contextmanager
+def _benchmark_app() -> Iterator:
+    config = copy.deepcopy(CONFIG_CLASS)
+    db_host = os.environ.get("ORCHEST_TEST_DATABASE_HOST", "localhost")
+    db_port = os.environ.get("ORCHEST_TEST_DATABASE_PORT", "5432")
+    db_name = "benchmark_" + uuid.uuid4().hex
+    config.SQLALCHEMY_DATABASE_URI = (
+        f"postgresql://postgres@{db_host}:{db_port}/{db_name}"
+    )
+    config.TESTING = True
+
+    try:
+        # NOTE: The app is only initialized up to its database, the
+        # rest of the initialization requires a k8s cluster.
+        app = create_app(config, to_migrate_db=True)
+        with app.app_context():
+            upgrade()
+        app.config["CELERY"] = _CeleryStandIn()
+        yield app
+    finally:
+        drop_database(config.SQLALCHEMY_DATABASE_URI)
+
+
+def main(combinations: List[int], repeat: int) -> List[dict]:
+    results = []
+    with _benchmark_app() as app, app.app_context():
+        for n_combinations in combinations:
+            latencies = []
+            for _ in range(repeat):
+                job_uuid = _create_job(n_combinations)
+                start = time.perf_counter()
+                with namespace_jobs.TwoPhaseExecutor(db.session) as tpe:
+                    namespace_jobs.RunJob(tpe).transaction(job_uuid)
+                latencies.append(time.perf_counter() - start)
+
+                runs = models.NonInteractivePipelineRun.query.filter_by(
+                    job_uuid=job_uuid
+                ).count()
+                assert runs == n_combinations, (runs, n_combinations)
+
+            result = {
+                "combinations": n_combinations,
+                "steps_per_run": _PIPELINE_STEPS,
+                "median_seconds": round(statistics.median(latencies), 4),
+                "runs_per_second": round(
+                    n_combinations / statistics.median(latencies), 1
+                ),
+            }
+            results.append(result)
+            print(json.dumps(result))
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--combinations", nargs="+", type=int, default=[10, 100, 1000, 2000]
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    main(args.combinations, args.repeat)
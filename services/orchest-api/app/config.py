@@ -37,6 +37,10 @@ class Config:
     SQLALCHEMY_DATABASE_URI = "postgresql://postgres@orchest-database/orchest_api"
 
     WORKER_PLANE_SELECTOR = _get_worker_plane_selector()
+    # How to pick among the nodes that have the image of a pod which is
+    # constrained to such nodes, see `NODE_SCORERS` in
+    # `app.core.pod_scheduling`.
+    NODE_SCORING_STRATEGY = os.environ.get("NODE_SCORING_STRATEGY", "load-aware")
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
@@ -69,6 +73,13 @@ class Config:
 
     BUILD_IMAGE_LOG_FLAG = "_ORCHEST_RESERVED_LOG_FLAG_"
     BUILD_IMAGE_ERROR_FLAG = "_ORCHEST_RESERVED_ERROR_FLAG_"
+    # What is part of the build context of environment images: either
+    # "project", i.e. the entire project, or "dependencies", i.e. only
+    # the files the setup script depends on, so that editing other
+    # files doesn't invalidate the cached layer of the setup script.
+    # Environments whose setup script declares its build context are
+    # always built with the latter.
+    ENV_IMAGE_BUILD_CONTEXT = os.environ.get("ENV_IMAGE_BUILD_CONTEXT", "project")
 
     # ---- Celery configurations ----
     # NOTE: the configurations have to be lowercase.
@@ -0,0 +1,31 @@
+"""Add EnvironmentImageBuild and EnvironmentImage fingerprint fields
+
+Revision ID: 9e3b5c1d7a24
+Revises: 4d5dab2f4bda
+Create Date: 2023-02-06 10:21:37.118294
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9e3b5c1d7a24"
+down_revision = "4d5dab2f4bda"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "environment_image_builds",
+        sa.Column("fingerprint", sa.String(length=64), nullable=True),
+    )
+    op.add_column(
+        "environment_images",
+        sa.Column("fingerprint", sa.String(length=64), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_column("environment_images", "fingerprint")
+    op.drop_column("environment_image_builds", "fingerprint")
@@ -71,17 +71,22 @@ def _git_clone_project(
             )
         )
 
-        # GETting the /async/projects endpoint triggers the discovering
-        # of projects that have been created or deleted through the file
-        # system, so that Orchest can re-sync projects.
-        # The task is considered done once the project has been
-        # discovered or if the project has been renamed/deleted (doesn't
-        # exist anymore at the desired path.). The project not being
-        # part of the projects returned by /async/projects is a rare
-        # occurrence that can happen if a concurrent request is leading
-        # to the discovery of the same project, which puts it in a
-        # INITIALIZING status.
-        for _ in range(5):
+        # POSTing to the /async/projects/rescan endpoint queues the
+        # discovering of projects that have been created or deleted
+        # through the file system, so that Orchest can re-sync projects.
+        # The discovery runs in the background. The task is considered
+        # done once the project has been discovered or if the project
+        # has been renamed/deleted (doesn't exist anymore at the desired
+        # path.). The project not being part of the projects returned by
+        # /async/projects can also happen if a concurrent request is
+        # leading to the discovery of the same project, which puts it in
+        # a INITIALIZING status.
+        for _ in range(10):
+            resp = requests.post("http://orchest-webserver/async/projects/rescan")
+            if resp.status_code not in [200, 202]:
+                time.sleep(1)
+                continue
+
             resp = requests.get("http://orchest-webserver/async/projects")
             if resp.status_code != 200:
                 time.sleep(1)
@@ -1,10 +1,11 @@
 import datetime
 
 import pytest
-from tests.test_utils import create_job_spec
+from tests.test_utils import create_job_spec, create_pipeline_run_spec
 
 from _orchest.internals.test_utils import raise_exception_function
 from _orchest.internals.two_phase_executor import TwoPhaseExecutor
+from app import models
 from app.apis import namespace_jobs
 from app.connections import db
 
@@ -211,6 +212,51 @@ def test_job_put_on_draft(
         assert job["env_variables"] == env_variables
 
 
+def test_job_put_on_draft_creates_runs_in_bulk(
+    test_app, client, celery, pipeline, monkeypatch
+):
+    monkeypatch.setitem(test_app.config, "CELERY", celery)
+    monkeypatch.setattr(namespace_jobs, "_SEND_TASKS_CHUNK_SIZE", 2)
+    n_runs, n_steps = 5, 3
+    job_spec = create_job_spec(
+        pipeline.project.uuid,
+        pipeline.uuid,
+        pipeline_run_spec=create_pipeline_run_spec(
+            pipeline.project.uuid, pipeline.uuid, n_steps=n_steps
+        ),
+    )
+    job_uuid = client.post("/api/jobs/", json=job_spec).get_json()["uuid"]
+
+    resp = client.put(
+        f"/api/jobs/{job_uuid}",
+        json={"parameters": [{"i": i} for i in range(n_runs)], "confirm_draft": True},
+    )
+
+    assert resp.status_code == 200
+    with test_app.app_context():
+        runs = models.NonInteractivePipelineRun.query.filter_by(job_uuid=job_uuid).all()
+        assert len(runs) == n_runs
+        assert sorted(run.job_run_pipeline_run_index for run in runs) == list(
+            range(n_runs)
+        )
+        run_uuids = {run.uuid for run in runs}
+        steps = models.PipelineRunStep.query.filter(
+            models.PipelineRunStep.run_uuid.in_(run_uuids)
+        ).all()
+        assert len(steps) == n_runs * n_steps
+        events = models.OneOffJobPipelineRunEvent.query.filter_by(
+            job_uuid=job_uuid, type="project:one-off-job:pipeline-run:created"
+        ).all()
+        assert {event.pipeline_run_uuid for event in events} == run_uuids
+        assert len(events) == n_runs
+
+    # The tasks are sent in chunks, each over its own producer.
+    assert {task_kwargs["task_id"] for _, task_kwargs in celery.tasks} == run_uuids
+    assert len(celery.producers) == 3
+    producers = [task_kwargs["producer"] for _, task_kwargs in celery.tasks]
+    assert producers == [celery.producers[i // 2] for i in range(n_runs)]
+
+
 def test_job_put_on_non_draft_non_cronjob(client, pipeline):
     job_spec = create_job_spec(pipeline.project.uuid, pipeline.uuid)
     job_uuid = client.post("/api/jobs/", json=job_spec).get_json()["uuid"]
@@ -64,6 +64,37 @@ def test_project_put(client):
     assert data == project
 
 
+def test_project_entity_counts(client, job, interactive_session):
+    project_uuid = job.project.uuid
+    other_project_uuid = gen_uuid()
+    client.post("/api/projects/", json={"uuid": other_project_uuid})
+
+    data = client.get("/api/projects/entity-counts").get_json()["projects"]
+
+    assert sorted(data, key=lambda counts: counts["project_uuid"] != project_uuid) == [
+        {
+            "project_uuid": project_uuid,
+            "job_count": 1,
+            # The job is a draft.
+            "active_job_count": 0,
+            "session_count": 1,
+            "pipeline_count": 1,
+        },
+        {
+            "project_uuid": other_project_uuid,
+            "job_count": 0,
+            "active_job_count": 0,
+            "session_count": 0,
+            "pipeline_count": 0,
+        },
+    ]
+
+    data = client.get(
+        "/api/projects/entity-counts", query_string={"project_uuid": project_uuid}
+    ).get_json()["projects"]
+    assert [counts["project_uuid"] for counts in data] == [project_uuid]
+
+
 def test_project_delete_non_existing(client):
     resp = client.delete(f"/api/projects/{gen_uuid()}")
 
@@ -0,0 +1,251 @@
+import json
+import os
+
+import pytest
+
+from _orchest.internals import config as _config
+from app.core import environment_image_builds
+from config import CONFIG_CLASS
+
+
+def _write(root, path, content=""):
+    path = os.path.join(root, path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+    return path
+
+
+@pytest.fixture
+def project(tmp_path):
+    project_path = str(tmp_path)
+    for path in [
+        "requirements.txt",
+        "notebook.ipynb",
+        "reqs/dev.txt",
+        "scripts/install.sh",
+        "scripts/data/lookup.csv",
+    ]:
+        _write(project_path, path)
+    return project_path
+
+
+@pytest.mark.parametrize(
+    "setup_script,mode,expected",
+    [
+        ("pip install -r reqs/dev.txt\n", "project", None),
+        (
+            "# orchest-build-context: scripts/data\n",
+            "project",
+            ["requirements.txt", "scripts/data"],
+        ),
+        (
+            "pip install --requirement=reqs/dev.txt # notebook.ipynb\n"
+            "bash ./scripts/install.sh\n"
+            "ls /etc $HOME/missing ../outside\n",
+            "dependencies",
+            ["reqs/dev.txt", "requirements.txt", "scripts/install.sh"],
+        ),
+        ("pip install .\n", "dependencies", None),
+    ],
+    ids=["project", "declared", "detected", "project-dir"],
+)
+def test_get_setup_script_context_paths(
+    project, tmp_path_factory, monkeypatch, setup_script, mode, expected
+):
+    monkeypatch.setattr(CONFIG_CLASS, "ENV_IMAGE_BUILD_CONTEXT", mode)
+    setup_script_path = _write(
+        str(tmp_path_factory.mktemp("env")), "setup_script.sh", setup_script
+    )
+
+    paths = environment_image_builds.get_setup_script_context_paths(
+        project, setup_script_path
+    )
+
+    assert paths == expected
+
+
+def test_get_setup_script_context_paths_follows_scripts(project, monkeypatch):
+    monkeypatch.setattr(CONFIG_CLASS, "ENV_IMAGE_BUILD_CONTEXT", "dependencies")
+    _write(project, "scripts/install.sh", "cp scripts/data/lookup.csv /tmp\n")
+    setup_script_path = _write(project, "setup.sh", "bash scripts/install.sh\n")
+
+    paths = environment_image_builds.get_setup_script_context_paths(
+        project, setup_script_path
+    )
+
+    assert paths == [
+        "requirements.txt",
+        "scripts/data/lookup.csv",
+        "scripts/install.sh",
+    ]
+
+
+@pytest.mark.parametrize(
+    "context_paths,expected_copies",
+    [
+        (None, ["COPY . ."]),
+        (
+            ["requirements.txt", "my dir"],
+            [
+                'COPY ["requirements.txt", "./requirements.txt"]',
+                'COPY ["my dir", "./my dir"]',
+                'COPY ["setup.sh", "./setup.sh"]',
+            ],
+        ),
+    ],
+)
+def test_write_environment_dockerfile_copies(tmp_path, context_paths, expected_copies):
+    dockerfile_path = str(tmp_path / "Dockerfile")
+
+    environment_image_builds.write_environment_dockerfile(
+        "python",
+        "task-uuid",
+        "project-uuid",
+        "env-uuid",
+        "/project-dir",
+        "setup.sh",
+        dockerfile_path,
+        context_paths,
+    )
+
+    with open(dockerfile_path) as f:
+        statements = f.read().splitlines()
+    assert [s for s in statements if s.startswith("COPY")] == expected_copies
+    # The setup script runs after everything has been copied.
+    run_index = next(i for i, s in enumerate(statements) if s.startswith("RUN"))
+    assert all(not s.startswith("COPY") for s in statements[run_index:])
+
+
+def _write_environment(project_path, setup_script, base_image="python", name="Python"):
+    environment_path = os.path.join(".orchest", "environments", "env-uuid")
+    _write(
+        project_path,
+        os.path.join(environment_path, "properties.json"),
+        json.dumps({"uuid": "env-uuid", "name": name, "base_image": base_image}),
+    )
+    _write(
+        project_path, os.path.join(environment_path, "setup_script.sh"), setup_script
+    )
+
+
+def test_get_environment_fingerprint(project, monkeypatch):
+    monkeypatch.setattr(CONFIG_CLASS, "ENV_IMAGE_BUILD_CONTEXT", "dependencies")
+    _write_environment(project, "pip install -r reqs/dev.txt\n")
+
+    def fingerprint():
+        return environment_image_builds.get_environment_fingerprint(project, "env-uuid")
+
+    initial = fingerprint()
+    assert initial is not None and initial == fingerprint()
+
+    # Files the setup script doesn't depend on don't matter, neither do
+    # environment properties other than the base image.
+    _write(project, "notebook.ipynb", "{}")
+    _write_environment(project, "pip install -r reqs/dev.txt\n", name="Renamed")
+    assert fingerprint() == initial
+
+    _write(project, "reqs/dev.txt", "numpy\n")
+    changed_dependencies = fingerprint()
+    assert changed_dependencies != initial
+
+    _write_environment(project, "pip install -r reqs/dev.txt\n", "r-base")
+    assert fingerprint() not in [initial, changed_dependencies]
+
+
+def test_get_environment_fingerprint_entire_project(
+    project, tmp_path_factory, monkeypatch
+):
+    monkeypatch.setattr(CONFIG_CLASS, "ENV_IMAGE_BUILD_CONTEXT", "project")
+    monkeypatch.setattr(
+        _config, "USERDIR_BLOB_STORE", str(tmp_path_factory.mktemp("blob-store"))
+    )
+    _write_environment(project, "pip install -r requirements.txt\n")
+    _write(project, ".gitignore", "ignored/\n")
+
+    def fingerprint():
+        return environment_image_builds.get_environment_fingerprint(
+            project, "env-uuid", "project-uuid"
+        )
+
+    assert (
+        environment_image_builds.get_environment_fingerprint(project, "env-uuid")
+        is None
+    )
+    initial = fingerprint()
+    assert initial is not None and initial == fingerprint()
+
+    # Files that are not part of the build context don't matter.
+    _write(project, "ignored/data.csv", "1,2")
+    _write(project, ".orchest/pipelines/pipeline-uuid/logs/step.log", "log")
+    assert fingerprint() == initial
+
+    _write(project, "notebook.ipynb", "{}")
+    assert fingerprint() != initial
+
+
+def test_get_environment_fingerprint_project_files_cache(
+    project, tmp_path_factory, monkeypatch
+):
+    monkeypatch.setattr(CONFIG_CLASS, "ENV_IMAGE_BUILD_CONTEXT", "project")
+    monkeypatch.setattr(
+        _config, "USERDIR_BLOB_STORE", str(tmp_path_factory.mktemp("blob-store"))
+    )
+    _write_environment(project, "pip install -r requirements.txt\n")
+    expected = environment_image_builds.get_environment_fingerprint(
+        project, "env-uuid", "project-uuid"
+    )
+    calls = []
+    get_project_files = environment_image_builds.blob_store.get_project_files
+    monkeypatch.setattr(
+        environment_image_builds.blob_store,
+        "get_project_files",
+        lambda *args: calls.append(args) or get_project_files(*args),
+    )
+    cache = {}
+
+    for _ in range(2):
+        assert (
+            environment_image_builds.get_environment_fingerprint(
+                project, "env-uuid", "project-uuid", project_files_cache=cache
+            )
+            == expected
+        )
+
+    assert len(calls) == 1
+    assert list(cache) == [project]
+
+
+def test_prepare_build_context_shares_project_snapshot(
+    project, tmp_path_factory, monkeypatch
+):
+    monkeypatch.setattr(CONFIG_CLASS, "ENV_IMAGE_BUILD_CONTEXT", "project")
+    userdir = tmp_path_factory.mktemp("userdir")
+    monkeypatch.setattr(_config, "USERDIR_PROJECTS", os.path.dirname(project))
+    monkeypatch.setattr(_config, "USERDIR_ENV_IMG_BUILDS", str(userdir / "builds"))
+    monkeypatch.setattr(_config, "USERDIR_BLOB_STORE", str(userdir / "blob-store"))
+    monkeypatch.setattr(
+        environment_image_builds, "_SHARED_SNAPSHOTS_DIR", str(userdir / "shared")
+    )
+    _write_environment(project, "pip install -r requirements.txt\n")
+    args = ["project-uuid", "env-uuid", os.path.basename(project)]
+
+    first = environment_image_builds.prepare_build_context("task-1", *args)
+    second = environment_image_builds.prepare_build_context("task-2", *args)
+
+    snapshot_path = first["snapshot_path"]
+    assert first["shared_snapshot"]
+    assert second["snapshot_path"] == snapshot_path
+    assert first["dockerfile_path"] != second["dockerfile_path"]
+    # The fingerprint taken from the snapshot matches the one of the
+    # project, which is used to skip unchanged builds.
+    assert first["fingerprint"] is not None
+    assert first["fingerprint"] == environment_image_builds.get_environment_fingerprint(
+        project, "env-uuid", "project-uuid"
+    )
+    assert os.path.isfile(os.path.join(snapshot_path, "scripts/data/lookup.csv"))
+
+    environment_image_builds.release_build_context("task-1", "project-uuid", first)
+    assert os.path.isdir(snapshot_path)
+    environment_image_builds.release_build_context("task-2", "project-uuid", second)
+    assert not os.path.exists(snapshot_path)
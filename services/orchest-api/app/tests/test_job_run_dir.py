@@ -0,0 +1,106 @@
+import os
+
+import pytest
+
+from app import utils
+
+
+def _write(root, path, content):
+    path = os.path.join(root, path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def _read(root, path):
+    with open(os.path.join(root, path)) as f:
+        return f.read()
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path):
+    snapshot_dir = str(tmp_path / "snapshot")
+    for path in [
+        "pipelines/step.py",
+        "pipelines/notebook.ipynb",
+        "notebooks/other.ipynb",
+        "data/input.csv",
+        ".orchest/pipelines/pipeline-uuid/logs/step.log",
+    ]:
+        _write(snapshot_dir, path, "snapshot")
+    return snapshot_dir
+
+
+@pytest.mark.parametrize("mode", ["copy", "hardlink"])
+def test_create_job_run_dir(snapshot_dir, tmp_path, mode):
+    run_dir = str(tmp_path / "run")
+
+    utils.create_job_run_dir(
+        snapshot_dir,
+        run_dir,
+        mode,
+        step_file_paths=["pipelines/step.py", "pipelines/notebook.ipynb"],
+    )
+
+    # Files the run writes to in place don't share their inode with
+    # the snapshot.
+    for path in [
+        "pipelines/step.py",
+        "pipelines/notebook.ipynb",
+        "notebooks/other.ipynb",
+        ".orchest/pipelines/pipeline-uuid/logs/step.log",
+    ]:
+        assert _read(run_dir, path) == "snapshot"
+        _write(run_dir, path, "run")
+        assert _read(snapshot_dir, path) == "snapshot"
+
+    assert _read(run_dir, "data/input.csv") == "snapshot"
+    assert not os.path.samefile(
+        os.path.join(snapshot_dir, "data/input.csv"),
+        os.path.join(run_dir, "data/input.csv"),
+    )
+
+
+def test_create_job_run_dir_hardlink(snapshot_dir, tmp_path):
+    # The files of the snapshot are links to the blob store.
+    blob = str(tmp_path / "blob")
+    os.link(os.path.join(snapshot_dir, "data/input.csv"), blob)
+    run_dirs = [str(tmp_path / "run-1"), str(tmp_path / "run-2")]
+
+    for run_dir in run_dirs:
+        utils.create_job_run_dir(snapshot_dir, run_dir, "hardlink")
+
+    # Runs share the files of a copy of the snapshot that is private to
+    # the job.
+    assert os.path.samefile(
+        os.path.join(run_dirs[0], "data/input.csv"),
+        os.path.join(run_dirs[1], "data/input.csv"),
+    )
+    assert os.path.samefile(
+        os.path.join(run_dirs[0], "data/input.csv"),
+        os.path.join(f"{snapshot_dir}-unshared", "data/input.csv"),
+    )
+
+    with open(os.path.join(run_dirs[0], "data/input.csv"), "a") as f:
+        f.write(" appended")
+    assert _read(run_dirs[1], "data/input.csv") == "snapshot appended"
+    assert _read(snapshot_dir, "data/input.csv") == "snapshot"
+    with open(blob) as f:
+        assert f.read() == "snapshot"
+    assert not [p for p in os.listdir(tmp_path) if ".tmp-" in p]
+
+
+def test_create_job_run_dir_ignores_paths_outside_of_run_dir(snapshot_dir, tmp_path):
+    run_dir = str(tmp_path / "run")
+
+    utils.create_job_run_dir(
+        snapshot_dir,
+        run_dir,
+        "hardlink",
+        step_file_paths=["../snapshot/data/input.csv", "/data/missing.py"],
+    )
+
+    assert os.path.samefile(
+        os.path.join(f"{snapshot_dir}-unshared", "data/input.csv"),
+        os.path.join(run_dir, "data/input.csv"),
+    )
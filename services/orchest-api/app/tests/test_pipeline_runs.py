@@ -0,0 +1,358 @@
+import pytest
+import urllib3
+from kubernetes import client
+from tests.test_utils import FakeWatchResponse
+
+from app.core import pipeline_runs
+from app.core.pipelines import Pipeline
+
+
+class FakeCustomObjectsApi:
+    """Stand-in for the k8s custom objects API serving one workflow.
+
+    Every watch request serves the next batch of `watches`, a batch
+    being a list of watch events, after which the watch times out.
+    """
+
+    def __init__(self, workflow, watches):
+        self.workflow = workflow
+        self.watches = list(watches)
+        self.list_calls = []
+        self.watch_calls = []
+
+    def list_namespaced_custom_object(
+        self, group, version, namespace, plural, **kwargs
+    ):
+        """Lists or watches custom objects.
+
+        :return: object
+        """
+        if not kwargs.get("watch"):
+            self.list_calls.append(kwargs)
+            items = [] if self.workflow is None else [self.workflow]
+            return {"metadata": {"resourceVersion": "1"}, "items": items}
+
+        self.watch_calls.append(kwargs)
+        if not self.watches:
+            raise Exception("Watched more often than expected.")
+        return FakeWatchResponse(self.watches.pop(0))
+
+    def create_namespaced_custom_object(self, group, version, namespace, plural, body):
+        pass
+
+
+def _workflow(resource_version, phase=None):
+    nodes = {}
+    if phase is not None:
+        nodes["node"] = {
+            "templateName": "step",
+            "type": "Pod",
+            "phase": phase,
+            "inputs": {"parameters": [{"name": "step_uuid", "value": "uuid-1"}]},
+        }
+    return {
+        "metadata": {"name": "wf", "resourceVersion": resource_version},
+        "status": {"nodes": nodes},
+    }
+
+
+def _event(type_, resource_version, phase=None):
+    return {"type": type_, "object": _workflow(resource_version, phase)}
+
+
+def _watch(fake_api, monkeypatch, n):
+    monkeypatch.setattr(pipeline_runs, "k8s_custom_obj_api", fake_api)
+    workflows = pipeline_runs._watch_workflow("orchest", "wf")
+    return [next(workflows) for _ in range(n)], workflows
+
+
+def _phase(workflow):
+    if workflow is None:
+        return None
+    return workflow["status"]["nodes"].get("node", {}).get("phase")
+
+
+def test_watch_workflow_resumes_from_last_resource_version(monkeypatch):
+    fake_api = FakeCustomObjectsApi(
+        _workflow("1", "Pending"),
+        [
+            [_event("MODIFIED", "2", "Running")],
+            [_event("MODIFIED", "3", "Succeeded")],
+        ],
+    )
+
+    workflows, _ = _watch(fake_api, monkeypatch, 5)
+
+    # None is yielded every time the watch times out.
+    assert [_phase(w) for w in workflows] == [
+        "Pending",
+        "Running",
+        None,
+        "Succeeded",
+        None,
+    ]
+    assert [c["resource_version"] for c in fake_api.watch_calls] == ["1", "2"]
+    assert len(fake_api.list_calls) == 1
+
+
+def test_watch_workflow_reconnects_on_connection_loss(monkeypatch):
+    fake_api = FakeCustomObjectsApi(
+        _workflow("1", "Pending"),
+        [
+            [_event("MODIFIED", "2", "Running"), urllib3.exceptions.ProtocolError()],
+            [_event("MODIFIED", "3", "Succeeded")],
+        ],
+    )
+
+    workflows, _ = _watch(fake_api, monkeypatch, 3)
+
+    assert [_phase(w) for w in workflows] == ["Pending", "Running", "Succeeded"]
+    assert [c["resource_version"] for c in fake_api.watch_calls] == ["1", "2"]
+    assert len(fake_api.list_calls) == 1
+
+
+def test_watch_workflow_resyncs_when_expired(monkeypatch):
+    expired = {
+        "type": "ERROR",
+        "object": {"code": 410, "reason": "Expired", "message": "too old"},
+    }
+    fake_api = FakeCustomObjectsApi(
+        _workflow("1"), [[expired], [_event("MODIFIED", "2", "Running")]]
+    )
+
+    workflows, _ = _watch(fake_api, monkeypatch, 3)
+
+    assert [w["metadata"]["resourceVersion"] for w in workflows] == ["1", "1", "2"]
+    assert len(fake_api.list_calls) == 2
+
+
+def test_watch_workflow_ends_when_deleted(monkeypatch):
+    fake_api = FakeCustomObjectsApi(_workflow("1"), [[_event("DELETED", "2")]])
+
+    _, workflows = _watch(fake_api, monkeypatch, 1)
+
+    with pytest.raises(StopIteration):
+        next(workflows)
+
+
+def test_watch_workflow_ends_when_missing(monkeypatch):
+    fake_api = FakeCustomObjectsApi(None, [])
+
+    monkeypatch.setattr(pipeline_runs, "k8s_custom_obj_api", fake_api)
+
+    assert list(pipeline_runs._watch_workflow("orchest", "wf")) == []
+
+
+def test_watch_workflow_raises_api_errors(monkeypatch):
+    forbidden = {
+        "type": "ERROR",
+        "object": {"code": 403, "reason": "Forbidden", "message": "nope"},
+    }
+    fake_api = FakeCustomObjectsApi(_workflow("1"), [[forbidden]])
+
+    with pytest.raises(client.rest.ApiException):
+        _watch(fake_api, monkeypatch, 2)
+
+
+@pytest.mark.parametrize(
+    "argo_node,run_as_container_set,expected",
+    [
+        (_workflow("1", "Running")["status"]["nodes"]["node"], False, "uuid-1"),
+        ({"templateName": "pipeline", "type": "DAG"}, False, None),
+        ({"type": "Container", "displayName": "step-uuid-1"}, True, "uuid-1"),
+        ({"type": "Pod", "displayName": "pipeline"}, True, None),
+    ],
+)
+def test_get_argo_node_step_uuid(argo_node, run_as_container_set, expected):
+    step_uuid = pipeline_runs._get_argo_node_step_uuid(argo_node, run_as_container_set)
+    assert step_uuid == expected
+
+
+def _step_node(step_uuid, phase, message=""):
+    return {
+        "templateName": "step",
+        "type": "Pod",
+        "phase": phase,
+        "message": message,
+        "inputs": {"parameters": [{"name": "step_uuid", "value": step_uuid}]},
+    }
+
+
+def test_get_step_status_updates_groups_by_status():
+    pipeline = Pipeline.from_json(
+        {
+            "name": "pipeline-name",
+            "uuid": "pipeline-uuid",
+            "settings": {},
+            "steps": {
+                f"uuid-{i}": {
+                    "incoming_connections": [] if i < 4 else ["uuid-1"],
+                    "title": f"step-{i}",
+                    "uuid": f"uuid-{i}",
+                }
+                for i in range(1, 6)
+            },
+        }
+    )
+    steps_to_start = {"uuid-2", "uuid-3", "uuid-4", "uuid-5"}
+    steps_to_finish = {"uuid-1", "uuid-2", "uuid-3", "uuid-4", "uuid-5"}
+    workflow = {
+        "status": {
+            "nodes": {
+                "pipeline": {"templateName": "pipeline", "type": "DAG"},
+                "1": _step_node("uuid-1", "Succeeded"),
+                "2": _step_node("uuid-2", "Succeeded"),
+                "3": _step_node("uuid-3", "Running"),
+                "4": _step_node("uuid-4", "Pending", "ErrImagePull"),
+                "5": _step_node("uuid-5", "Running"),
+            }
+        }
+    }
+
+    status_updates = pipeline_runs._get_step_status_updates(
+        workflow, pipeline, steps_to_start, steps_to_finish, False
+    )
+
+    assert dict(status_updates) == {
+        "SUCCESS": ["uuid-1", "uuid-2"],
+        "STARTED": ["uuid-3", "uuid-5"],
+        "FAILURE": ["uuid-4"],
+    }
+    assert steps_to_start == set()
+    assert steps_to_finish == {"uuid-3", "uuid-5"}
+
+    # Transitions are only reported once.
+    assert not pipeline_runs._get_step_status_updates(
+        workflow, pipeline, steps_to_start, steps_to_finish, False
+    )
+
+
+def _pipeline(n_steps):
+    return Pipeline.from_json(
+        {
+            "name": "pipeline-name",
+            "uuid": "pipeline-uuid",
+            "settings": {},
+            "steps": {
+                f"uuid-{i}": {
+                    "incoming_connections": [],
+                    "title": f"step-{i}",
+                    "uuid": f"uuid-{i}",
+                }
+                for i in range(1, n_steps + 1)
+            },
+        }
+    )
+
+
+def test_get_step_status_updates_terminated_workflow():
+    pipeline = _pipeline(3)
+    steps_to_start = set()
+    steps_to_finish = {"uuid-1", "uuid-2", "uuid-3"}
+    workflow = {
+        "spec": {"shutdown": "Terminate"},
+        "status": {
+            "nodes": {
+                "1": _step_node("uuid-1", "Succeeded"),
+                "2": _step_node("uuid-2", "Failed", "Stopped with strategy"),
+                "3": _step_node("uuid-3", "Error"),
+            }
+        },
+    }
+
+    status_updates = pipeline_runs._get_step_status_updates(
+        workflow, pipeline, steps_to_start, steps_to_finish, False
+    )
+
+    assert dict(status_updates) == {
+        "SUCCESS": ["uuid-1"],
+        "ABORTED": ["uuid-2", "uuid-3"],
+    }
+    assert steps_to_finish == set()
+
+
+class FakeSession:
+    def commit(self):
+        pass
+
+
+@pytest.fixture
+def run_workflow(monkeypatch):
+    """Runs a pipeline of one step of which the workflow is watched.
+
+    Returns the status of the run and of its steps.
+    """
+    run_status = []
+    steps_status = {}
+
+    def update_steps_status(task_id, step_uuids, status):
+        for step_uuid in step_uuids:
+            steps_status[step_uuid] = status
+
+    monkeypatch.setattr(
+        pipeline_runs,
+        "_update_pipeline_run_status",
+        lambda run_config, task_id, status: run_status.append(status),
+    )
+    monkeypatch.setattr(pipeline_runs.utils, "update_steps_status", update_steps_status)
+    monkeypatch.setattr(pipeline_runs.db, "session", FakeSession())
+    monkeypatch.setattr(pipeline_runs, "_run_as_container_set", lambda p: False)
+    monkeypatch.setattr(
+        pipeline_runs.step_output_cache, "is_enabled", lambda p, r: False
+    )
+    monkeypatch.setattr(
+        pipeline_runs, "_pipeline_to_workflow_manifest", lambda *args: {}
+    )
+
+    def _run_workflow(fake_api, aborted=False):
+        monkeypatch.setattr(pipeline_runs, "k8s_custom_obj_api", fake_api)
+        monkeypatch.setattr(
+            pipeline_runs,
+            "_pipeline_has_reached_end_state",
+            lambda run_config, task_id: aborted,
+        )
+        pipeline_runs.run_pipeline_workflow(
+            "session-uuid",
+            "task-id",
+            _pipeline(1),
+            run_config={"session_type": "interactive"},
+        )
+        return run_status[1:], steps_status
+
+    return _run_workflow
+
+
+def test_run_pipeline_workflow_success(run_workflow):
+    fake_api = FakeCustomObjectsApi(
+        _workflow("1", "Running"), [[_event("MODIFIED", "2", "Succeeded")]]
+    )
+
+    run_status, steps_status = run_workflow(fake_api)
+
+    assert run_status == ["SUCCESS"]
+    assert steps_status == {"uuid-1": "SUCCESS"}
+
+
+@pytest.mark.parametrize(
+    "aborted,expected_status", [(False, "FAILURE"), (True, "ABORTED")]
+)
+def test_run_pipeline_workflow_deleted(run_workflow, aborted, expected_status):
+    fake_api = FakeCustomObjectsApi(
+        _workflow("1", "Running"), [[_event("DELETED", "2", "Running")]]
+    )
+
+    run_status, steps_status = run_workflow(fake_api, aborted)
+
+    assert run_status == [expected_status]
+    assert steps_status == {"uuid-1": "ABORTED"}
+
+
+def test_run_pipeline_workflow_terminated(run_workflow):
+    terminated = _event("MODIFIED", "2", "Failed")
+    terminated["object"]["spec"] = {"shutdown": "Terminate"}
+    fake_api = FakeCustomObjectsApi(_workflow("1", "Running"), [[terminated]])
+
+    run_status, steps_status = run_workflow(fake_api, aborted=True)
+
+    assert run_status == ["ABORTED"]
+    assert steps_status == {"uuid-1": "ABORTED"}
@@ -0,0 +1,111 @@
+from kubernetes import client
+
+from app.core import pod_scheduling
+
+
+def _load(requested_cpu=0.0, orchest_pods=0, project_pods=None):
+    return {
+        "allocatable_cpu": 8.0,
+        "allocatable_memory": 32.0,
+        "requested_cpu": requested_cpu,
+        "requested_memory": 0.0,
+        "orchest_pods": orchest_pods,
+        "project_pods": project_pods or {},
+    }
+
+
+def _select(nodes_load, history, project_uuid=None, now=0.0):
+    return pod_scheduling.select_node(
+        sorted(nodes_load), nodes_load, history, project_uuid, "load-aware", now
+    )
+
+
+def test_select_node_prefers_free_resources():
+    history = pod_scheduling.PlacementHistory()
+    nodes_load = {"a": _load(6.0), "b": _load(1.0), "c": _load(4.0)}
+
+    assert _select(nodes_load, history) == "b"
+
+
+def test_select_node_prefers_fewer_orchest_pods():
+    history = pod_scheduling.PlacementHistory()
+    nodes_load = {"a": _load(orchest_pods=4), "b": _load(orchest_pods=1)}
+
+    assert _select(nodes_load, history) == "b"
+
+
+def test_select_node_spreads_placements_with_stale_load():
+    history = pod_scheduling.PlacementHistory()
+    nodes_load = {node: _load() for node in "abc"}
+
+    placed = [_select(nodes_load, history, now=i) for i in range(3)]
+
+    assert sorted(placed) == ["a", "b", "c"]
+
+
+def test_select_node_forgets_old_placements():
+    history = pod_scheduling.PlacementHistory(window=10)
+    nodes_load = {"a": _load(orchest_pods=1), "b": _load()}
+
+    assert _select(nodes_load, history, now=0) == "b"
+    assert history.recent_placements(now=10) == {}
+
+
+def test_select_node_prefers_project_locality():
+    history = pod_scheduling.PlacementHistory()
+    nodes_load = {
+        "a": _load(orchest_pods=1, project_pods={"project": 1}),
+        "b": _load(orchest_pods=1),
+    }
+    assert _select(nodes_load, history, "project") == "a"
+
+    # The last placement of a project counts as well.
+    history = pod_scheduling.PlacementHistory()
+    history.record("b", "other-project", now=0)
+    assert _select({"a": _load(), "b": _load()}, history, "other-project", 50) == "b"
+
+
+def test_get_pod_requests():
+    pod = client.V1Pod(
+        spec=client.V1PodSpec(
+            containers=[
+                client.V1Container(
+                    name="a",
+                    resources=client.V1ResourceRequirements(
+                        requests={"cpu": "500m", "memory": "1Gi"}
+                    ),
+                ),
+                client.V1Container(name="b"),
+            ],
+            init_containers=[
+                client.V1Container(
+                    name="init",
+                    resources=client.V1ResourceRequirements(requests={"cpu": "2"}),
+                )
+            ],
+        )
+    )
+
+    assert pod_scheduling._get_pod_requests(pod) == (2.0, 2**30)
+
+
+def test_single_node_pipeline_pulls_images_in_one_init_container(monkeypatch):
+    monkeypatch.setattr(pod_scheduling, "_get_required_affinity", lambda *_: None)
+    images = ["orchest-env-a:1", "orchest-env-b:1", "orchest-env-a:1"]
+    manifest = {
+        "kind": "Workflow",
+        "spec": {
+            "templates": [
+                {"containerSet": {"containers": [{"image": image} for image in images]}}
+            ]
+        },
+    }
+
+    pod_scheduling.modify_pipeline_scheduling_behaviour("noninteractive", manifest)
+
+    (init_container,) = manifest["spec"]["templates"][0]["initContainers"]
+    env = {e["name"]: e["value"] for e in init_container["env"]}
+    assert sorted(env["IMAGES_TO_PULL"].split()) == [
+        "orchest-env-a:1",
+        "orchest-env-b:1",
+    ]
@@ -0,0 +1,165 @@
+import pytest
+from kubernetes import client
+from tests.test_utils import FakeWatchResponse
+
+from app import errors
+from app.core.sessions import _core
+
+
+def _deployment(name, resource_version, available_replicas=None):
+    return {
+        "metadata": {"name": name, "resourceVersion": resource_version},
+        "spec": {"replicas": 1, "selector": {}, "template": {}},
+        "status": {"availableReplicas": available_replicas},
+    }
+
+
+def _event(type_, name, resource_version, available_replicas=None):
+    return {
+        "type": type_,
+        "object": _deployment(name, resource_version, available_replicas),
+    }
+
+
+class FakeAppsApi:
+    """Stand-in for the k8s apps API serving the session deployments.
+
+    Every list request serves the next list of `listings`, the last one
+    is served once the others have been served. Every watch request
+    serves the next batch of `watches`, a batch being a list of watch
+    events, after which the watch times out.
+    """
+
+    def __init__(self, listings, watches):
+        self.api_client = client.ApiClient()
+        self.listings = list(listings)
+        self.watches = list(watches)
+        self.list_calls = []
+        self.watch_calls = []
+
+    def list_namespaced_deployment(self, namespace, **kwargs):
+        """Lists or watches deployments.
+
+        :return: V1DeploymentList
+        """
+        if not kwargs.get("watch"):
+            self.list_calls.append(kwargs)
+            deployments = self.listings[0]
+            if len(self.listings) > 1:
+                self.listings.pop(0)
+            return self.api_client._ApiClient__deserialize(
+                {"metadata": {"resourceVersion": "1"}, "items": deployments},
+                "V1DeploymentList",
+            )
+
+        self.watch_calls.append(kwargs)
+        if not self.watches:
+            raise Exception("Watched more often than expected.")
+        return FakeWatchResponse(self.watches.pop(0))
+
+
+def _wait(fake_api, monkeypatch, names, should_abort=lambda: False):
+    monkeypatch.setattr(_core, "k8s_apps_api", fake_api)
+    _core._wait_for_deployments("session-uuid", set(names), should_abort)
+
+
+def test_wait_for_deployments_through_single_watch(monkeypatch):
+    fake_api = FakeAppsApi(
+        [[_deployment("a", "1", 1), _deployment("b", "1"), _deployment("c", "1")]],
+        [
+            [_event("MODIFIED", "b", "2", 1)],
+            [_event("MODIFIED", "a", "3", 1), _event("MODIFIED", "c", "4", 1)],
+        ],
+    )
+
+    _wait(fake_api, monkeypatch, ["a", "b", "c"])
+
+    assert len(fake_api.list_calls) == 1
+    assert [c["resource_version"] for c in fake_api.watch_calls] == ["1", "2"]
+    assert all(
+        c["label_selector"] == "session_uuid=session-uuid"
+        for c in fake_api.list_calls + fake_api.watch_calls
+    )
+
+
+def test_wait_for_deployments_already_ready(monkeypatch):
+    fake_api = FakeAppsApi([[_deployment("a", "1", 1)]], [])
+
+    _wait(fake_api, monkeypatch, ["a"])
+
+    assert not fake_api.watch_calls
+
+
+def test_wait_for_deployments_resyncs_when_expired(monkeypatch):
+    expired = {
+        "type": "ERROR",
+        "object": {"code": 410, "reason": "Expired", "message": "too old"},
+    }
+    fake_api = FakeAppsApi(
+        [[_deployment("a", "1")], [_deployment("a", "3", 1)]],
+        [[_event("MODIFIED", "a", "2"), expired]],
+    )
+
+    _wait(fake_api, monkeypatch, ["a"])
+
+    assert len(fake_api.list_calls) == 2
+    assert len(fake_api.watch_calls) == 1
+
+
+def test_wait_for_deployments_missing(monkeypatch):
+    fake_api = FakeAppsApi([[_deployment("a", "1")]], [])
+
+    with pytest.raises(errors.SessionDeploymentsMissingError):
+        _wait(fake_api, monkeypatch, ["a", "b"])
+
+
+def test_wait_for_deployments_deleted(monkeypatch):
+    fake_api = FakeAppsApi([[_deployment("a", "1")]], [[_event("DELETED", "a", "2")]])
+
+    with pytest.raises(errors.SessionDeploymentsMissingError):
+        _wait(fake_api, monkeypatch, ["a"])
+
+
+def test_wait_for_deployments_aborts(monkeypatch):
+    fake_api = FakeAppsApi([[_deployment("a", "1")]], [[], []])
+    checks = []
+
+    def should_abort():
+        checks.append(None)
+        return len(checks) > 2
+
+    _wait(fake_api, monkeypatch, ["a"], should_abort)
+
+    assert len(fake_api.watch_calls) == 1
+
+
+class FakeAsyncResult:
+    def __init__(self, exception=None):
+        self.exception = exception
+        self.got = False
+
+    def get(self):
+        self.got = True
+        if self.exception is not None:
+            raise self.exception
+
+
+def test_create_resources_waits_for_all_creations():
+    results = []
+
+    def create(namespace, manifest, async_req):
+        assert async_req
+        results.append(FakeAsyncResult(manifest.get("exception")))
+        return results[-1]
+
+    failure = client.ApiException(status=409)
+    manifests = [
+        {"kind": "Role", "metadata": {"name": "a"}, "exception": failure},
+        {"kind": "Role", "metadata": {"name": "b"}},
+    ]
+
+    with pytest.raises(client.ApiException) as exc_info:
+        _core._create_resources([(create, m) for m in manifests])
+
+    assert exc_info.value is failure
+    assert all(result.got for result in results)
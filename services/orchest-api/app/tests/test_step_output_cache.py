@@ -0,0 +1,153 @@
+import os
+
+import pytest
+
+from app.core import step_output_cache
+from app.core.pipelines import Pipeline
+
+
+def _pipeline(step_1_parameters=None, step_2_file_path="step-2.py"):
+    return Pipeline.from_json(
+        {
+            "name": "pipeline-name",
+            "uuid": "pipeline-uuid",
+            "settings": {"cache_step_outputs": True},
+            "parameters": {},
+            "steps": {
+                "uuid-1": {
+                    "incoming_connections": [],
+                    "title": "step-1",
+                    "uuid": "uuid-1",
+                    "file_path": "step-1.py",
+                    "environment": "env-uuid",
+                    "parameters": step_1_parameters or {},
+                },
+                "uuid-2": {
+                    "incoming_connections": ["uuid-1"],
+                    "title": "step-2",
+                    "uuid": "uuid-2",
+                    "file_path": step_2_file_path,
+                    "environment": "env-uuid",
+                    "parameters": {},
+                },
+            },
+        }
+    )
+
+
+def _run_config(project_dir):
+    return {
+        "project_dir": str(project_dir),
+        "project_uuid": "project-uuid",
+        "pipeline_uuid": "pipeline-uuid",
+        "pipeline_path": "pipeline.orchest",
+        "session_type": "noninteractive",
+        "env_uuid_to_image": {"env-uuid": "orchest-env-project-uuid-env-uuid:1"},
+        "user_env_variables": {},
+    }
+
+
+def _create_run_dir(
+    tmp_path, name, step_2_content="print(2)", step_2_file_path="step-2.py"
+):
+    project_dir = tmp_path / name
+    project_dir.mkdir()
+    (project_dir / "step-1.py").write_text("print(1)")
+    (project_dir / step_2_file_path).write_text(step_2_content)
+    return project_dir
+
+
+def _restore(pipeline, run_config):
+    step_keys = step_output_cache.compute_step_keys(pipeline, run_config)
+    return step_keys, step_output_cache.restore_cached_steps(
+        pipeline, run_config, step_keys
+    )
+
+
+def _output(run_config, step_uuid, head):
+    data_dir = step_output_cache._get_step_data_dir(run_config, step_uuid)
+    os.makedirs(data_dir)
+    with open(os.path.join(data_dir, "HEAD"), "w") as f:
+        f.write(head)
+    with open(os.path.join(data_dir, "output.pickle"), "w") as f:
+        f.write(step_uuid)
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "step-output-cache"
+    monkeypatch.setattr(
+        step_output_cache._config, "USERDIR_STEP_OUTPUT_CACHE", str(cache_dir)
+    )
+    return cache_dir
+
+
+@pytest.fixture
+def cached_run(tmp_path):
+    pipeline = _pipeline()
+    run_config = _run_config(_create_run_dir(tmp_path, "run-1"))
+    step_keys, cached_steps = _restore(pipeline, run_config)
+    assert not cached_steps
+
+    _output(run_config, "uuid-1", "2022-01-01, PICKLE, ")
+    _output(run_config, "uuid-2", "2022-01-02, PICKLE, ")
+    step_output_cache.store_step_outputs(run_config, step_keys, ["uuid-1", "uuid-2"])
+
+
+def test_is_enabled(tmp_path):
+    run_config = _run_config(tmp_path)
+    assert step_output_cache.is_enabled(_pipeline(), run_config)
+
+    run_config["session_type"] = "interactive"
+    assert not step_output_cache.is_enabled(_pipeline(), run_config)
+
+
+def test_restore_unchanged_steps(tmp_path, cached_run):
+    run_config = _run_config(_create_run_dir(tmp_path, "run-2"))
+
+    _, cached_steps = _restore(_pipeline(), run_config)
+
+    assert cached_steps == {"uuid-1", "uuid-2"}
+    for step_uuid in cached_steps:
+        data_dir = step_output_cache._get_step_data_dir(run_config, step_uuid)
+        with open(os.path.join(data_dir, "output.pickle")) as f:
+            assert f.read() == step_uuid
+
+
+def test_restore_changed_step_file(tmp_path, cached_run):
+    run_config = _run_config(_create_run_dir(tmp_path, "run-2", "print(3)"))
+
+    _, cached_steps = _restore(_pipeline(), run_config)
+
+    assert cached_steps == {"uuid-1"}
+
+
+def test_restore_changed_parent(tmp_path, cached_run):
+    run_config = _run_config(_create_run_dir(tmp_path, "run-2"))
+    pipeline = _pipeline(step_1_parameters={"a": 1})
+
+    # A step whose parent is executed is executed as well.
+    assert not _restore(pipeline, run_config)[1]
+
+
+def test_restore_notebook_step(tmp_path):
+    pipeline = _pipeline(step_2_file_path="step-2.ipynb")
+    notebook = '{"cells": [], "metadata": {}}'
+
+    run_config = _run_config(
+        _create_run_dir(tmp_path, "run-1", notebook, "step-2.ipynb")
+    )
+    step_keys, cached_steps = _restore(pipeline, run_config)
+    assert not cached_steps
+    _output(run_config, "uuid-1", "2022-01-01, PICKLE, ")
+    _output(run_config, "uuid-2", "2022-01-02, PICKLE, ")
+    # Running a notebook stores its outputs in the notebook itself.
+    (tmp_path / "run-1" / "step-2.ipynb").write_text('{"cells": [{}]}')
+    step_output_cache.store_step_outputs(run_config, step_keys, ["uuid-1", "uuid-2"])
+
+    run_config = _run_config(
+        _create_run_dir(tmp_path, "run-2", notebook, "step-2.ipynb")
+    )
+    _, cached_steps = _restore(pipeline, run_config)
+
+    assert cached_steps == {"uuid-1", "uuid-2"}
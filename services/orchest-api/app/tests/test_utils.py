@@ -95,6 +95,25 @@ def mocked_socketio_class(socketio_data):
     return MockSocketIOClient
 
 
+class FakeWatchResponse:
+    """Stand-in for the streamed response of a k8s watch request."""
+
+    def __init__(self, events):
+        self._events = events
+
+    def stream(self, amt=None, decode_content=False):
+        for event in self._events:
+            if isinstance(event, Exception):
+                raise event
+            yield (json.dumps(event) + "\n").encode("utf8")
+
+    def close(self):
+        pass
+
+    def release_conn(self):
+        pass
+
+
 class MockRequestReponse:
     def __enter__(self):
         return self
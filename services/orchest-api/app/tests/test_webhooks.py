@@ -0,0 +1,244 @@
+import datetime
+import http.server
+import threading
+import time
+
+import pytest
+import requests
+
+from app import models
+from app.core.notifications import webhooks
+
+# Seconds it takes the stand-in webhook to respond.
+_RESPONSE_DELAY = 0.02
+
+
+class WebhookHandler(http.server.BaseHTTPRequestHandler):
+    """Stand-in webhook recording the deliveries it receives.
+
+    Responds with a 500 to paths starting with /fail-once the first
+    time such a path is requested.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        with self.server.lock:
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(
+                self.server.max_in_flight, self.server.in_flight
+            )
+        time.sleep(_RESPONSE_DELAY)
+        with self.server.lock:
+            self.server.in_flight -= 1
+            failed = self.path.startswith("/fail-once") and (
+                self.path not in self.server.failed_paths
+            )
+            if failed:
+                self.server.failed_paths.add(self.path)
+            else:
+                self.server.received.append(
+                    (self.path, self.headers["X-Orchest-Delivery"])
+                )
+
+        self.send_response(500 if failed else 200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def webhook_server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), WebhookHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.received = []
+    server.failed_paths = set()
+    server.in_flight = 0
+    server.max_in_flight = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _requests_by_deliveree(server, paths, n_deliveries):
+    host, port = server.server_address
+    return {
+        path: [
+            (
+                f"{path}-{i}",
+                requests.Request(
+                    "POST",
+                    f"http://{host}:{port}{path}",
+                    json={"i": i},
+                    headers={"X-Orchest-Delivery": f"{path}-{i}"},
+                ).prepare(),
+                True,
+            )
+            for i in range(n_deliveries)
+        ]
+        for path in paths
+    }
+
+
+def test_send_requests_concurrently(webhook_server):
+    n_webhooks, n_deliveries = 16, 10
+    paths = [f"/webhook-{i}" for i in range(n_webhooks)]
+    requests_by_deliveree = _requests_by_deliveree(webhook_server, paths, n_deliveries)
+
+    outcomes = webhooks._send_requests(requests_by_deliveree)
+
+    assert set(outcomes.values()) == {"DELIVERED"}
+    assert len(webhook_server.received) == n_webhooks * n_deliveries
+    # Requests to different webhooks were in flight at the same time.
+    assert 1 < webhook_server.max_in_flight <= webhooks._MAX_CONCURRENT_DELIVERIES
+
+    # Deliveries of a webhook are received in order.
+    for path in paths:
+        received = [d for p, d in webhook_server.received if p == path]
+        assert received == [f"{path}-{i}" for i in range(n_deliveries)]
+
+
+def test_send_requests_stops_deliveree_on_failure(webhook_server):
+    requests_by_deliveree = _requests_by_deliveree(
+        webhook_server, ["/fail-once", "/webhook"], 3
+    )
+
+    outcomes = webhooks._send_requests(requests_by_deliveree)
+
+    assert outcomes == {
+        "/fail-once-0": "FAILED",
+        "/fail-once-1": "SKIPPED",
+        "/fail-once-2": "SKIPPED",
+        "/webhook-0": "DELIVERED",
+        "/webhook-1": "DELIVERED",
+        "/webhook-2": "DELIVERED",
+    }
+
+
+class FakeQuery:
+    """Stand-in for the queries of deliver_many, returns given rows."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def with_for_update(self, **kwargs):
+        return self
+
+    def options(self, *args):
+        return self
+
+    def filter(self, *args):
+        return self
+
+    def order_by(self, *args):
+        return self
+
+    def all(self):
+        return sorted(self.rows, key=lambda row: getattr(row, "scheduled_at", 0))
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class ModelWithQuery:
+    """Stand-in for a model whose queries return the given rows."""
+
+    def __init__(self, model, rows):
+        self.model = model
+        self.query = FakeQuery(rows)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+class FakeDb:
+    def __init__(self, session):
+        self.session = session
+
+
+class FakeSession:
+    def __init__(self):
+        self.deleted = []
+        self.commits = 0
+
+    def delete(self, row):
+        self.deleted.append(row.uuid)
+
+    def commit(self):
+        self.commits += 1
+
+
+@pytest.fixture
+def session(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(webhooks, "db", FakeDb(session))
+    return session
+
+
+def test_deliver_many(webhook_server, session, monkeypatch):
+    host, port = webhook_server.server_address
+    scheduled_at = datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc)
+    deliveries = [
+        models.Delivery(
+            uuid=f"{path}-{i}",
+            deliveree=path,
+            status="SCHEDULED",
+            n_delivery_attempts=0,
+            scheduled_at=scheduled_at + datetime.timedelta(seconds=i),
+        )
+        for path in ["/fail-once", "/webhook"]
+        for i in range(3)
+    ]
+    webhook_models = [
+        models.Webhook(uuid=path, url=f"http://{host}:{port}{path}", verify_ssl=True)
+        for path in ["/fail-once", "/webhook"]
+    ]
+    monkeypatch.setattr(models, "Delivery", ModelWithQuery(models.Delivery, deliveries))
+    monkeypatch.setattr(
+        models, "Webhook", ModelWithQuery(models.Webhook, webhook_models)
+    )
+    monkeypatch.setattr(
+        webhooks,
+        "_prepare_request",
+        lambda delivery, deliveree: requests.Request(
+            "POST",
+            deliveree.url,
+            json={},
+            headers={"X-Orchest-Delivery": delivery.uuid},
+        ).prepare(),
+    )
+
+    webhooks.deliver_many([delivery.uuid for delivery in deliveries])
+
+    # The deliveries are claimed, then updated, at once.
+    assert session.commits == 2
+    assert session.deleted == ["/webhook-0", "/webhook-1", "/webhook-2"]
+    assert [d for _, d in webhook_server.received] == session.deleted
+
+    failed, *skipped = [d for d in deliveries if d.deliveree == "/fail-once"]
+    assert failed.n_delivery_attempts == 1
+    assert failed.scheduled_at > datetime.datetime.now(datetime.timezone.utc)
+    # Skipped deliveries are rescheduled right after the failed one, in
+    # order, without counting as an attempt.
+    previous = failed
+    for delivery in [failed, *skipped]:
+        assert delivery.status == "RESCHEDULED"
+        assert delivery.scheduled_at >= previous.scheduled_at
+        previous = delivery
+    assert [d.n_delivery_attempts for d in skipped] == [0, 0]
+    assert skipped[0].scheduled_at > failed.scheduled_at
+
+
+def test_deliver_many_without_due_deliveries(session, monkeypatch):
+    monkeypatch.setattr(models, "Delivery", ModelWithQuery(models.Delivery, []))
+
+    webhooks.deliver_many(["delivery-uuid"])
+
+    assert session.commits == 1
+    assert not session.deleted
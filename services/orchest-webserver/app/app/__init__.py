@@ -28,6 +28,7 @@ from _orchest.internals import config as _config
 from _orchest.internals import utils as _utils
 from app import config
 from app.connections import db, ma
+from app.core.project_discovery import add_discovery_job_to_scheduler
 from app.core.scheduler import add_recurring_jobs_to_scheduler
 from app.kernel_manager import populate_kernels
 from app.models import Project
@@ -150,6 +151,8 @@ def create_app(to_migrate_db=False):
     )
     app.config["SCHEDULER"] = scheduler
     add_recurring_jobs_to_scheduler(scheduler, app, run_on_add=True)
+    if app.config["PROJECT_DISCOVERY"]:
+        add_discovery_job_to_scheduler(scheduler, app)
     scheduler.start()
 
     # static file serving
@@ -30,6 +30,11 @@ class Config:
     ORCHEST_UPDATE_INFO_JSON_PATH = "/userdir/.orchest/orchest_update_info.json"
     ORCHEST_UPDATE_INFO_JSON_POLL_INTERVAL = 60
 
+    # Discovery of projects and pipelines changed through the file
+    # system, see app.core.project_discovery.
+    PROJECT_DISCOVERY = True
+    PROJECT_DISCOVERY_INTERVAL = 60  # in seconds
+
     ORCHEST_WEB_URLS = {
         "readthedocs": "https://docs.orchest.io/en/stable",
         "slack": (
@@ -185,6 +190,7 @@ class TestingConfig(Config):
     TELEMETRY_DISABLED = True
     POLL_ORCHEST_EXAMPLES_JSON = False
     POLL_ORCHEST_UPDATE_INFO_JSON = False
+    PROJECT_DISCOVERY = False
 
     # No file logging.
     LOGGING_CONFIG = {
@@ -0,0 +1,212 @@
+"""In-memory index of the directories browsed or walked by the server.
+
+The listing of every directory is cached along with the mtime of the
+directory. Adding, removing or renaming an entry changes the mtime of
+its directory, a listing is therefore only read again if the mtime of
+its directory changed, which is checked at most every
+`_REVALIDATE_INTERVAL` seconds. Changes made through the file manager
+invalidate the affected listings right away.
+
+There is one index per root directory, e.g. a project directory or the
+data directory, the least recently used indexes are dropped. Likewise,
+an index keeps the listings of at most `_MAX_LISTINGS` directories.
+"""
+import collections
+import os
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# Seconds during which a cached listing is used without checking the
+# mtime of its directory.
+_REVALIDATE_INTERVAL = 2
+# The mtime of a directory changed less than this many seconds before
+# its listing was read is not trusted, since later changes could happen
+# within the same mtime granularity.
+_RACY_INTERVAL = 1
+_MAX_INDEXES = 32
+_MAX_LISTINGS = 10000
+
+
+class _Entry(NamedTuple):
+    name: str
+    is_dir: bool
+    is_symlink: bool
+
+
+class _Listing:
+    def __init__(self, mtime_ns: Optional[int], entries: List[_Entry]) -> None:
+        self.mtime_ns = mtime_ns
+        self.checked_at = time.monotonic()
+        # Sorted, directories first.
+        self.entries = entries
+
+
+def _read_listing(path: str) -> Optional[_Listing]:
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+        entries = []
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                entries.append(_Entry(entry.name, is_dir, entry.is_symlink()))
+    except OSError:
+        return None
+
+    if time.time_ns() - mtime_ns < _RACY_INTERVAL * 10**9:
+        mtime_ns = None
+    entries.sort(key=lambda e: (not e.is_dir, e.name))
+    return _Listing(mtime_ns, entries)
+
+
+class DirectoryIndex:
+    """Index of the directories within a root directory."""
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+        # Least recently used first.
+        self._listings: "collections.OrderedDict[str, _Listing]" = (
+            collections.OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def get_entries(self, path: str) -> Optional[List[_Entry]]:
+        """Gets the entries of a directory, None if it can't be read.
+
+        Args:
+            path: Absolute path of a directory within the root.
+        """
+        path = os.path.normpath(path)
+        with self._lock:
+            listing = self._listings.get(path)
+            if listing is not None:
+                self._listings.move_to_end(path)
+        now = time.monotonic()
+
+        if listing is not None and now - listing.checked_at >= _REVALIDATE_INTERVAL:
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                mtime_ns = None
+            if listing.mtime_ns is not None and mtime_ns == listing.mtime_ns:
+                listing.checked_at = now
+            else:
+                listing = None
+
+        if listing is None:
+            listing = _read_listing(path)
+            with self._lock:
+                if listing is None:
+                    self._listings.pop(path, None)
+                else:
+                    self._listings[path] = listing
+                    self._listings.move_to_end(path)
+                    if len(self._listings) > _MAX_LISTINGS:
+                        self._listings.popitem(last=False)
+        return None if listing is None else listing.entries
+
+    def invalidate(self, path: str) -> None:
+        """Invalidates a path, its directory and anything within it."""
+        path = os.path.normpath(path)
+        prefix = path.rstrip(os.sep) + os.sep
+        with self._lock:
+            self._listings.pop(os.path.dirname(path), None)
+            for cached_path in list(self._listings):
+                if cached_path == path or cached_path.startswith(prefix):
+                    del self._listings[cached_path]
+
+    def walk(
+        self, path: str, skip_dirs: Iterable[str] = ()
+    ) -> Iterator[Tuple[str, List[_Entry]]]:
+        """Yields (directory, entries) top-down, like os.walk.
+
+        Symlinks to directories are listed but not followed.
+
+        Args:
+            path: Absolute path of the directory to walk.
+            skip_dirs: Names of the directories not to descend into.
+        """
+        skip_dirs = set(skip_dirs)
+        stack = [os.path.normpath(path)]
+        while stack:
+            dir_path = stack.pop()
+            entries = self.get_entries(dir_path)
+            if entries is None:
+                continue
+            yield dir_path, entries
+            for entry in reversed(entries):
+                if (
+                    entry.is_dir
+                    and not entry.is_symlink
+                    and entry.name not in skip_dirs
+                ):
+                    stack.append(os.path.join(dir_path, entry.name))
+
+
+_indexes: "collections.OrderedDict[str, DirectoryIndex]" = collections.OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_index(root: str) -> DirectoryIndex:
+    """Gets the index of a root directory, creating it if needed."""
+    root = os.path.normpath(root)
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            index = DirectoryIndex(root)
+            _indexes[root] = index
+            if len(_indexes) > _MAX_INDEXES:
+                _indexes.popitem(last=False)
+        else:
+            _indexes.move_to_end(root)
+        return index
+
+
+def invalidate(path: str) -> None:
+    """Invalidates a changed path in the indexes it belongs to.
+
+    To be called after creating, removing or renaming a file or
+    directory so that the change is visible right away.
+    """
+    path = os.path.normpath(path)
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    for index in indexes:
+        root_prefix = index.root.rstrip(os.sep) + os.sep
+        if path == index.root or path.startswith(root_prefix):
+            index.invalidate(path)
+        elif index.root.startswith(path.rstrip(os.sep) + os.sep):
+            # An ancestor of the root changed, e.g. a project has been
+            # moved.
+            index.invalidate(index.root)
+
+
+def search_extensions(root: str, path: str, extensions: List[str]) -> List[str]:
+    """Finds the files with the given extensions within a directory.
+
+    Args:
+        root: The root directory of the index to use.
+        path: Absolute path of the directory to search in.
+        extensions: Extensions, without dot, e.g. ["ipynb", "py"].
+
+    Returns:
+        The paths of the matching files, relative to `root`, grouped by
+        extension in the order of `extensions`.
+
+    """
+    extensions = list(dict.fromkeys(extensions))
+    matches: Dict[str, List[str]] = {extension: [] for extension in extensions}
+    suffixes = [(extension, f".{extension}") for extension in extensions]
+    for dir_path, entries in get_index(root).walk(path):
+        for entry in entries:
+            if entry.is_dir:
+                continue
+            for extension, suffix in suffixes:
+                if entry.name.endswith(suffix):
+                    matches[extension].append(
+                        os.path.relpath(os.path.join(dir_path, entry.name), root)
+                    )
+    return [match for extension in extensions for match in matches[extension]]
@@ -1,12 +1,15 @@
+import io
 import logging
 import os
 import re
-from typing import List, Optional, Tuple
+import zipfile
+from typing import Iterator, List, Optional, Tuple
 
 from flask import jsonify
 from werkzeug.utils import safe_join
 
 from _orchest.internals import config as _config
+from app.core import directory_index
 from app.utils import get_project_directory
 
 logger = logging.getLogger(__name__)
@@ -104,14 +107,155 @@ def generate_abs_path(path, root, dir, is_dir=False):
     return "/" + os.path.relpath(safe_join(root, path), dir) + ("/" if is_dir else "")
 
 
-def zipdir(path, ziph):
-    # ziph is zipfile handle
-    for root, _, files in os.walk(path):
-        for file in files:
-            ziph.write(
-                safe_join(root, file),
-                os.path.relpath(safe_join(root, file), os.path.join(path, "..")),
+# Files in these formats are already compressed, compressing them again
+# costs cpu without making the archive smaller.
+_COMPRESSED_EXTENSIONS = {
+    "7z",
+    "avi",
+    "bz2",
+    "gif",
+    "gz",
+    "jpeg",
+    "jpg",
+    "lz4",
+    "mkv",
+    "mov",
+    "mp3",
+    "mp4",
+    "npz",
+    "parquet",
+    "png",
+    "rar",
+    "tgz",
+    "webm",
+    "webp",
+    "whl",
+    "xz",
+    "zip",
+    "zst",
+}
+_ZIP_READ_SIZE = 1 << 20
+# Files that could grow past the zip limits while they are being read
+# are written with ZIP64 extensions right away.
+_FORCE_ZIP64_SIZE = 1 << 30
+
+
+class _ZipStreamBuffer(io.RawIOBase):
+    """Unseekable sink collecting what is written by a ZipFile."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def pop(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zipdir(path: str, compress: bool = False) -> Iterator[bytes]:
+    """Yields a zip archive of the directory as it is being written.
+
+    The archive is written without seeking, through data descriptors,
+    so that it can be sent while it is being written, using memory in
+    the order of `_ZIP_READ_SIZE`. Entries are relative to the parent
+    of the directory, e.g. "data/file.csv" for "/userdir/data".
+
+    Args:
+        path: The directory to archive.
+        compress: Whether to deflate the files. Files that are already
+            compressed, judging by their extension, are always stored.
+
+    """
+    buffer = _ZipStreamBuffer()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as zf:
+        for root, _, files in os.walk(path):
+            for file in files:
+                file_path = safe_join(root, file)
+                try:
+                    zinfo = zipfile.ZipInfo.from_file(
+                        file_path,
+                        os.path.relpath(file_path, os.path.join(path, "..")),
+                    )
+                    if compress and (
+                        file.rsplit(".", 1)[-1].lower() not in _COMPRESSED_EXTENSIONS
+                    ):
+                        zinfo.compress_type = zipfile.ZIP_DEFLATED
+                    src = open(file_path, "rb")
+                except OSError as e:
+                    # E.g. a broken symlink or a file removed meanwhile.
+                    logger.warning(f"Skipping {file_path} in archive: {e}")
+                    continue
+
+                with src, zf.open(
+                    zinfo, "w", force_zip64=zinfo.file_size > _FORCE_ZIP64_SIZE
+                ) as dst:
+                    for chunk in iter(lambda: src.read(_ZIP_READ_SIZE), b""):
+                        dst.write(chunk)
+                        data = buffer.pop()
+                        if data:
+                            yield data
+                data = buffer.pop()
+                if data:
+                    yield data
+
+    # The central directory, written when closing the archive.
+    yield buffer.pop()
+
+
+def _generate_tree_children(
+    index: directory_index.DirectoryIndex,
+    dir: str,
+    dir_path: str,
+    entries: list,
+    level: int,
+    levels_to_expand: int,
+    allowed_file_extensions: List[str],
+) -> List[dict]:
+    children = []
+    for entry in entries:
+        if entry.is_dir:
+            dir_node = {
+                "type": "directory",
+                "name": entry.name,
+                "children": [],
+                "depth": level + 1,
+                "path": generate_abs_path(entry.name, dir_path, dir, is_dir=True),
+            }
+            # Like os.walk, symlinks to directories aren't followed.
+            if levels_to_expand > 0 and not entry.is_symlink:
+                child_path = safe_join(dir_path, entry.name)
+                child_entries = index.get_entries(child_path)
+                if child_entries is not None:
+                    dir_node["children"] = _generate_tree_children(
+                        index,
+                        dir,
+                        child_path,
+                        child_entries,
+                        level + 1,
+                        levels_to_expand - 1,
+                        allowed_file_extensions,
+                    )
+            children.append(dir_node)
+
+        elif (
+            len(allowed_file_extensions) == 0
+            or entry.name.split(".")[-1] in allowed_file_extensions
+        ):
+            children.append(
+                {
+                    "type": "file",
+                    "name": entry.name,
+                    "path": generate_abs_path(entry.name, dir_path, dir),
+                }
             )
+    return children
 
 
 def generate_tree(
@@ -119,7 +263,28 @@ def generate_tree(
     path_filter="/",
     allowed_file_extensions: List[str] = [],
     depth: Optional[int] = 3,
+    offset: int = 0,
+    limit: Optional[int] = None,
 ):
+    """Generates the tree of the directory at path_filter within dir.
+
+    The tree is served from the `directory_index` of dir. Directories
+    are expanded up to the given depth, directories always go before
+    files.
+
+    Args:
+        dir: The root directory.
+        path_filter: The directory to generate the tree of, relative to
+            dir, starting and ending with a "/".
+        allowed_file_extensions: If not empty, only files with these
+            extensions are included.
+        depth: How deep to expand directories.
+        offset: The number of children of the directory to skip.
+        limit: If set, the maximum number of children of the directory
+            to include, in which case the directory node gets a
+            "total_children" entry to page through its children.
+
+    """
 
     depth = depth if depth else 3
 
@@ -138,72 +303,32 @@ def generate_tree(
     else:
         tree["depth"] = path_filter.count(os.sep) - 1
 
-    dir_nodes = {}
-
     if path_filter != "/":
         filtered_path = safe_join(dir, path_filter[1:-1])
     else:
         filtered_path = dir
 
-    dir_nodes[filtered_path] = tree
-
-    dir_depth = dir.count(os.sep)
-
-    logger.debug(f"Walking {filtered_path}")
-    for root, dirs, files in os.walk(filtered_path):
-
-        dir_delete_set = set()
-        for dirname in dirs:
-
-            dir_path = safe_join(root, dirname)
-            dir_node = {
-                "type": "directory",
-                "name": dirname,
-                "children": [],
-                "depth": root.count(os.sep) - dir_depth + 1,
-                "path": generate_abs_path(dirname, root, dir, is_dir=True),
-            }
-
-            relative_depth = dir_node["depth"] - (path_filter.count(os.sep) - 2)
-            if relative_depth > depth:  # Account for filtered_path
-                dir_delete_set.add(dirname)
-
-            logger.debug(relative_depth)
-
-            dir_nodes[dir_path] = dir_node
-            dir_nodes[root]["children"].append(dir_node)
-
-        # Filter dirs in delete set
-        dirs[:] = [d for d in dirs if d not in dir_delete_set]
-
-        for filename in files:
-
-            if (
-                len(allowed_file_extensions) == 0
-                or filename.split(".")[-1] in allowed_file_extensions
-            ):
-                file_node = {
-                    "type": "file",
-                    "name": filename,
-                    "path": generate_abs_path(filename, root, dir),
-                }
-
-                # this key should always exist
-                try:
-                    dir_nodes[root]["children"].append(file_node)
-                except KeyError as e:
-                    logger.error(
-                        "Key %s does not exist in dir_nodes %s. Error: %s"
-                        % (root, dir_nodes, e)
-                    )
-                except Exception as e:
-                    logger.error("Error: %e" % e)
-
-        # Sort files & directories (directories always go before files)
-        if "children" in dir_nodes[root]:
-            dir_nodes[root]["children"].sort(
-                key=lambda e: {"directory": "a.", "file": "b."}[e["type"]] + e["name"]
-            )
+    logger.debug(f"Generating tree of {filtered_path}")
+    index = directory_index.get_index(dir)
+    entries = index.get_entries(filtered_path)
+    if entries is None:
+        return tree
+
+    if limit is not None:
+        tree["total_children"] = len(entries)
+        entries = entries[offset : offset + limit]
+    elif offset:
+        entries = entries[offset:]
+
+    tree["children"] = _generate_tree_children(
+        index,
+        dir,
+        filtered_path,
+        entries,
+        level=path_filter.count(os.sep) - 1,
+        levels_to_expand=depth - 1,
+        allowed_file_extensions=allowed_file_extensions,
+    )
     return tree
 
 
@@ -10,7 +10,7 @@ from flask import current_app
 from werkzeug.utils import safe_join
 
 import app.utils as utils
-from _orchest.internals import analytics
+from _orchest.internals import analytics, blob_store
 from _orchest.internals import config as _config
 from _orchest.internals import utils as _utils
 from app import error
@@ -362,7 +362,11 @@ def create_job_directory(job_uuid: str, pipeline_uuid: str, project_uuid: str) -
         utils.project_uuid_to_path(project_uuid),
     )
 
-    _utils.copytree(project_dir, snapshot_path, use_gitignore=True)
+    # Unchanged files are shared with earlier snapshots of the project,
+    # see `blob_store`.
+    blob_store.create_snapshot(
+        project_uuid, job_uuid, project_dir, snapshot_path, use_gitignore=True
+    )
     return _create_snapshot_record_for_job(job_uuid, pipeline_uuid, project_uuid)
 
 
@@ -381,6 +385,12 @@ def remove_job_directory(
 
     if os.path.isdir(job_path):
         _utils.rmtree(job_path, ignore_errors=True)
+    # Removes the blobs that were only used by the snapshot of the job.
+    blob_store.remove_snapshot(
+        project_uuid,
+        job_uuid,
+        utils.get_snapshot_directory(pipeline_uuid, project_uuid, job_uuid),
+    )
 
     # Clean up parent directory if this job removal created empty
     # directories.
@@ -1,17 +1,22 @@
 import contextlib
 import copy
+import hashlib
 import json
 import os
+import time
 import uuid
+from typing import List, Optional, Tuple
 
 import requests
 from flask.globals import current_app
+from werkzeug.utils import safe_join
 
 from _orchest.internals import compat as _compat
 from _orchest.internals.two_phase_executor import TwoPhaseFunction
 from app import error
 from app.connections import db
-from app.models import Pipeline
+from app.core import directory_index
+from app.models import Pipeline, Project
 from app.utils import (
     check_pipeline_correctness,
     get_pipeline_directory,
@@ -95,6 +100,7 @@ class CreatePipeline(TwoPhaseFunction):
 
         with open(pipeline_json_path, "w") as pipeline_json_file:
             json.dump(pipeline_json, pipeline_json_file, indent=4, sort_keys=True)
+        directory_index.invalidate(pipeline_json_path)
 
     def _revert(self):
         Pipeline.query.filter_by(
@@ -137,6 +143,7 @@ class DeletePipeline(TwoPhaseFunction):
         if remove_file:
             with contextlib.suppress(FileNotFoundError):
                 os.remove(pipeline_json_path)
+            directory_index.invalidate(pipeline_json_path)
 
         # Orchest-api deletion.
         url = (
@@ -365,6 +372,8 @@ class MovePipeline(TwoPhaseFunction):
         if directories:
             os.makedirs(directories, exist_ok=True)
         os.rename(old_path, new_path)
+        directory_index.invalidate(old_path)
+        directory_index.invalidate(new_path)
 
         # So that the moving can be reverted in case of failure of the
         # rest of the collateral.
@@ -394,6 +403,8 @@ class MovePipeline(TwoPhaseFunction):
                 os.rename(new_path, old_path)
             except Exception as e:
                 current_app.logger.error(f"Error while reverting pipeline move: {e}")
+            directory_index.invalidate(old_path)
+            directory_index.invalidate(new_path)
 
         # Restore the original pipeline step relative paths.
         pp_bk = self.collateral_kwargs.get("pipeline_def_backup")
@@ -406,3 +417,107 @@ class MovePipeline(TwoPhaseFunction):
             uuid=pipeline_uuid,
         ).update({"status": "READY", "path": self.collateral_kwargs["old_path"]})
         db.session.commit()
+
+
+# The mtime of a pipeline file changed less than this many seconds
+# before the file was read is not trusted, since the file could change
+# again within the same mtime granularity.
+_RACY_MTIME_INTERVAL = 1
+
+
+def _refresh_pipeline_metadata(pipeline: Pipeline, pipeline_json_path: str) -> bool:
+    try:
+        mtime_ns = os.stat(pipeline_json_path).st_mtime_ns
+    except OSError:
+        mtime_ns = None
+    if mtime_ns is not None and mtime_ns == pipeline.file_mtime_ns:
+        return False
+
+    try:
+        with open(pipeline_json_path, "rb") as json_file:
+            content = json_file.read()
+    except OSError:
+        pipeline.name = None
+        pipeline.step_count = None
+        pipeline.environments = None
+        pipeline.file_mtime_ns = None
+        pipeline.file_hash = None
+        return True
+
+    if mtime_ns is not None and (
+        time.time_ns() - mtime_ns < _RACY_MTIME_INTERVAL * 10**9
+    ):
+        mtime_ns = None
+    pipeline.file_mtime_ns = mtime_ns
+
+    file_hash = hashlib.md5(content).hexdigest()
+    if file_hash == pipeline.file_hash:
+        return True
+
+    try:
+        pipeline_json = json.loads(content)
+        _compat.migrate_pipeline(pipeline_json)
+        steps = pipeline_json.get("steps", {})
+        pipeline.name = pipeline_json["name"]
+        pipeline.step_count = len(steps)
+        pipeline.environments = sorted(
+            {step["environment"] for step in steps.values() if step.get("environment")}
+        )
+    except Exception as e:
+        current_app.logger.error(
+            "Could not read pipeline JSON from %s: %s" % (pipeline_json_path, e)
+        )
+        pipeline.name = None
+        pipeline.step_count = None
+        pipeline.environments = None
+    pipeline.file_hash = file_hash
+    return True
+
+
+def refresh_pipelines_metadata(pipelines: List[Tuple[Pipeline, str]]) -> None:
+    """Refreshes the metadata of the pipelines whose file changed.
+
+    A pipeline file is only read if its mtime changed, and only parsed
+    if its content changed as well. Changes are committed.
+
+    Args:
+        pipelines: Pipelines along with the path of their project.
+    """
+    changed = False
+    for pipeline, project_path in pipelines:
+        pipeline_json_path = safe_join(
+            current_app.config["PROJECTS_DIR"], project_path, pipeline.path
+        )
+        changed |= _refresh_pipeline_metadata(pipeline, pipeline_json_path)
+
+    if changed:
+        db.session.commit()
+
+
+def get_pipelines_metadata(project_uuid: Optional[str] = None) -> List[dict]:
+    """Gets the metadata of the pipelines, of a project if given.
+
+    Returns:
+        A list of pipelines with their `uuid`, `path`, `project_uuid`,
+        `name`, `step_count` and `environments`. The `name` is None if
+        the pipeline file could not be read.
+    """
+    query = db.session.query(Pipeline, Project.path).join(
+        Project, Project.uuid == Pipeline.project_uuid
+    )
+    if project_uuid is not None:
+        query = query.filter(Pipeline.project_uuid == project_uuid)
+    pipelines = query.all()
+    refresh_pipelines_metadata(pipelines)
+
+    return [
+        {
+            "uuid": pipeline.uuid,
+            "path": pipeline.path,
+            "project_uuid": pipeline.project_uuid,
+            "name": pipeline.name,
+            "step_count": pipeline.step_count,
+            "environments": pipeline.environments,
+        }
+        for pipeline, _ in pipelines
+    ]
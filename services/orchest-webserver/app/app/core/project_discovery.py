@@ -0,0 +1,208 @@
+"""Keeps the projects and pipelines in the db in sync with the userdir.
+
+Projects and pipelines can be created, deleted or moved through the
+file system, e.g. through JupyterLab or a git pull, instead of through
+Orchest. Such changes are discovered by a recurring background job so
+that requests listing projects don't have to walk the file system.
+
+The userdir is written to by other pods and can be a network file
+system, for which inotify events are not reliable. The job therefore
+walks the projects through the directory index, i.e. only directories
+whose mtime changed are listed again, and the pipelines of a project
+are only synchronized if the set of pipeline files changed since the
+last synchronization.
+"""
+import datetime
+import threading
+import time
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from flask import current_app
+from flask.app import Flask
+from werkzeug.utils import safe_join
+
+from _orchest.internals.two_phase_executor import TwoPhaseExecutor
+from app.connections import db
+from app.core.projects import (
+    SyncProjectPipelinesDBState,
+    discoverFSCreatedProjects,
+    discoverFSDeletedProjects,
+)
+from app.models import Project
+from app.utils import find_pipelines_in_dir, project_uuid_to_path
+
+# Seconds after which the pipelines of a project are synchronized even
+# if its pipeline files didn't change, e.g. to pick up a pipeline that
+# was skipped because it was being moved.
+_FULL_SYNC_INTERVAL = 300
+
+_discovery_lock = threading.Lock()
+# Project uuid to the pipeline paths of the last synchronization and
+# the (monotonic) time at which it happened.
+_synced_pipeline_paths: Dict[str, Tuple[FrozenSet[str], float]] = {}
+# Arguments of the discovery that is queued through `queue_discovery`
+# and hasn't started yet, if any.
+_queued_discovery_lock = threading.Lock()
+_queued_discovery: Optional[Dict[str, Any]] = None
+
+
+def sync_project_pipelines(project_uuid: str, force: bool = False) -> bool:
+    """Synchronizes the pipelines of a project if they changed.
+
+    Args:
+        project_uuid: UUID of the project to synchronize.
+        force: Synchronize even if the pipeline files didn't change.
+
+    Returns:
+        True if the pipelines have been synchronized, False if they
+        didn't change since the last synchronization.
+
+    Raises:
+        Whatever `SyncProjectPipelinesDBState` raises, e.g.
+        FileNotFoundError if the project directory is not found.
+    """
+    project_dir = safe_join(
+        current_app.config["PROJECTS_DIR"], project_uuid_to_path(project_uuid)
+    )
+    pipeline_paths = frozenset(find_pipelines_in_dir(project_dir, project_dir))
+
+    synced = _synced_pipeline_paths.get(project_uuid)
+    if (
+        not force
+        and synced is not None
+        and synced[0] == pipeline_paths
+        and time.monotonic() - synced[1] < _FULL_SYNC_INTERVAL
+    ):
+        return False
+
+    with TwoPhaseExecutor(db.session) as tpe:
+        SyncProjectPipelinesDBState(tpe).transaction(project_uuid)
+    _synced_pipeline_paths[project_uuid] = (pipeline_paths, time.monotonic())
+    return True
+
+
+def discover_projects(
+    force: bool = False,
+    skip_env_builds_on_discovery: bool = False,
+    blocking: bool = True,
+) -> bool:
+    """Discovers projects and pipelines changed through the filesystem.
+
+    Args:
+        force: Synchronize the pipelines of every project, not only of
+            the projects whose pipeline files changed.
+        skip_env_builds_on_discovery: See `discoverFSCreatedProjects`.
+        blocking: Wait for a concurrent discovery to finish instead of
+            skipping this one.
+
+    Returns:
+        False if the discovery has been skipped because another one was
+        running, True otherwise.
+    """
+    if not _discovery_lock.acquire(blocking=blocking):
+        return False
+
+    try:
+        _discover_projects(force, skip_env_builds_on_discovery)
+    finally:
+        _discovery_lock.release()
+
+    return True
+
+
+def _discover_projects(force: bool, skip_env_builds_on_discovery: bool) -> None:
+    discoverFSDeletedProjects()
+    discoverFSCreatedProjects(skip_env_builds_on_discovery=skip_env_builds_on_discovery)
+
+    # Projects that are INITIALIZING, MOVING or DELETING are
+    # synchronized once they are READY.
+    project_uuids = [
+        project.uuid
+        for project in Project.query.filter_by(status="READY")
+        .with_entities(Project.uuid)
+        .all()
+    ]
+    for project_uuid in set(_synced_pipeline_paths) - set(project_uuids):
+        del _synced_pipeline_paths[project_uuid]
+
+    # Issues in one project should not hinder the pipeline
+    # synchronization of others.
+    for project_uuid in project_uuids:
+        try:
+            sync_project_pipelines(project_uuid, force=force)
+        except Exception as e:
+            current_app.logger.error(
+                "Error during project pipelines synchronization of "
+                f"{project_uuid}: {e}."
+            )
+
+
+def queue_discovery(
+    app: Flask, force: bool = False, skip_env_builds_on_discovery: bool = False
+) -> None:
+    """Runs a discovery in the background, after the running one if any.
+
+    Unlike the recurring discovery, the discovery is not skipped if
+    another one is running, since that one might have started before
+    the changes to discover were made. Discoveries that are queued while
+    another one is waiting to start are merged into it.
+
+    Args:
+        app: The app to run the discovery with.
+        force: See `discover_projects`.
+        skip_env_builds_on_discovery: See `discover_projects`.
+    """
+    global _queued_discovery
+    with _queued_discovery_lock:
+        if _queued_discovery is not None:
+            _queued_discovery["force"] |= force
+            _queued_discovery[
+                "skip_env_builds_on_discovery"
+            ] &= skip_env_builds_on_discovery
+            return
+        _queued_discovery = {
+            "force": force,
+            "skip_env_builds_on_discovery": skip_env_builds_on_discovery,
+        }
+
+    threading.Thread(target=_run_queued_discovery, args=[app], daemon=True).start()
+
+
+def _run_queued_discovery(app: Flask) -> None:
+    global _queued_discovery
+    with app.app_context(), _discovery_lock:
+        # Discoveries queued from now on run after this one.
+        with _queued_discovery_lock:
+            kwargs, _queued_discovery = _queued_discovery, None
+        try:
+            _discover_projects(**kwargs)
+        except Exception as e:
+            app.logger.error(f"Failed to discover projects: {e}.")
+
+
+def _run_discovery(app: Flask) -> None:
+    with app.app_context():
+        try:
+            discover_projects(blocking=False)
+        except Exception as e:
+            app.logger.error(f"Failed to discover projects: {e}.")
+
+
+def add_discovery_job_to_scheduler(scheduler: BackgroundScheduler, app: Flask) -> None:
+    """Adds the recurring discovery job to the given scheduler.
+
+    The first discovery runs right away, later ones every
+    `PROJECT_DISCOVERY_INTERVAL` seconds. A run is skipped, rather than
+    queued, if the previous one is still running.
+    """
+    app.logger.debug("Adding recurring project discovery job to scheduler.")
+    scheduler.add_job(
+        _run_discovery,
+        "interval",
+        seconds=app.config["PROJECT_DISCOVERY_INTERVAL"],
+        args=[app],
+        next_run_time=datetime.datetime.now(),
+        max_instances=1,
+        coalesce=True,
+    )
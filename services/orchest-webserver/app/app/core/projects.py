@@ -399,11 +399,15 @@ class SyncProjectPipelinesDBState(TwoPhaseFunction):
 def build_environments(environment_uuids, project_uuid):
     project_path = project_uuid_to_path(project_uuid)
 
+    # These builds aren't requested by the user, e.g. they are part of
+    # the project discovery, there is no need to build an environment
+    # that didn't change since its latest image has been built.
     environment_image_build_requests = [
         {
             "project_uuid": project_uuid,
             "project_path": project_path,
             "environment_uuid": environment_uuid,
+            "skip_if_unchanged": True,
         }
         for environment_uuid in environment_uuids
     ]
@@ -1,7 +1,7 @@
 import uuid
 
 from sqlalchemy import UniqueConstraint, func
-from sqlalchemy.dialects.postgresql import TIMESTAMP
+from sqlalchemy.dialects.postgresql import JSONB, TIMESTAMP
 from sqlalchemy.sql import expression, text
 
 from app.connections import db
@@ -60,6 +60,17 @@ class Pipeline(BaseModel):
         nullable=False,
         server_default=text("'READY'"),
     )
+    # Projection of the pipeline definition file, so that pipelines can
+    # be listed without reading their files. Refreshed when the mtime
+    # of the file changes, see `refresh_pipelines_metadata`.
+    name = db.Column(db.Text, nullable=True)
+    step_count = db.Column(db.Integer, nullable=True)
+    # Sorted uuids of the environments used by the steps.
+    environments = db.Column(JSONB, nullable=True)
+    # None if the file was missing or modified too recently to be
+    # trusted, which causes the projection to be refreshed.
+    file_mtime_ns = db.Column(db.BigInteger, nullable=True)
+    file_hash = db.Column(db.String(32), nullable=True)
 
 
 # This class is only serialized on disk, it's never stored in the
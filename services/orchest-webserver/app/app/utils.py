@@ -1,24 +1,24 @@
-import collections
 import hashlib
 import json
 import os
 import re
 import uuid
 from datetime import datetime
-from typing import Dict, List, Literal, Optional, Union
+from typing import Dict, List, Literal, Optional, Tuple, Union
 
 import requests
 from flask import current_app
 from nbconvert import HTMLExporter
 from werkzeug.utils import safe_join
 
+from _orchest.internals import blob_store
 from _orchest.internals import compat as _compat
 from _orchest.internals import config as _config
 from _orchest.internals import utils as _utils
 from _orchest.internals.utils import is_services_definition_valid, rmtree
 from app import error
 from app.config import CONFIG_CLASS as StaticConfig
-from app.core import scheduler
+from app.core import directory_index, scheduler
 from app.models import Environment, Pipeline, Project
 from app.schemas import EnvironmentSchema
 
@@ -119,7 +119,11 @@ def get_project_directory(
 
 
 def get_project_snapshot_size(project_uuid):
-    """Returns the snapshot size for a project in MB."""
+    """Returns the snapshot size for a project in MB.
+
+    Files that are unchanged since the last snapshot of the project are
+    shared with it, thus don't count towards the size.
+    """
 
     project_dir = get_project_directory(project_uuid)
 
@@ -130,8 +134,10 @@ def get_project_snapshot_size(project_uuid):
     # value.
     skip_dirs = [".orchest"]
 
+    size = blob_store.get_new_content_size(project_uuid, project_dir, skip_dirs)
+
     # Convert bytes to megabytes.
-    return _utils.get_directory_size(project_dir, skip_dirs) / (1024**2)
+    return size / (1024**2)
 
 
 def project_exists(project_uuid):
@@ -196,6 +202,36 @@ def get_environments(project_uuid: str, language=None):
     return environments
 
 
+# Environments directory to the listing it had, as given by the
+# directory index, when its environments were last counted and the
+# number of environments.
+_environment_counts: Dict[str, Tuple[list, int]] = {}
+
+
+def get_environment_count(project_uuid: str) -> int:
+    """Counts the environments of a project.
+
+    The environments are only read from disk again if the listing of
+    the environments directory has been read again by the directory
+    index, i.e. if the directory changed or has been invalidated.
+    """
+    environments_dir = safe_join(
+        get_project_directory(project_uuid), ".orchest", "environments"
+    )
+    index = directory_index.get_index(_config.USERDIR_PROJECTS)
+    entries = index.get_entries(environments_dir)
+    if entries is None:
+        return 0
+
+    cached = _environment_counts.get(environments_dir)
+    if cached is not None and cached[0] is entries:
+        return cached[1]
+
+    count = len(get_environments(project_uuid))
+    _environment_counts[environments_dir] = (entries, count)
+    return count
+
+
 def preprocess_script(script):
     """
     This preprocesses bash scripts
@@ -229,6 +265,8 @@ def serialize_environment_to_disk(environment, env_directory):
     ) as file:
         file.write(environment.setup_script)
 
+    directory_index.invalidate(env_directory)
+
 
 def read_environment_from_disk(env_directory, project_uuid) -> Optional[Environment]:
 
@@ -271,6 +309,7 @@ def delete_environment(app, project_uuid, environment_uuid):
 
     environment_dir = get_environment_directory(environment_uuid, project_uuid)
     rmtree(environment_dir)
+    directory_index.invalidate(environment_dir)
 
 
 def populate_default_environments(project_uuid):
@@ -380,63 +419,41 @@ def pipeline_uuid_to_path(pipeline_uuid, project_uuid, job_uuid=None):
             return None
 
 
-def project_entity_counts(
-    project_uuid: str, get_job_count=False, get_session_count=False
-):
-
-    counts = {}
-
-    counts["pipeline_count"] = Pipeline.query.filter(
-        Pipeline.project_uuid == project_uuid
-    ).count()
-
-    counts["environment_count"] = len(get_environments(project_uuid))
-
-    if get_job_count:
-        counts["job_count"] = get_api_entity_counts(
-            "/api/jobs/", "jobs", project_uuid
-        ).get(project_uuid, 0)
-
-    if get_session_count:
-        counts["session_count"] = get_api_entity_counts(
-            "/api/sessions/", "sessions", project_uuid
-        ).get(project_uuid, 0)
-
-    return counts
-
-
-def get_job_counts(args: Optional[Dict[str, str]]):
-    query_args = request_args_to_string(args)
-    return get_api_entity_counts(f"/api/jobs/{query_args}", "jobs")
+def get_project_entity_counts(
+    project_uuid: Optional[str] = None,
+) -> Dict[str, Dict[str, int]]:
+    """Gets the job, session and pipeline counts of projects.
 
+    The counts are aggregated by the orchest-api, see its
+    `/api/projects/entity-counts` endpoint.
 
-def get_session_counts():
-    return get_api_entity_counts("/api/sessions/", "sessions")
+    Args:
+        project_uuid: Only get the counts of this project.
 
+    Returns:
+        A mapping from project uuid to its `job_count`,
+        `active_job_count`, `session_count` and `pipeline_count`. Empty
+        if the counts could not be fetched.
 
-def get_api_entity_counts(endpoint, entity_key, project_uuid=None):
+    """
     params = {}
     if project_uuid is not None:
         params["project_uuid"] = project_uuid
 
     resp = requests.get(
-        f'http://{current_app.config["ORCHEST_API_ADDRESS"]}{endpoint}', params=params
+        f'http://{current_app.config["ORCHEST_API_ADDRESS"]}'
+        "/api/projects/entity-counts",
+        params=params,
     )
 
     if resp.status_code != 200:
         current_app.logger.error(
-            "Failed to fetch entity count "
-            "from orchest-api. Endpoint [%s] Entity key[%s]. Status code: %d"
-            % (endpoint, entity_key, resp.status_code)
+            "Failed to fetch entity counts from orchest-api. Status code: %d"
+            % resp.status_code
         )
         return {}
 
-    data = resp.json()
-    counts = collections.defaultdict(int)
-    for entity in data[entity_key]:
-        counts[entity["project_uuid"]] += 1
-
-    return counts
+    return {counts.pop("project_uuid"): counts for counts in resp.json()["projects"]}
 
 
 def project_uuid_to_path(project_uuid: Optional[str] = None) -> str:
@@ -449,28 +466,42 @@ def project_uuid_to_path(project_uuid: Optional[str] = None) -> str:
 
 def find_pipelines_in_dir(path, relative_to=None):
 
-    ignore_dirs = [".ipynb_checkpoints"]
+    # Directories that are unlikely to contain pipelines but can contain
+    # a lot of files, e.g. dependencies.
+    ignore_dirs = [
+        ".git",
+        ".ipynb_checkpoints",
+        ".mypy_cache",
+        ".pytest_cache",
+        ".tox",
+        ".venv",
+        "__pycache__",
+        "node_modules",
+        "site-packages",
+        "venv",
+    ]
 
     pipelines = []
 
-    if os.path.isdir(path):
-        for root, dirs, files in os.walk(path):
+    # The directory index of the parent is used, i.e. the one of the
+    # projects directory for a project, so that the pipelines of all
+    # projects are found through the same, cached, listings.
+    index = directory_index.get_index(os.path.dirname(os.path.normpath(path)))
+    for root, entries in index.walk(path, skip_dirs=ignore_dirs):
 
-            dirs[:] = [d for d in dirs if d not in ignore_dirs]
+        if relative_to is not None:
+            root = root[len(relative_to) :]
+            if root.startswith("/"):
+                root = root[1:]
 
-            if relative_to is not None:
-                root = root[len(relative_to) :]
-                if root.startswith("/"):
-                    root = root[1:]
+        for entry in entries:
+            if not entry.is_dir and entry.name.endswith(".orchest"):
 
-            for fName in files:
-                if fName.endswith(".orchest"):
-
-                    # Path normalization is important for correctly
-                    # detecting pipelines that were deleted through the
-                    # file system in SyncProjectPipelinesDBState, i.e.
-                    # to avoid false positives.
-                    pipelines.append(os.path.normpath(safe_join(root, fName)))
+                # Path normalization is important for correctly
+                # detecting pipelines that were deleted through the
+                # file system in SyncProjectPipelinesDBState, i.e. to
+                # avoid false positives.
+                pipelines.append(os.path.normpath(safe_join(root, entry.name)))
 
     return pipelines
 
@@ -490,6 +521,8 @@ def remove_project_jobs_directories(project_uuid):
     if os.path.isdir(project_jobs_path):
         rmtree(project_jobs_path, ignore_errors=True)
 
+    blob_store.remove_project_store(project_uuid)
+
 
 def get_ipynb_template(language: str):
 
@@ -688,6 +721,10 @@ def check_pipeline_correctness(pipeline_json):
     if not isinstance(max_steps_parallelism, int):
         invalid_entries["max_steps_parallelism"] = "invalid_value"
 
+    cache_step_outputs = pipeline_json["settings"].get("cache_step_outputs", False)
+    if not isinstance(cache_step_outputs, bool):
+        invalid_entries["cache_step_outputs"] = "invalid_value"
+
     if not is_services_definition_valid(pipeline_json.get("services", {})):
         invalid_entries["services"] = "invalid_value"
 
@@ -25,6 +25,7 @@ def api_proxy_environment_image_builds(
         project_uuid:str
         environment_uuid:str
         project_path:str
+        skip_if_unchanged:bool (optional)
     }
     """
 
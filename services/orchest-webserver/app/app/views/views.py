@@ -1,18 +1,25 @@
 import copy
-import io
 import json
 import os
-import pathlib
 import subprocess
+import unicodedata
 import uuid
-import zipfile
 from typing import Optional
 
 import requests
 import sqlalchemy
-from flask import current_app, jsonify, request, send_file
+from flask import (
+    Response,
+    current_app,
+    jsonify,
+    request,
+    send_file,
+    stream_with_context,
+)
 from flask_restful import Api, Resource
 from sqlalchemy.orm.exc import NoResultFound
+from werkzeug.datastructures import Headers
+from werkzeug.urls import url_quote
 from werkzeug.utils import safe_join
 
 from _orchest.internals import analytics
@@ -20,22 +27,22 @@ from _orchest.internals import config as _config
 from _orchest.internals.two_phase_executor import TwoPhaseExecutor
 from _orchest.internals.utils import copytree, rmtree
 from app import error as app_error
+from app.core import directory_index
 from app.core.filemanager import (
     allowed_file,
     find_unique_duplicate_filepath,
     generate_tree,
     process_request,
-    zipdir,
+    stream_zipdir,
 )
-from app.core.pipelines import CreatePipeline, DeletePipeline, MovePipeline
-from app.core.projects import (
-    CreateProject,
-    DeleteProject,
-    RenameProject,
-    SyncProjectPipelinesDBState,
-    discoverFSCreatedProjects,
-    discoverFSDeletedProjects,
+from app.core.pipelines import (
+    CreatePipeline,
+    DeletePipeline,
+    MovePipeline,
+    get_pipelines_metadata,
 )
+from app.core.project_discovery import queue_discovery, sync_project_pipelines
+from app.core.projects import CreateProject, DeleteProject, RenameProject
 from app.kernel_manager import populate_kernels
 from app.models import Environment, Pipeline, Project
 from app.schemas import EnvironmentSchema, ProjectSchema
@@ -44,9 +51,9 @@ from app.utils import (
     create_file,
     delete_environment,
     get_environment,
+    get_environment_count,
     get_environment_directory,
     get_environments,
-    get_job_counts,
     get_notebook_html,
     get_orchest_examples_json,
     get_orchest_update_info_json,
@@ -54,14 +61,13 @@ from app.utils import (
     get_pipeline_json,
     get_pipeline_path,
     get_project_directory,
+    get_project_entity_counts,
     get_project_snapshot_size,
-    get_session_counts,
     is_valid_data_path,
     is_valid_pipeline_relative_path,
     normalize_project_relative_path,
     pipeline_set_notebook_kernels,
     preprocess_script,
-    project_entity_counts,
     project_exists,
     resolve_absolute_path,
     serialize_environment_to_disk,
@@ -433,7 +439,11 @@ def register_views(app, db):
             )
         else:
             # Merge the project data coming from the orchest-api.
-            counts = project_entity_counts(project_uuid, get_job_count=True)
+            counts = get_project_entity_counts(project_uuid).get(project_uuid, {})
+            counts = {
+                key: counts.get(key, 0) for key in ["pipeline_count", "job_count"]
+            }
+            counts["environment_count"] = get_environment_count(project_uuid)
             project = {
                 **project.as_dict(),
                 **resp.json(),
@@ -517,57 +527,41 @@ def register_views(app, db):
     @app.route("/async/projects", methods=["GET"])
     def projects_get():
 
-        if request.args.get("skip_discovery") != "true":
-            discoverFSDeletedProjects()
-            discoverFSCreatedProjects(
-                skip_env_builds_on_discovery=request.args.get(
-                    "skip_env_builds_on_discovery", False
-                )
-            )
+        # Projects and pipelines changed through the file system are
+        # discovered in the background, see `projects_rescan` to force
+        # a discovery.
 
         # Projects that are in a INITIALIZING or DELETING state won't
         # be shown until ready.
         projects = projects_schema.dump(Project.query.filter_by(status="READY").all())
 
+        entity_counts = get_project_entity_counts()
+        count_keys = ["pipeline_count"]
         if request.args.get("session_counts") == "true":
-            session_counts = get_session_counts()
-
+            count_keys.append("session_count")
         if request.args.get("active_job_counts") == "true":
-            active_job_counts = get_job_counts({"active": "true"})
+            count_keys.append("active_job_count")
 
         for project in projects:
+            counts = entity_counts.get(project["uuid"], {})
+            project.update({key: counts.get(key, 0) for key in count_keys})
+            project["environment_count"] = get_environment_count(project["uuid"])
 
-            # Discover both pipelines of newly initialized projects and
-            # manually initialized pipelines of existing projects. Use a
-            # a TwoPhaseExecutor for each project so that issues in one
-            # project do not hinder the pipeline synchronization of
-            # others.
-            if request.args.get("skip_discovery") != "true":
-                try:
-                    with TwoPhaseExecutor(db.session) as tpe:
-                        SyncProjectPipelinesDBState(tpe).transaction(project["uuid"])
-                except Exception as e:
-                    current_app.logger.error(
-                        (
-                            "Error during project pipelines synchronization of "
-                            f'{project["path"]}: {e}.'
-                        )
-                    )
-
-            counts = project_entity_counts(project["uuid"])
-            project.update(counts)
-
-            if request.args.get("session_counts") == "true":
-                project.update(
-                    {"session_count": session_counts.get(project["uuid"], 0)}
-                )
+        return jsonify(projects)
 
-            if request.args.get("active_job_counts") == "true":
-                project.update(
-                    {"active_job_count": active_job_counts.get(project["uuid"], 0)}
-                )
+    @app.route("/async/projects/rescan", methods=["POST"])
+    def projects_rescan():
+        """Queues a discovery of projects and pipelines changed via FS.
 
-        return jsonify(projects)
+        The discovery runs in the background, after the running one if
+        any, see `queue_discovery`. With `force=true`, the pipelines of
+        every project are synchronized, not only the ones whose
+        pipeline files changed.
+        """
+        force = request.args.get("force") == "true"
+        skip_env_builds = request.args.get("skip_env_builds_on_discovery") == "true"
+        queue_discovery(app, force=force, skip_env_builds_on_discovery=skip_env_builds)
+        return jsonify({"message": "Projects are being rescanned."}), 202
 
     @app.route("/async/projects", methods=["POST"])
     def projects_post():
@@ -700,8 +694,7 @@ def register_views(app, db):
             return jsonify({"message": "Project could not be found."}), 404
 
         try:
-            with TwoPhaseExecutor(db.session) as tpe:
-                SyncProjectPipelinesDBState(tpe).transaction(project_uuid)
+            sync_project_pipelines(project_uuid)
         except Exception as e:
             msg = (
                 "Error during project pipelines synchronization of "
@@ -709,52 +702,24 @@ def register_views(app, db):
             )
             return jsonify({"message": msg}), 500
 
-        pipelines = Pipeline.query.filter(Pipeline.project_uuid == project_uuid).all()
-        pipelines_augmented = []
-
+        pipelines = get_pipelines_metadata(project_uuid)
         for pipeline in pipelines:
+            if pipeline["name"] is None:
+                pipeline["name"] = "Warning: pipeline file was not found."
 
-            pipeline_augmented = {
-                "uuid": pipeline.uuid,
-                "path": pipeline.path,
-                "project_uuid": pipeline.project_uuid,
-            }
-
-            pipeline_json = get_pipeline_json(pipeline.uuid, pipeline.project_uuid)
-            if pipeline_json is not None:
-                pipeline_augmented["name"] = pipeline_json["name"]
-            else:
-                pipeline_augmented["name"] = "Warning: pipeline file was not found."
-
-            pipelines_augmented.append(pipeline_augmented)
-
-        json_string = json.dumps({"success": True, "result": pipelines_augmented})
+        json_string = json.dumps({"success": True, "result": pipelines})
 
         return json_string, 200, {"content-type": "application/json"}
 
     @app.route("/async/pipelines", methods=["GET"])
     def pipelines_get_all():
 
-        pipelines = Pipeline.query.all()
-        pipelines_augmented = []
-
+        pipelines = get_pipelines_metadata()
         for pipeline in pipelines:
+            if pipeline["name"] is None:
+                pipeline["name"] = "Warning: pipeline file was not found."
 
-            pipeline_augmented = {
-                "uuid": pipeline.uuid,
-                "path": pipeline.path,
-                "project_uuid": pipeline.project_uuid,
-            }
-
-            pipeline_json = get_pipeline_json(pipeline.uuid, pipeline.project_uuid)
-            if pipeline_json is not None:
-                pipeline_augmented["name"] = pipeline_json["name"]
-            else:
-                pipeline_augmented["name"] = "Warning: pipeline file was not found."
-
-            pipelines_augmented.append(pipeline_augmented)
-
-        json_string = json.dumps({"success": True, "result": pipelines_augmented})
+        json_string = json.dumps({"success": True, "result": pipelines})
 
         return json_string, 200, {"content-type": "application/json"}
 
@@ -1018,6 +983,7 @@ def register_views(app, db):
             return jsonify({"message": "File already exists."}), 409
         try:
             create_file(file_path, content=body)
+            directory_index.invalidate(file_path)
             return jsonify({"message": "File created."})
         except IOError as e:
             app.logger.error(f"Could not create file at {file_path}. Error: {e}")
@@ -1180,6 +1146,8 @@ def register_views(app, db):
                 rmtree(target_path)
             except Exception:
                 return jsonify({"message": "Deletion failed."}), 500
+            finally:
+                directory_index.invalidate(target_path)
         else:
             return jsonify({"message": "No file or directory at path %s" % path}), 500
 
@@ -1211,6 +1179,8 @@ def register_views(app, db):
             except Exception as e:
                 app.logger.error(e)
                 return jsonify({"message": "Copy of file/directory failed"}), 500
+            finally:
+                directory_index.invalidate(new_path)
         else:
             return jsonify({"message": "No file or directory at path %s" % path}), 500
 
@@ -1240,6 +1210,7 @@ def register_views(app, db):
         # even if name ends like an extension, e.g. "my-folder.txt"
         # it will be seen as a folder name
         os.makedirs(full_path, exist_ok=True)
+        directory_index.invalidate(full_path)
         return jsonify({"message": "Success"})
 
     @app.route("/async/file-management/upload", methods=["POST"])
@@ -1273,6 +1244,7 @@ def register_views(app, db):
                 os.makedirs(dir_path, exist_ok=True)
             file_path = safe_join(dir_path, filename)
             file.save(file_path)
+            directory_index.invalidate(file_path)
 
         return jsonify({"file_path": file_path})
 
@@ -1302,12 +1274,16 @@ def register_views(app, db):
             return jsonify({"message": "Success"})
         except Exception:
             return jsonify({"message": "Failed to rename"}), 500
+        finally:
+            directory_index.invalidate(abs_old_path)
+            directory_index.invalidate(abs_new_path)
 
     @app.route("/async/file-management/download", methods=["GET"])
     def filemanager_download():
         root = request.args.get("root")
         path = request.args.get("path")
         project_uuid = request.args.get("project_uuid")
+        compress = request.args.get("compress") == "true"
 
         try:
             root_dir_path, _ = process_request(
@@ -1320,21 +1296,31 @@ def register_views(app, db):
 
         if os.path.isfile(target_path):
             return send_file(target_path, as_attachment=True)
+        elif not os.path.isdir(target_path):
+            return jsonify({"message": "No file or directory at path %s" % path}), 404
         else:
-            memory_file = io.BytesIO()
-            with zipfile.ZipFile(memory_file, "w", zipfile.ZIP_STORED) as zf:
-                zipdir(target_path, zf)
-            memory_file.seek(0)
-
             # "normpath" takes care of trailing slashes.
             file_name = f"{os.path.basename(os.path.normpath(target_path))}.zip"
 
-            return send_file(
-                memory_file,
+            # The archive is streamed while it is being written instead
+            # of being built in memory first.
+            headers = Headers({"Cache-Control": "no-cache"})
+            # Like send_file, non-ASCII names are passed as "filename*".
+            try:
+                file_name.encode("ascii")
+                names = {"filename": file_name}
+            except UnicodeEncodeError:
+                simple = unicodedata.normalize("NFKD", file_name)
+                names = {
+                    "filename": simple.encode("ascii", "ignore").decode("ascii"),
+                    "filename*": f"UTF-8''{url_quote(file_name, safe='')}",
+                }
+            headers.set("Content-Disposition", "attachment", **names)
+
+            return Response(
+                stream_with_context(stream_zipdir(target_path, compress=compress)),
                 mimetype="application/zip",
-                as_attachment=True,
-                download_name=file_name,
-                max_age=0,
+                headers=headers,
             )
 
     @app.route("/async/file-management/import-project-from-data", methods=["POST"])
@@ -1350,6 +1336,8 @@ def register_views(app, db):
         from_path = safe_join("/userdir/data", name)
         to_path = safe_join("/userdir/projects", name)
         os.rename(from_path, to_path)
+        directory_index.invalidate(from_path)
+        directory_index.invalidate(to_path)
         # Pick up the project from the fs.
         with TwoPhaseExecutor(db.session) as tpe:
             project_uuid = CreateProject(tpe).transaction(name)
@@ -1381,18 +1369,10 @@ def register_views(app, db):
         path_filter = path_filter[1:]
         app.logger.debug(f"Path filter {path_filter}")
 
-        matches = []
-
-        for extension in extensions:
-            matches += list(
-                pathlib.Path(safe_join(root_dir_path, path_filter)).glob(
-                    "**/*.{}".format(extension)
-                )
-            )
-
-        return jsonify(
-            {"files": [os.path.relpath(str(match), root_dir_path) for match in matches]}
+        files = directory_index.search_extensions(
+            root_dir_path, safe_join(root_dir_path, path_filter), extensions
         )
+        return jsonify({"files": files})
 
     @app.route("/async/file-management/browse", methods=["GET"])
     def browse_files():
@@ -1405,6 +1385,16 @@ def register_views(app, db):
         run_uuid = request.args.get("run_uuid")
         snapshot_uuid = request.args.get("snapshot_uuid")
 
+        # Page through the children of very large directories.
+        try:
+            offset = int(request.args.get("offset", 0))
+            limit = request.args.get("limit")
+            limit = int(limit) if limit is not None else None
+            if offset < 0 or (limit is not None and limit < 0):
+                raise ValueError()
+        except ValueError:
+            return jsonify({"message": "Invalid value for offset or limit."}), 400
+
         try:
             root_dir_path, depth = process_request(
                 root=root,
@@ -1426,5 +1416,11 @@ def register_views(app, db):
         app.logger.debug(f"Path filter {path_filter}")
 
         return jsonify(
-            generate_tree(root_dir_path, path_filter=path_filter, depth=depth)
+            generate_tree(
+                root_dir_path,
+                path_filter=path_filter,
+                depth=depth,
+                offset=offset,
+                limit=limit,
+            )
         )
@@ -0,0 +1,41 @@
+"""Add the pipeline metadata projection to the pipelines table
+
+Revision ID: 2f1c9a7d4e63
+Revises: 5581eb626bb2
+Create Date: 2026-10-17 08:12:41.315270
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "2f1c9a7d4e63"
+down_revision = "5581eb626bb2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("pipelines", sa.Column("name", sa.Text(), nullable=True))
+    op.add_column("pipelines", sa.Column("step_count", sa.Integer(), nullable=True))
+    op.add_column(
+        "pipelines",
+        sa.Column(
+            "environments", postgresql.JSONB(astext_type=sa.Text()), nullable=True
+        ),
+    )
+    op.add_column(
+        "pipelines", sa.Column("file_mtime_ns", sa.BigInteger(), nullable=True)
+    )
+    op.add_column(
+        "pipelines", sa.Column("file_hash", sa.String(length=32), nullable=True)
+    )
+
+
+def downgrade():
+    op.drop_column("pipelines", "file_hash")
+    op.drop_column("pipelines", "file_mtime_ns")
+    op.drop_column("pipelines", "environments")
+    op.drop_column("pipelines", "step_count")
+    op.drop_column("pipelines", "name")
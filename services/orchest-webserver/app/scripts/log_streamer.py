@@ -1,8 +1,27 @@
 #!/usr/bin/env python3
-
+"""Streams the logs of steps and services to the clients viewing them.
+
+Every session, i.e. a client viewing a log, is registered through the
+socketio server. A persistent handle is kept per log file, shared by
+the sessions viewing it, and only the logs that changed are read, once,
+their new content is emitted to all their sessions. Changes are
+detected through inotify on the directory of the log. Inotify doesn't
+report changes made by other nodes to network filesystems, logs on such
+filesystems are polled through their stat info instead.
+
+A log starts with a line containing a UUID, a different UUID means that
+the log was rewritten, e.g. because the step was run again, in which
+case the client is told to reset its view.
+"""
+import codecs
+import ctypes
+import ctypes.util
 import logging
 import os
+import select
+import struct
 import sys
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
 from threading import Lock
@@ -13,9 +32,29 @@ from _orchest.internals import config as _config
 
 # timeout after 2 minutes, heartbeat should be sent every minute
 HEARTBEAT_TIMEOUT = timedelta(minutes=2)
-
+HEARTBEAT_CHECK_INTERVAL = 1
+# Content written within this interval is emitted at once.
+EMIT_BATCH_INTERVAL = 0.05
+POLL_INTERVAL = 0.25
+# Length of the UUID on the first line of a log.
+LOG_UUID_LENGTH = 36
+READ_SIZE = 1 << 20
+
+NETWORK_FILESYSTEMS = {
+    "9p",
+    "ceph",
+    "cifs",
+    "glusterfs",
+    "lustre",
+    "nfs",
+    "nfs4",
+    "smb3",
+    "smbfs",
+}
+
+# Sessions by session_uuid and the handles of their logs by path.
 log_file_store = {}
-file_handles = {}
+log_handle_store = {}
 
 
 lock = Lock()
@@ -46,34 +85,199 @@ class LogFile:
         self.service_name = service_name
         self.pipeline_run_uuid = pipeline_run_uuid
         self.job_uuid = job_uuid
-        self.log_uuid = ""
         self.last_heartbeat = datetime.now()
 
+        # Set through add_log_file.
+        self.path = None
+
+
+class LogHandle:
+    """The open log file shared by the sessions viewing it."""
+
+    def __init__(self, path):
+        self.path = path
+        self.session_uuids = set()
+        self.log_uuid = ""
+
+        # Set through open_log_file.
+        self.file = None
+        self.inode = None
+        # Offset up to which the file has been emitted.
+        self.offset = 0
+        self.decoder = None
+        # Last seen (inode, size, mtime), used when polling.
+        self.stat_info = None
+        self.polled = False
+
+
+class InotifyWatcher:
+    """Watches the directories of log files through inotify.
+
+    Directories are watched instead of files so that log files that are
+    removed and created again keep being watched.
+    """
+
+    _EVENT_HEADER = struct.Struct("iIII")
+    _IN_MODIFY = 0x00000002
+    _IN_MOVED_FROM = 0x00000040
+    _IN_MOVED_TO = 0x00000080
+    _IN_CREATE = 0x00000100
+    _IN_DELETE = 0x00000200
+    _IN_IGNORED = 0x00008000
+    _IN_Q_OVERFLOW = 0x00004000
+    _MASK = _IN_MODIFY | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        # wd -> directory, directory -> (wd, number of files watched).
+        self._directories = {}
+        self._watches = {}
+
+    def add(self, path):
+        directory, _ = os.path.split(path)
+        if directory in self._watches:
+            wd, count = self._watches[directory]
+            self._watches[directory] = (wd, count + 1)
+            return
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), self._MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed: {path}")
+        self._directories[wd] = directory
+        self._watches[directory] = (wd, 1)
+
+    def remove(self, path):
+        directory, _ = os.path.split(path)
+        if directory not in self._watches:
+            return
+        wd, count = self._watches[directory]
+        if count > 1:
+            self._watches[directory] = (wd, count - 1)
+            return
+        del self._watches[directory]
+        del self._directories[wd]
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read_changes(self):
+        """Returns the changed paths, None if changes were lost."""
+        changed = set()
+        while True:
+            try:
+                buffer = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+
+            position = 0
+            while position < len(buffer):
+                wd, mask, _, length = self._EVENT_HEADER.unpack_from(buffer, position)
+                position += self._EVENT_HEADER.size
+                name = buffer[position : position + length].rstrip(b"\0")
+                position += length
+
+                if mask & self._IN_Q_OVERFLOW:
+                    changed = None
+                    continue
+                directory = self._directories.get(wd)
+                if directory is None:
+                    continue
+                if mask & self._IN_IGNORED:
+                    # The directory was removed, its files are gone.
+                    del self._directories[wd]
+                    self._watches.pop(directory, None)
+                    if changed is not None:
+                        changed.add(directory)
+                elif changed is not None:
+                    changed.add(os.path.join(directory, os.fsdecode(name)))
+
+
+def is_on_network_filesystem(path):
+    """Returns whether inotify would miss changes to the path."""
+    path = os.path.realpath(path)
+    mount_point, fs_type = "", None
+    try:
+        with open("/proc/self/mounts", "r") as mounts:
+            for line in mounts:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                # Spaces and such are octal escaped.
+                point = fields[1].encode().decode("unicode_escape")
+                is_parent = path == point or path.startswith(point.rstrip("/") + "/")
+                if is_parent and len(point) > len(mount_point):
+                    mount_point, fs_type = point, fields[2]
+    except OSError:
+        return True
+    return (
+        fs_type is None or fs_type in NETWORK_FILESYSTEMS or fs_type.startswith("fuse")
+    )
+
 
-def file_reader_loop(sio):
+def file_reader_loop(sio, watcher):
 
     logging.info("Entered file_reader_loop")
 
+    last_heartbeat_check = 0
     while True:
+        with lock:
+            polling = any(log_handle.polled for log_handle in log_handle_store.values())
+        timeout = POLL_INTERVAL if polling else HEARTBEAT_CHECK_INTERVAL
+
+        if watcher is not None:
+            select.select([watcher.fd], [], [], timeout)
+        else:
+            sio.sleep(timeout)
 
         with lock:
 
-            # list() used since entries can be removed during loop
-            for session_uuid in list(log_file_store):
-                check_timeout(session_uuid)
+            if time.monotonic() - last_heartbeat_check > HEARTBEAT_CHECK_INTERVAL:
+                last_heartbeat_check = time.monotonic()
+                # list() used since entries can be removed during loop
+                for session_uuid in list(log_file_store):
+                    check_timeout(session_uuid, watcher)
 
-            for session_uuid in list(log_file_store):
+            changed_paths = set() if watcher is None else watcher.read_changes()
+            for path in get_changed_log_paths(changed_paths):
                 try:
-                    read_emit_all_content(file_handles[session_uuid], sio, session_uuid)
+                    read_emit_all_content(sio, path, watcher)
                 except Exception as e:
                     logging.info(
                         "call to read_emit_all_content failed %s (%s)" % (e, type(e))
                     )
 
-        sio.sleep(0.01)
+        # Let writes accumulate so that they are emitted at once.
+        sio.sleep(EMIT_BATCH_INTERVAL)
+
+
+def get_changed_log_paths(changed_paths):
+    """Gets the paths of the log files that might have changed.
+
+    Args:
+        changed_paths: Paths reported by the watcher, None if changes
+            might have been missed.
+    """
+    changed_log_paths = []
+    for path, log_handle in log_handle_store.items():
+        if log_handle.polled:
+            try:
+                st = os.stat(path)
+                stat_info = (st.st_ino, st.st_size, st.st_mtime_ns)
+            except OSError:
+                stat_info = None
+            if stat_info != log_handle.stat_info:
+                log_handle.stat_info = stat_info
+                changed_log_paths.append(path)
+        elif (
+            changed_paths is None
+            or path in changed_paths
+            or os.path.dirname(path) in changed_paths
+        ):
+            changed_log_paths.append(path)
+    return changed_log_paths
 
 
-def check_timeout(session_uuid):
+def check_timeout(session_uuid, watcher):
     try:
         # check if heartbeat has timed-out
         if (
@@ -81,7 +285,7 @@ def check_timeout(session_uuid):
             < datetime.now() - HEARTBEAT_TIMEOUT
         ):
             logging.info("Clearing %s session due to heartbeat timeout." % session_uuid)
-            clear_log_file(session_uuid)
+            clear_log_file(session_uuid, watcher)
             logging.info(
                 "Removed session_uuid (%s). Sessions active: %d"
                 % (session_uuid, len(log_file_store))
@@ -93,91 +297,106 @@ def check_timeout(session_uuid):
         )
 
 
-def read_emit_all_content(file, sio, session_uuid):
+def read_log_uuid(log_handle):
+    first_line = os.pread(log_handle.file.fileno(), LOG_UUID_LENGTH + 1, 0)
+    if len(first_line) <= LOG_UUID_LENGTH or first_line[-1:] != b"\n":
+        # Not (entirely) written yet.
+        return None
+    return first_line[:LOG_UUID_LENGTH].decode("utf-8", errors="replace")
 
-    if session_uuid not in log_file_store:
-        logging.info("session_uuid[%s] not in log_file_store" % session_uuid)
-        return
 
-    if session_uuid not in file_handles:
-        logging.info("session_uuid[%s] not in file_handles" % session_uuid)
-        return
-
-    # check if log_uuid is current log_uuid
-    try:
-        latest_log_file = open(get_log_path(log_file_store[session_uuid]), "rb")
-        latest_log_file.seek(0)
-        read_log_uuid = latest_log_file.readline().decode("utf-8").strip()
-    except FileNotFoundError:
-        logging.info("The file has been removed, resetting logs.")
-        clear_log_file(session_uuid)
+def emit_to_sessions(sio, session_uuids, data):
+    for session_uuid in sorted(session_uuids):
         sio.emit(
             "pty-log-manager",
-            {"action": "pty-reset", "session_uuid": session_uuid},
+            {**data, "session_uuid": session_uuid},
             namespace="/pty",
         )
-        return
+
+
+def read_content(log_handle, start, end, decoder):
+    chunks = []
+    try:
+        while end is None or start < end:
+            size = READ_SIZE if end is None else min(READ_SIZE, end - start)
+            chunk = os.pread(log_handle.file.fileno(), size, start)
+            if not chunk:
+                break
+            start += len(chunk)
+            chunks.append(decoder.decode(chunk))
     except IOError as e:
-        logging.info("Could not read latest log file: %s" % e)
+        raise Exception("IOError reading log file %s" % e)
+    return start, "".join(chunks)
+
+
+def read_emit_all_content(sio, path, watcher):
+
+    if path not in log_handle_store:
+        logging.info("path[%s] not in log_handle_store" % path)
         return
-    except Exception as e:
-        logging.error(
-            "Could not read latest_log_file for session_uuid[%s]. Error: %s [%s]."
-            % (session_uuid, e, type(e))
-        )
+    log_handle = log_handle_store[path]
+
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        logging.info("The file has been removed, resetting logs.")
+        session_uuids = list(log_handle.session_uuids)
+        for session_uuid in session_uuids:
+            clear_log_file(session_uuid, watcher)
+        emit_to_sessions(sio, session_uuids, {"action": "pty-reset"})
         return
 
-    if (
-        read_log_uuid != log_file_store[session_uuid].log_uuid
-        and len(read_log_uuid) == 36
-    ):  # length of valid uuid
+    if st.st_ino != log_handle.inode:
+        logging.info("The file has been replaced, reopening it.")
+        close_file_handle(log_handle)
+        if not open_log_file(log_handle):
+            return
+    elif st.st_size < log_handle.offset:
+        # Truncated, the new content will come with a new log_uuid.
+        log_handle.offset = 0
+
+    log_uuid = read_log_uuid(log_handle)
+    if log_uuid is not None and log_uuid != log_handle.log_uuid:
 
         logging.info(
             "New log_uuid found, resetting pty."
-            + "Debug info: read_log_uuid[%s] stored_log_uuid[%s] session_uuid[%s]."
-            % (read_log_uuid, log_file_store[session_uuid].log_uuid, session_uuid)
+            + "Debug info: read_log_uuid[%s] stored_log_uuid[%s] path[%s]."
+            % (log_uuid, log_handle.log_uuid, path)
         )
 
-        sio.emit(
-            "pty-log-manager",
-            {"action": "pty-reset", "session_uuid": session_uuid},
-            namespace="/pty",
-        )
+        emit_to_sessions(sio, log_handle.session_uuids, {"action": "pty-reset"})
 
-        log_file_store[session_uuid].log_uuid = read_log_uuid
+        log_handle.log_uuid = log_uuid
+        log_handle.offset = LOG_UUID_LENGTH + 1
+        log_handle.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    log_handle.offset, content = read_content(
+        log_handle, log_handle.offset, None, log_handle.decoder
+    )
+    if content != "":
+        emit_to_sessions(
+            sio,
+            log_handle.session_uuids,
+            {"output": content, "action": "pty-broadcast"},
+        )
 
-        # new log file detected - swap file handle
-        close_file_handle(session_uuid)
-        file_handles[session_uuid] = latest_log_file
 
+def emit_seen_content(sio, log_handle, session_uuid):
+    """Emits the content the other sessions have seen to a new one."""
+    if log_handle.file is None or not log_handle.log_uuid:
         return
-    else:
-
-        try:
-            latest_log_file.close()
-        except IOError as e:
-            logging.info(
-                "Failed to close new log file %s for session_uuid %s"
-                % (e, session_uuid)
-            )
 
-    try:
-        content = file.read().decode("utf-8")
-
-        if content != "":
-            sio.emit(
-                "pty-log-manager",
-                {
-                    "output": content,
-                    "action": "pty-broadcast",
-                    "session_uuid": session_uuid,
-                },
-                namespace="/pty",
-            )
-    except IOError as e:
-        raise Exception("IOError reading log file %s" % e)
-    except Exception as e:
-        raise e
+    emit_to_sessions(sio, [session_uuid], {"action": "pty-reset"})
+    # Content after a partial character at the offset is emitted to all
+    # sessions, including the new one, once the character is complete.
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    _, content = read_content(
+        log_handle, LOG_UUID_LENGTH + 1, log_handle.offset, decoder
+    )
+    if content != "":
+        emit_to_sessions(
+            sio, [session_uuid], {"output": content, "action": "pty-broadcast"}
+        )
 
 
 # TODO: reuse (between Flask app and process scripts)
@@ -229,47 +448,124 @@ def get_log_path(log_file):
     )
 
 
-def clear_log_file(session_uuid):
-    close_file_handle(session_uuid)
+def clear_log_file(session_uuid, watcher):
     try:
-        del log_file_store[session_uuid]
-    except Exception:
+        log_file = log_file_store.pop(session_uuid)
+    except KeyError:
         logging.error("Key not in log_file_store: %s" % session_uuid)
+        return
+
+    log_handle = log_handle_store[log_file.path]
+    log_handle.session_uuids.discard(session_uuid)
+    if log_handle.session_uuids:
+        return
+    del log_handle_store[log_file.path]
+    close_file_handle(log_handle)
+    if watcher is not None and not log_handle.polled:
+        watcher.remove(log_handle.path)
 
 
-def create_file_handle(log_file):
+def open_log_file(log_handle):
+    try:
+        log_handle.file = open(log_handle.path, "rb")
+        log_handle.inode = os.fstat(log_handle.file.fileno()).st_ino
+        log_handle.offset = 0
+        log_handle.log_uuid = ""
+        log_handle.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        return True
+    except IOError as ioe:
+        logging.error(
+            "Could not open log file for path %s. Error: %s" % (log_handle.path, ioe)
+        )
+    return False
 
-    log_path = get_log_path(log_file)
+
+def create_file_handle(path, watcher):
 
     try:
         # this avoids a problem where opening the logs of a step
         # when the file is not there and then running the step
         # while keeping the logs open will not show the logs
-        Path(log_path).parent.mkdir(parents=True, exist_ok=True)
-        Path(log_path).touch(exist_ok=True)
-
-        file = open(log_path, "rb")
-        file.seek(0)
-        file_handles[log_file.session_uuid] = file
-        return True
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).touch(exist_ok=True)
     except IOError as ioe:
-        logging.error(
-            "Could not open log file for path %s. Error: %s" % (log_path, ioe)
+        logging.error("Could not create log file for path %s. Error: %s" % (path, ioe))
+        return None
+
+    log_handle = LogHandle(path)
+    log_handle.polled = watcher is None or is_on_network_filesystem(path)
+    if not log_handle.polled:
+        try:
+            watcher.add(path)
+        except OSError as e:
+            logging.info("Falling back to polling %s: %s" % (path, e))
+            log_handle.polled = True
+
+    if not open_log_file(log_handle):
+        if not log_handle.polled:
+            watcher.remove(path)
+        return None
+
+    if log_handle.polled:
+        # The content at the time of opening is emitted on registration,
+        # later polls compare against it.
+        st = os.fstat(log_handle.file.fileno())
+        log_handle.stat_info = (st.st_ino, st.st_size, st.st_mtime_ns)
+    return log_handle
+
+
+def add_log_file(sio, log_file, watcher):
+    session_uuid = log_file.session_uuid
+    if session_uuid in log_file_store:
+        logging.info(
+            "Tried to add %s to log_file_store but it already exists." % session_uuid
         )
+        return
 
-    return False
+    log_file.path = get_log_path(log_file)
+    if log_file.path in log_handle_store:
+        # Brings the other sessions up to date, so that the new session
+        # can be sent what they have seen.
+        try:
+            read_emit_all_content(sio, log_file.path, watcher)
+        except Exception as e:
+            logging.info("call to read_emit_all_content failed %s (%s)" % (e, type(e)))
+
+    log_handle = log_handle_store.get(log_file.path)
+    is_shared = log_handle is not None
+    if not is_shared:
+        log_handle = create_file_handle(log_file.path, watcher)
+        if log_handle is None:
+            logging.error("Adding session_uuid (%s) failed." % session_uuid)
+            return
+        log_handle_store[log_file.path] = log_handle
+
+    log_handle.session_uuids.add(session_uuid)
+    log_file_store[session_uuid] = log_file
+    logging.info(
+        "Added session_uuid (%s). Sessions active: %d"
+        % (session_uuid, len(log_file_store))
+    )
+
+    # The existing content is emitted right away, the watcher only
+    # reports changes made after the file was opened.
+    try:
+        if is_shared:
+            emit_seen_content(sio, log_handle, session_uuid)
+        else:
+            read_emit_all_content(sio, log_file.path, watcher)
+    except Exception as e:
+        logging.info("call to read_emit_all_content failed %s (%s)" % (e, type(e)))
 
 
-def close_file_handle(session_uuid):
+def close_file_handle(log_handle):
     try:
-        file_handles[session_uuid].close()
+        if log_handle.file is not None:
+            log_handle.file.close()
     except IOError as exc:
         logging.debug("Error closing log file %s" % exc)
-    except Exception as e:
-        logging.debug(
-            "close_file_handle filed for session_uuid[%s] with error: %s"
-            % (session_uuid, e)
-        )
+    log_handle.file = None
+    log_handle.inode = None
 
 
 def main():
@@ -278,6 +574,12 @@ def main():
 
     logging.info("log_streamer started")
 
+    try:
+        watcher = InotifyWatcher()
+    except (AttributeError, OSError) as e:
+        logging.info("inotify is not available, polling log files: %s" % e)
+        watcher = None
+
     # Connect to SocketIO server as client
     sio = socketio.Client()
     logging.getLogger("engineio").setLevel(logging.ERROR)
@@ -311,35 +613,19 @@ def main():
                     data["pipeline_uuid"],
                     data["project_uuid"],
                     data["project_path"],
-                    **kwargs
+                    **kwargs,
                 )
 
                 if "pipeline_run_uuid" in data:
                     log_file.pipeline_run_uuid = data["pipeline_run_uuid"]
                     log_file.job_uuid = data["job_uuid"]
 
-                if data["session_uuid"] not in log_file_store:
-
-                    if create_file_handle(log_file):
-                        log_file_store[data["session_uuid"]] = log_file
-                        logging.info(
-                            "Added session_uuid (%s). Sessions active: %d"
-                            % (data["session_uuid"], len(log_file_store))
-                        )
-                    else:
-                        logging.error(
-                            "Adding session_uuid (%s) failed." % data["session_uuid"]
-                        )
-                else:
-                    logging.info(
-                        "Tried to add %s to log_file_store but it already exists."
-                        % data["session_uuid"]
-                    )
+                add_log_file(sio, log_file, watcher)
 
             elif data["action"] == "stop-logs":
                 session_uuid = data["session_uuid"]
                 if session_uuid in log_file_store.keys():
-                    clear_log_file(session_uuid)
+                    clear_log_file(session_uuid, watcher)
                     logging.info(
                         "Removed session_uuid (%s). Sessions active: %d"
                         % (session_uuid, len(log_file_store))
@@ -363,7 +649,7 @@ def main():
                     )
 
     # Initialize file reader loop
-    file_reader_loop(sio)
+    file_reader_loop(sio, watcher)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,96 @@
+import os
+
+from app.core import directory_index
+from app.core.filemanager import generate_tree
+
+
+def _touch(root, path):
+    path = os.path.join(root, path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "w").close()
+
+
+def test_listings_are_cached_until_invalidated(tmp_path):
+    root = str(tmp_path)
+    _touch(root, "a.py")
+    index = directory_index.DirectoryIndex(root)
+
+    assert [e.name for e in index.get_entries(root)] == ["a.py"]
+
+    _touch(root, "b.py")
+    # Not revalidated within the revalidation interval.
+    assert [e.name for e in index.get_entries(root)] == ["a.py"]
+
+    index.invalidate(os.path.join(root, "b.py"))
+    assert [e.name for e in index.get_entries(root)] == ["a.py", "b.py"]
+
+
+def test_listings_are_revalidated_through_mtime(tmp_path, monkeypatch):
+    monkeypatch.setattr(directory_index, "_REVALIDATE_INTERVAL", 0)
+    root = str(tmp_path)
+    _touch(root, "a.py")
+    index = directory_index.DirectoryIndex(root)
+    index.get_entries(root)
+
+    _touch(root, "b.py")
+
+    assert [e.name for e in index.get_entries(root)] == ["a.py", "b.py"]
+
+
+def test_listings_are_capped(tmp_path, monkeypatch):
+    monkeypatch.setattr(directory_index, "_MAX_LISTINGS", 2)
+    root = str(tmp_path)
+    for path in ["a/x.py", "b/x.py", "c/x.py"]:
+        _touch(root, path)
+    index = directory_index.DirectoryIndex(root)
+
+    for name in ["a", "b", "a", "c"]:
+        index.get_entries(os.path.join(root, name))
+
+    # The least recently used listing is dropped.
+    assert list(index._listings) == [
+        os.path.join(root, "a"),
+        os.path.join(root, "c"),
+    ]
+
+
+def test_search_extensions(tmp_path):
+    root = str(tmp_path)
+    for path in ["a.ipynb", "d/b.py", "d/e/c.ipynb", "d/e/f.txt"]:
+        _touch(root, path)
+
+    files = directory_index.search_extensions(
+        root, os.path.join(root, "d"), ["ipynb", "py"]
+    )
+
+    assert files == ["d/e/c.ipynb", "d/b.py"]
+
+
+def test_walk_skips_dirs(tmp_path):
+    root = str(tmp_path)
+    for path in ["a/b.orchest", "a/.ipynb_checkpoints/b.orchest", "c.orchest"]:
+        _touch(root, path)
+    os.symlink(os.path.join(root, "a"), os.path.join(root, "link"))
+
+    walked = [
+        os.path.relpath(dir_path, root)
+        for dir_path, _ in directory_index.DirectoryIndex(root).walk(
+            root, skip_dirs=[".ipynb_checkpoints"]
+        )
+    ]
+
+    assert walked == [".", "a"]
+
+
+def test_generate_tree_pages_children(tmp_path):
+    root = str(tmp_path)
+    for path in ["z.py", "a/x.py", "b/y.py", "c.py"]:
+        _touch(root, path)
+
+    tree = generate_tree(root, "/", depth=2, offset=1, limit=2)
+
+    assert tree["total_children"] == 4
+    assert [child["name"] for child in tree["children"]] == ["b", "c.py"]
+    assert tree["children"][0]["children"] == [
+        {"type": "file", "name": "y.py", "path": "/b/y.py"}
+    ]
@@ -0,0 +1,26 @@
+import io
+import os
+import zipfile
+
+from app.core import filemanager
+
+
+def test_stream_zipdir(tmp_path, monkeypatch):
+    monkeypatch.setattr(filemanager, "_ZIP_READ_SIZE", 1024)
+    data_dir = tmp_path / "data"
+    (data_dir / "sub").mkdir(parents=True)
+    (data_dir / "a.csv").write_bytes(b"x,y\n" * 10000)
+    (data_dir / "sub" / "b.png").write_bytes(os.urandom(5000))
+
+    chunks = list(filemanager.stream_zipdir(str(data_dir), compress=True))
+
+    # The archive is yielded while it is being written.
+    assert len(chunks) > 5
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zf:
+        assert zf.testzip() is None
+        assert zf.read("data/a.csv") == b"x,y\n" * 10000
+        compress_types = {i.filename: i.compress_type for i in zf.infolist()}
+    assert compress_types == {
+        "data/a.csv": zipfile.ZIP_DEFLATED,
+        "data/sub/b.png": zipfile.ZIP_STORED,
+    }
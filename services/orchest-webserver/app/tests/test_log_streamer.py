@@ -0,0 +1,174 @@
+import os
+
+import pytest
+
+from scripts import log_streamer
+
+LOG_UUID_1 = "11111111-1111-1111-1111-111111111111"
+LOG_UUID_2 = "22222222-2222-2222-2222-222222222222"
+
+
+class FakeSocketIO:
+    def __init__(self):
+        self.emitted = []
+
+    def emit(self, event, data, namespace=None):
+        self.emitted.append(data)
+
+    def pop_actions(self, session_uuid="session"):
+        emitted = [d for d in self.emitted if d["session_uuid"] == session_uuid]
+        self.emitted = [d for d in self.emitted if d["session_uuid"] != session_uuid]
+        return [(data["action"], data.get("output")) for data in emitted]
+
+
+@pytest.fixture
+def sio():
+    return FakeSocketIO()
+
+
+@pytest.fixture(params=["inotify", "polling"])
+def watcher(request, monkeypatch):
+    if request.param == "polling":
+        yield None
+        return
+    # The tmp directory might be on any filesystem.
+    monkeypatch.setattr(log_streamer, "is_on_network_filesystem", lambda path: False)
+    watcher = log_streamer.InotifyWatcher()
+    yield watcher
+    os.close(watcher.fd)
+
+
+@pytest.fixture
+def log_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        log_streamer, "get_project_dir", lambda *args, **kwargs: str(tmp_path)
+    )
+    monkeypatch.setattr(log_streamer, "log_file_store", {})
+    monkeypatch.setattr(log_streamer, "log_handle_store", {})
+    log_file = log_streamer.LogFile("session", "pipeline", "project", "path", "step")
+    return log_streamer.get_log_path(log_file)
+
+
+def _write(path, content, mode="a"):
+    with open(path, mode) as f:
+        f.write(content)
+
+
+def _add_log_file(sio, watcher, session_uuid="session"):
+    log_file = log_streamer.LogFile(session_uuid, "pipeline", "project", "path", "step")
+    log_streamer.add_log_file(sio, log_file, watcher)
+    return log_file
+
+
+def _process_changes(sio, watcher):
+    changed_paths = set() if watcher is None else watcher.read_changes()
+    for path in log_streamer.get_changed_log_paths(changed_paths):
+        log_streamer.read_emit_all_content(sio, path, watcher)
+    return sio.pop_actions()
+
+
+def test_add_log_file_emits_existing_content(sio, watcher, log_path):
+    os.makedirs(os.path.dirname(log_path))
+    _write(log_path, f"{LOG_UUID_1}\nexisting\n")
+
+    log_file = _add_log_file(sio, watcher)
+
+    assert log_streamer.log_file_store == {"session": log_file}
+    assert sio.pop_actions() == [
+        ("pty-reset", None),
+        ("pty-broadcast", "existing\n"),
+    ]
+    assert _process_changes(sio, watcher) == []
+
+
+def test_add_log_file_creates_missing_log(sio, watcher, log_path):
+    _add_log_file(sio, watcher)
+
+    assert os.path.isfile(log_path)
+    assert sio.pop_actions() == []
+
+
+def test_growth(sio, watcher, log_path):
+    _add_log_file(sio, watcher)
+    _write(log_path, f"{LOG_UUID_1}\nline 1\n")
+    assert _process_changes(sio, watcher) == [
+        ("pty-reset", None),
+        ("pty-broadcast", "line 1\n"),
+    ]
+
+    _write(log_path, "line 2\n")
+
+    assert _process_changes(sio, watcher) == [("pty-broadcast", "line 2\n")]
+
+
+def test_truncation(sio, watcher, log_path):
+    os.makedirs(os.path.dirname(log_path))
+    _write(log_path, f"{LOG_UUID_1}\na long line of the first run\n")
+    _add_log_file(sio, watcher)
+    sio.pop_actions()
+
+    _write(log_path, f"{LOG_UUID_2}\nsecond run\n", mode="w")
+
+    assert _process_changes(sio, watcher) == [
+        ("pty-reset", None),
+        ("pty-broadcast", "second run\n"),
+    ]
+
+
+def test_rotation(sio, watcher, log_path):
+    os.makedirs(os.path.dirname(log_path))
+    _write(log_path, f"{LOG_UUID_1}\nfirst run\n")
+    log_file = _add_log_file(sio, watcher)
+    sio.pop_actions()
+    log_handle = log_streamer.log_handle_store[log_file.path]
+    inode = log_handle.inode
+
+    _write(f"{log_path}.tmp", f"{LOG_UUID_2}\nsecond run\n")
+    os.replace(f"{log_path}.tmp", log_path)
+
+    assert _process_changes(sio, watcher) == [
+        ("pty-reset", None),
+        ("pty-broadcast", "second run\n"),
+    ]
+    assert log_handle.inode != inode
+
+
+def test_removal(sio, watcher, log_path):
+    _add_log_file(sio, watcher)
+
+    os.remove(log_path)
+
+    assert _process_changes(sio, watcher) == [("pty-reset", None)]
+    assert log_streamer.log_file_store == {}
+
+
+def test_sessions_share_handle(sio, watcher, log_path):
+    os.makedirs(os.path.dirname(log_path))
+    _write(log_path, f"{LOG_UUID_1}\nline 1\n")
+    _add_log_file(sio, watcher)
+    sio.pop_actions()
+    _write(log_path, "line 2\n")
+
+    _add_log_file(sio, watcher, "other-session")
+
+    # The new session is sent what the other session has seen, which
+    # is brought up to date first.
+    assert list(log_streamer.log_handle_store) == [log_path]
+    assert sio.pop_actions() == [("pty-broadcast", "line 2\n")]
+    assert sio.pop_actions("other-session") == [
+        ("pty-reset", None),
+        ("pty-broadcast", "line 1\nline 2\n"),
+    ]
+
+    _write(log_path, "line 3\n")
+    assert _process_changes(sio, watcher) == [("pty-broadcast", "line 3\n")]
+    assert sio.pop_actions("other-session") == [("pty-broadcast", "line 3\n")]
+
+    # The handle is kept until the last session viewing it is cleared.
+    log_streamer.clear_log_file("session", watcher)
+    _write(log_path, "line 4\n")
+    assert _process_changes(sio, watcher) == []
+    assert sio.pop_actions("other-session") == [("pty-broadcast", "line 4\n")]
+
+    log_streamer.clear_log_file("other-session", watcher)
+    assert log_streamer.log_handle_store == {}
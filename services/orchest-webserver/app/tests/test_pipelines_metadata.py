@@ -0,0 +1,220 @@
+import json
+import os
+import time
+
+import pytest
+from flask import Flask
+
+from app.core import pipelines
+
+
+class FakePipeline:
+    uuid = None
+    project_uuid = None
+
+    def __init__(self, uuid, path="pipeline.orchest"):
+        self.uuid = uuid
+        self.project_uuid = "project-uuid"
+        self.path = path
+        self.name = None
+        self.step_count = None
+        self.environments = None
+        self.file_mtime_ns = None
+        self.file_hash = None
+
+
+class FakeProject:
+    uuid = None
+    path = None
+
+
+class FakeQuery:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def join(self, *args, **kwargs):
+        return self
+
+    def filter(self, *args, **kwargs):
+        return self
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    def __init__(self, rows):
+        self.rows = rows
+        self.commits = 0
+
+    def query(self, *args):
+        return FakeQuery(self.rows)
+
+    def commit(self):
+        self.commits += 1
+
+
+class FakeDb:
+    def __init__(self, rows=()):
+        self.session = FakeSession(list(rows))
+
+
+def _write_pipeline(path, name, steps=None, age=10):
+    with open(path, "w") as f:
+        json.dump({"name": name, "steps": steps or {}, "version": "1.2.3"}, f)
+    if age:
+        past = time.time() - age
+        os.utime(path, (past, past))
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    app = Flask(__name__)
+    app.config["PROJECTS_DIR"] = str(tmp_path)
+    (tmp_path / "project").mkdir()
+    monkeypatch.setattr(pipelines, "Pipeline", FakePipeline)
+    monkeypatch.setattr(pipelines, "Project", FakeProject)
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def pipeline_json_path(tmp_path):
+    return str(tmp_path / "project" / "pipeline.orchest")
+
+
+def test_refresh_reads_metadata(app, pipeline_json_path, monkeypatch):
+    steps = {
+        "a": {"environment": "env-2"},
+        "b": {"environment": "env-1"},
+        "c": {"environment": "env-2"},
+    }
+    _write_pipeline(pipeline_json_path, "my-pipeline", steps)
+    fake_db = FakeDb()
+    monkeypatch.setattr(pipelines, "db", fake_db)
+    pipeline = FakePipeline("p1")
+
+    pipelines.refresh_pipelines_metadata([(pipeline, "project")])
+
+    assert pipeline.name == "my-pipeline"
+    assert pipeline.step_count == 3
+    assert pipeline.environments == ["env-1", "env-2"]
+    assert pipeline.file_mtime_ns == os.stat(pipeline_json_path).st_mtime_ns
+    assert pipeline.file_hash is not None
+    assert fake_db.session.commits == 1
+
+
+def test_refresh_skips_read_if_mtime_unchanged(app, pipeline_json_path, monkeypatch):
+    _write_pipeline(pipeline_json_path, "my-pipeline")
+    fake_db = FakeDb()
+    monkeypatch.setattr(pipelines, "db", fake_db)
+    pipeline = FakePipeline("p1")
+    pipelines.refresh_pipelines_metadata([(pipeline, "project")])
+
+    def fail_open(*args, **kwargs):
+        raise AssertionError("The pipeline file should not be read.")
+
+    monkeypatch.setattr(pipelines, "open", fail_open, raising=False)
+    pipelines.refresh_pipelines_metadata([(pipeline, "project")])
+
+    assert pipeline.name == "my-pipeline"
+    assert fake_db.session.commits == 1
+
+
+def test_refresh_skips_parse_if_content_unchanged(app, pipeline_json_path, monkeypatch):
+    _write_pipeline(pipeline_json_path, "my-pipeline")
+    monkeypatch.setattr(pipelines, "db", FakeDb())
+    pipeline = FakePipeline("p1")
+    pipelines.refresh_pipelines_metadata([(pipeline, "project")])
+
+    # Only touch the file, its content stays the same.
+    past = time.time() - 5
+    os.utime(pipeline_json_path, (past, past))
+
+    def fail_loads(*args, **kwargs):
+        raise AssertionError("The pipeline file should not be parsed.")
+
+    monkeypatch.setattr(pipelines.json, "loads", fail_loads)
+    pipelines.refresh_pipelines_metadata([(pipeline, "project")])
+
+    assert pipeline.name == "my-pipeline"
+    assert pipeline.file_mtime_ns == os.stat(pipeline_json_path).st_mtime_ns
+
+
+def test_refresh_does_not_store_racy_mtime(app, pipeline_json_path, monkeypatch):
+    _write_pipeline(pipeline_json_path, "my-pipeline", age=0)
+    monkeypatch.setattr(pipelines, "db", FakeDb())
+    pipeline = FakePipeline("p1")
+
+    pipelines.refresh_pipelines_metadata([(pipeline, "project")])
+
+    assert pipeline.name == "my-pipeline"
+    assert pipeline.file_mtime_ns is None
+
+    # Since the mtime was not stored, a change within the same mtime
+    # granularity is still picked up.
+    mtime_ns = os.stat(pipeline_json_path).st_mtime_ns
+    _write_pipeline(pipeline_json_path, "renamed", age=0)
+    os.utime(pipeline_json_path, ns=(mtime_ns, mtime_ns))
+    pipelines.refresh_pipelines_metadata([(pipeline, "project")])
+
+    assert pipeline.name == "renamed"
+
+
+def test_refresh_missing_file(app, pipeline_json_path, monkeypatch):
+    _write_pipeline(pipeline_json_path, "my-pipeline")
+    monkeypatch.setattr(pipelines, "db", FakeDb())
+    pipeline = FakePipeline("p1")
+    pipelines.refresh_pipelines_metadata([(pipeline, "project")])
+
+    os.remove(pipeline_json_path)
+    pipelines.refresh_pipelines_metadata([(pipeline, "project")])
+
+    assert pipeline.name is None
+    assert pipeline.step_count is None
+    assert pipeline.environments is None
+    assert pipeline.file_mtime_ns is None
+    assert pipeline.file_hash is None
+
+
+def test_refresh_invalid_file(app, pipeline_json_path, monkeypatch):
+    with open(pipeline_json_path, "w") as f:
+        f.write("{")
+    monkeypatch.setattr(pipelines, "db", FakeDb())
+    pipeline = FakePipeline("p1")
+    pipeline.name = "my-pipeline"
+
+    pipelines.refresh_pipelines_metadata([(pipeline, "project")])
+
+    assert pipeline.name is None
+    assert pipeline.file_hash is not None
+
+
+def test_get_pipelines_metadata(app, tmp_path, pipeline_json_path, monkeypatch):
+    _write_pipeline(pipeline_json_path, "my-pipeline", {"a": {"environment": "e"}})
+    pipeline = FakePipeline("p1")
+    missing = FakePipeline("p2", path="missing.orchest")
+    monkeypatch.setattr(
+        pipelines, "db", FakeDb([(pipeline, "project"), (missing, "project")])
+    )
+
+    metadata = pipelines.get_pipelines_metadata("project-uuid")
+
+    assert metadata == [
+        {
+            "uuid": "p1",
+            "path": "pipeline.orchest",
+            "project_uuid": "project-uuid",
+            "name": "my-pipeline",
+            "step_count": 1,
+            "environments": ["e"],
+        },
+        {
+            "uuid": "p2",
+            "path": "missing.orchest",
+            "project_uuid": "project-uuid",
+            "name": None,
+            "step_count": None,
+            "environments": None,
+        },
+    ]
@@ -0,0 +1,158 @@
+import os
+import threading
+
+import pytest
+from flask import Flask
+
+from app.core import directory_index, project_discovery
+
+
+class FakeTwoPhaseExecutor:
+    def __init__(self, session):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+class FakeProjectQuery:
+    def __init__(self, uuids):
+        self.uuids = uuids
+
+    def filter_by(self, **kwargs):
+        return self
+
+    def with_entities(self, *args):
+        return self
+
+    def all(self):
+        return [FakeProject(uuid) for uuid in self.uuids]
+
+
+class FakeProject:
+    uuid = None
+    query = None
+
+    def __init__(self, uuid):
+        self.uuid = uuid
+
+
+@pytest.fixture
+def synced(tmp_path, monkeypatch):
+    """Sets up project discovery, returns the synchronized projects."""
+    synced = []
+
+    class FakeSyncProjectPipelinesDBState:
+        def __init__(self, tpe):
+            pass
+
+        def transaction(self, project_uuid):
+            synced.append(project_uuid)
+
+    app = Flask(__name__)
+    app.config["PROJECTS_DIR"] = str(tmp_path)
+    monkeypatch.setattr(directory_index, "_REVALIDATE_INTERVAL", 0)
+    monkeypatch.setattr(project_discovery, "_synced_pipeline_paths", {})
+    monkeypatch.setattr(project_discovery, "TwoPhaseExecutor", FakeTwoPhaseExecutor)
+    monkeypatch.setattr(
+        project_discovery,
+        "SyncProjectPipelinesDBState",
+        FakeSyncProjectPipelinesDBState,
+    )
+    # Project directories are named after the project.
+    monkeypatch.setattr(project_discovery, "project_uuid_to_path", lambda uuid: uuid)
+    monkeypatch.setattr(project_discovery, "discoverFSDeletedProjects", lambda: None)
+    monkeypatch.setattr(
+        project_discovery, "discoverFSCreatedProjects", lambda **kwargs: None
+    )
+
+    with app.app_context():
+        yield synced
+
+
+def _touch(root, path):
+    path = os.path.join(root, path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "w").close()
+
+
+def test_sync_project_pipelines_skips_unchanged_projects(tmp_path, synced):
+    _touch(tmp_path, "project/a.orchest")
+
+    assert project_discovery.sync_project_pipelines("project")
+    assert not project_discovery.sync_project_pipelines("project")
+    # Dependencies are not searched for pipelines.
+    _touch(tmp_path, "project/node_modules/b.orchest")
+    assert not project_discovery.sync_project_pipelines("project")
+
+    _touch(tmp_path, "project/b.orchest")
+    assert project_discovery.sync_project_pipelines("project")
+    assert synced == ["project", "project"]
+
+
+def test_sync_project_pipelines_force(tmp_path, synced):
+    _touch(tmp_path, "project/a.orchest")
+    project_discovery.sync_project_pipelines("project")
+
+    assert project_discovery.sync_project_pipelines("project", force=True)
+    assert synced == ["project", "project"]
+
+
+def test_sync_project_pipelines_full_sync_interval(tmp_path, synced, monkeypatch):
+    _touch(tmp_path, "project/a.orchest")
+    project_discovery.sync_project_pipelines("project")
+    monkeypatch.setattr(project_discovery, "_FULL_SYNC_INTERVAL", 0)
+
+    assert project_discovery.sync_project_pipelines("project")
+
+
+def test_discover_projects(tmp_path, synced, monkeypatch):
+    for project in ["project-1", "project-2"]:
+        _touch(tmp_path, f"{project}/a.orchest")
+    monkeypatch.setattr(
+        FakeProject, "query", FakeProjectQuery(["project-1", "project-2"])
+    )
+    monkeypatch.setattr(project_discovery, "Project", FakeProject)
+
+    assert project_discovery.discover_projects()
+    assert sorted(synced) == ["project-1", "project-2"]
+
+    # Deleted projects are forgotten, unchanged ones are skipped.
+    monkeypatch.setattr(FakeProject, "query", FakeProjectQuery(["project-1"]))
+    assert project_discovery.discover_projects()
+    assert sorted(synced) == ["project-1", "project-2"]
+    assert list(project_discovery._synced_pipeline_paths) == ["project-1"]
+
+    assert project_discovery.discover_projects(force=True)
+    assert sorted(synced) == ["project-1", "project-1", "project-2"]
+
+
+def test_discover_projects_skips_concurrent_discovery(synced):
+    with project_discovery._discovery_lock:
+        assert not project_discovery.discover_projects(blocking=False)
+
+
+def test_queue_discovery_merges_queued_discoveries(monkeypatch):
+    discoveries = []
+    discovered = threading.Event()
+
+    def discover_projects(force, skip_env_builds_on_discovery):
+        discoveries.append((force, skip_env_builds_on_discovery))
+        discovered.set()
+
+    monkeypatch.setattr(project_discovery, "_discover_projects", discover_projects)
+    monkeypatch.setattr(project_discovery, "_queued_discovery", None)
+    app = Flask(__name__)
+
+    # Discoveries are queued behind the running one.
+    with project_discovery._discovery_lock:
+        project_discovery.queue_discovery(app, skip_env_builds_on_discovery=True)
+        project_discovery.queue_discovery(app, force=True)
+        project_discovery.queue_discovery(app, skip_env_builds_on_discovery=True)
+        assert not discovered.wait(0.1)
+
+    assert discovered.wait(5)
+    assert discoveries == [(True, False)]
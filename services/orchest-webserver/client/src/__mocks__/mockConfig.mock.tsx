@@ -44,6 +44,7 @@ const DEFAULT_CONFIG: OrchestConfig = {
 const DEFAULT_USER_CONFIG: OrchestUserConfig = {
   AUTH_ENABLED: false,
   INTERCOM_USER_EMAIL: chance.email(),
+  JOB_RUN_DIRECTORY_MODE: "copy",
   MAX_BUILDS_PARALLELISM: 1,
   MAX_INTERACTIVE_RUNS_PARALLELISM: 1,
   MAX_JOB_RUNS_PARALLELISM: 1,
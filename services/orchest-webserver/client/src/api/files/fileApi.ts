@@ -12,6 +12,8 @@ export type TreeNode = {
   type: "directory" | "file";
   name: string;
   root: boolean;
+  /** Only set when the children were requested with a `limit`. */
+  total_children?: number;
 };
 
 export type FetchNodeParams = {
@@ -23,6 +25,8 @@ export type FetchNodeParams = {
   root: string;
   path?: string;
   depth?: number;
+  offset?: number;
+  limit?: number;
 };
 
 export type ReadFileParams = {
@@ -14,7 +14,6 @@ export type NewProjectData = { project_uuid: string };
 export type FetchAllParams = {
   sessionCounts?: boolean;
   activeJobCounts?: boolean;
-  skipDiscovery?: boolean;
 };
 
 /**
@@ -56,14 +55,23 @@ export const importGitRepo = (url: string, projectName?: string) =>
 export const fetchAll = ({
   sessionCounts = true,
   activeJobCounts = true,
-  skipDiscovery = false,
 } = {}): Promise<Project[]> =>
   fetcher(
-    PROJECTS_API_URL +
-      "?" +
-      queryArgs({ sessionCounts, activeJobCounts, skipDiscovery })
+    PROJECTS_API_URL + "?" + queryArgs({ sessionCounts, activeJobCounts })
   );
 
+/**
+ * Queues the discovery of the projects and pipelines that were created, moved
+ * or deleted through the file system. The discovery runs in the background.
+ * It also runs periodically, use this to make such changes visible sooner.
+ * @param force Whether to synchronize the pipelines of every project, instead
+ *  of only those of the projects whose pipeline files changed.
+ */
+export const rescan = (force = false): Promise<void> =>
+  fetcher(join(PROJECTS_API_URL, "rescan") + "?" + queryArgs({ force }), {
+    method: "POST",
+  });
+
 /** Creates a new project with the provided name, then returns its UUID. */
 export const post = (projectName: string) =>
   fetcher<NewProjectData>(PROJECTS_API_URL, {
@@ -78,5 +86,6 @@ export const projectsApi = {
   post,
   put,
   importGitRepo,
+  rescan,
   delete: deleteProject,
 };
@@ -6,6 +6,9 @@ import { FetchAllParams, projectsApi, ProjectUpdateData } from "./projectsApi";
 
 export type ProjectMap = { [uuid: string]: Project };
 
+/** Milliseconds to wait for a queued discovery before reloading the projects. */
+const RESCAN_RELOAD_DELAY = 2000;
+
 export type ProjectsApi = {
   /** A map of the currently available projects by UUID. */
   projects: ProjectMap | undefined;
@@ -13,6 +16,11 @@ export type ProjectsApi = {
   deleting: string[];
   /** Loads all available projects. */
   fetchAll: MemoizePending<(params?: FetchAllParams) => Promise<ProjectMap>>;
+  /**
+   * Queues the discovery of the projects changed through the file system, then
+   * loads all available projects once the discovery has likely finished.
+   */
+  rescan: MemoizePending<() => Promise<ProjectMap>>;
   /** Creates a project with the  */
   create: MemoizePending<(projectName: string) => Promise<Project>>;
   /** Updates the project with the new data. */
@@ -51,6 +59,13 @@ export const useProjectsApi = create(
         projects: undefined,
         deleting: [],
         fetchAll: memoized(reload),
+        rescan: memoized(async () => {
+          await projectsApi.rescan();
+          await new Promise((resolve) =>
+            window.setTimeout(resolve, RESCAN_RELOAD_DELAY)
+          );
+          return await reload();
+        }),
         create: memoized(async (name) => {
           const uuid = await projectsApi.post(name);
           return await reloadAndFind(uuid);
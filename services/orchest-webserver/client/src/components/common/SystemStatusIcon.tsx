@@ -1,5 +1,6 @@
 import { StatusFlavor, SystemStatus } from "@/utils/system-status";
 import { BlockOutlined } from "@mui/icons-material";
+import CachedOutlined from "@mui/icons-material/CachedOutlined";
 import CheckCircleOutlineOutlined from "@mui/icons-material/CheckCircleOutlineOutlined";
 import CircleOutlined from "@mui/icons-material/CircleOutlined";
 import ErrorOutlined from "@mui/icons-material/ErrorOutline";
@@ -44,6 +45,8 @@ export const SystemStatusIcon = ({
     );
   } else if (status === "SUCCESS") {
     return <CheckCircleOutlineOutlined fontSize={size} color="success" />;
+  } else if (status === "CACHED") {
+    return <CachedOutlined fontSize={size} color="success" />;
   } else if (status === "ABORTED") {
     return <BlockOutlined fontSize={size} color="warning" />;
   } else if (status === "PAUSED") {
@@ -8,6 +8,7 @@ import Typography from "@mui/material/Typography";
 import React from "react";
 import { ImportProjectButton } from "./components/ImportProjectButton";
 import { NewProjectButton } from "./components/NewProjectButton";
+import { RescanProjectsButton } from "./components/RescanProjectsButton";
 import { SubmitExampleButton } from "./components/SubmitExampleButton";
 
 export type HomeHeaderProps = {
@@ -41,6 +42,7 @@ export const HomeHeader = ({ scrolled }: HomeHeaderProps) => {
             <SubmitExampleButton />
           ) : (
             <>
+              {tab === "projects" && <RescanProjectsButton />}
               <ImportProjectButton showSuccessDialog={true} />
               <NewProjectButton />
             </>
@@ -0,0 +1,44 @@
+import { useProjectsApi } from "@/api/projects/useProjectsApi";
+import { ErrorSummary } from "@/components/common/ErrorSummary";
+import { useGlobalContext } from "@/contexts/GlobalContext";
+import RefreshOutlined from "@mui/icons-material/RefreshOutlined";
+import Button, { ButtonProps } from "@mui/material/Button";
+import React from "react";
+
+/**
+ * Discovers the projects that were created, moved or deleted through the file
+ * system, e.g. through a git pull, without waiting for the periodic discovery.
+ */
+export const RescanProjectsButton = React.forwardRef<
+  HTMLButtonElement,
+  ButtonProps
+>(function RescanProjectsButton({ children = "Rescan", ...buttonProps }, ref) {
+  const { setAlert } = useGlobalContext();
+  const rescan = useProjectsApi((api) => api.rescan);
+  const [isRescanning, setIsRescanning] = React.useState(false);
+
+  const onClick = async () => {
+    setIsRescanning(true);
+    try {
+      await rescan();
+    } catch (error) {
+      setAlert("Failed to rescan projects", <ErrorSummary error={error} />);
+    } finally {
+      setIsRescanning(false);
+    }
+  };
+
+  return (
+    <Button
+      ref={ref}
+      variant="text"
+      startIcon={<RefreshOutlined />}
+      onClick={onClick}
+      disabled={isRescanning}
+      data-test-id="rescan-projects-button"
+      {...buttonProps}
+    >
+      {children}
+    </Button>
+  );
+});
@@ -37,9 +37,11 @@ import Alert from "@mui/material/Alert";
 import AlertTitle from "@mui/material/AlertTitle";
 import Box from "@mui/material/Box";
 import Button from "@mui/material/Button";
+import FormControlLabel from "@mui/material/FormControlLabel";
 import LinearProgress from "@mui/material/LinearProgress";
 import Stack from "@mui/material/Stack";
 import { styled } from "@mui/material/styles";
+import Switch from "@mui/material/Switch";
 import Tab from "@mui/material/Tab";
 import TextField from "@mui/material/TextField";
 import Typography from "@mui/material/Typography";
@@ -580,6 +582,31 @@ export const PipelineSettingsView: React.FC = () => {
                       </div>
                       <div className="clear"></div>
                     </div>
+
+                    <div className="columns">
+                      <div className="column">
+                        <h3>Step output caching</h3>
+                      </div>
+                      <div className="column">
+                        <FormControlLabel
+                          control={
+                            <Switch
+                              checked={settings.cache_step_outputs || false}
+                              onChange={(e) =>
+                                setSettings({
+                                  ...settings,
+                                  ...{ cache_step_outputs: e.target.checked },
+                                })
+                              }
+                              disabled={isReadOnly}
+                              data-test-id="pipeline-settings-configuration-cache-step-outputs"
+                            />
+                          }
+                          label="Reuse the outputs of unchanged steps in job runs"
+                        />
+                      </div>
+                      <div className="clear"></div>
+                    </div>
                   </form>
                 </div>
               </CustomTabPanel>
@@ -42,8 +42,12 @@ export const StepExecutionState = ({ stepUuid }: { stepUuid: string }) => {
       ? `${formatDuration(started_time, server_time)}`
       : "";
 
+  // Cached steps reuse earlier outputs, thus they have no duration.
   const showDuration =
-    duration && stepRunState.status !== "ABORTED" && fileStatus !== "not-found";
+    duration &&
+    stepRunState.status !== "ABORTED" &&
+    stepRunState.status !== "CACHED" &&
+    fileStatus !== "not-found";
 
   return (
     <Typography
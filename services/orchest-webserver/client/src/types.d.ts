@@ -102,6 +102,7 @@ export type OrchestConfig = {
 export interface OrchestUserConfig {
   AUTH_ENABLED?: boolean;
   INTERCOM_USER_EMAIL: string;
+  JOB_RUN_DIRECTORY_MODE: "copy" | "hardlink";
   MAX_BUILDS_PARALLELISM: number;
   MAX_INTERACTIVE_RUNS_PARALLELISM: number;
   MAX_JOB_RUNS_PARALLELISM: number;
@@ -265,7 +266,8 @@ export type PipelineStepStatus =
   | "SUCCESS"
   | "FAILURE"
   | "ABORTED"
-  | "PENDING";
+  | "PENDING"
+  | "CACHED";
 
 export type JobStatus =
   | "DRAFT"
@@ -460,6 +462,10 @@ export type PipelineMetaData = {
   path: string;
   /** A human-readable name for the pipeline (usage is discouraged in favor of `path`). */
   name: string;
+  /** The number of steps, null if the pipeline file could not be read. */
+  step_count?: number | null;
+  /** The UUIDs of the environments used by the steps of the pipeline. */
+  environments?: string[] | null;
 };
 
 export type PipelineStatus = "READY" | PipelineRunStatus;
@@ -472,6 +478,7 @@ export type PipelineState = PipelineMetaData & {
 
 export type PipelineSettings = {
   auto_eviction?: boolean;
+  cache_step_outputs?: boolean;
   data_passing_memory_size?: string;
   max_steps_parallelism?: integer;
 };
@@ -26,6 +26,9 @@ export const pipelineSchema = {
         auto_eviction: {
           type: "boolean",
         },
+        cache_step_outputs: {
+          type: "boolean",
+        },
         data_passing_memory_size: {
           type: "string",
         },
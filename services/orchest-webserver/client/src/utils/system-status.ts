@@ -17,12 +17,16 @@ export type SystemStatus =
   | "ABORTED"
   | "SUCCESS"
   | "SCHEDULED"
-  | "FAILURE";
+  | "FAILURE"
+  | "CACHED";
 
 export type StatusFlavor = "job" | "pipeline" | "build";
 
 export const hasEnded = (status: SystemStatus) =>
-  status === "ABORTED" || status === "SUCCESS" || status === "FAILURE";
+  status === "ABORTED" ||
+  status === "SUCCESS" ||
+  status === "FAILURE" ||
+  status === "CACHED";
 
 export const statusTitle = (status: SystemStatus, flavor: StatusFlavor) => {
   if (status === "IDLE") {
@@ -58,6 +62,7 @@ export const statusColor = (status: SystemStatus | undefined) => {
     case "FAILURE":
       return red["700"];
     case "SUCCESS":
+    case "CACHED":
       return green["800"];
     default:
       return grey["600"];
@@ -1,13 +1,14 @@
+import datetime
 import json
 import logging
 import os
 import re
 import signal
 import sys
+import threading
 import time
 import uuid
-from multiprocessing.pool import ThreadPool
-from typing import List
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
 from kubernetes import client, config, watch
 
@@ -42,67 +43,268 @@ def get_services_to_follow() -> List[str]:
     return services_to_follow
 
 
-def follow_service_logs(service):
-    config.load_incluster_config()
-    k8s_core_api = client.CoreV1Api()
+# Seconds between flushes of the service log files.
+_FLUSH_INTERVAL = 1
+# Seconds to wait before reopening a log stream or the pod watch.
+_RECONNECT_BACKOFF = 1
+# Extra seconds of logs requested when reopening a log stream, to
+# account for clock skew between the sidecar and the node. The lines
+# that were already written are skipped.
+_RESUME_MARGIN = 5
+_IMAGE_PULL_ERRORS = ["ErrImagePull", "ImagePullBackOff"]
+
+
+class ServiceLogWriter:
+    """Buffered writer of the log file of a service.
 
-    logging.info(f"Initiating logs file for service {service}.")
-    with open(get_service_log_file_path(service), "w") as log_file:
+    Lines are written to the buffer of the file, which is flushed every
+    `_FLUSH_INTERVAL` seconds, see `flush_periodically`, instead of
+    after every line.
+    """
+
+    def __init__(self, service: str) -> None:
+        logging.info(f"Initiating logs file for service {service}.")
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._file = open(get_service_log_file_path(service), "w")
         # Used by the log_streamer.py to infer that a new session
         # has started, i.e. the previous logs can be discarded.  The
         # file streamer has this contract to understand that some
         # logs belong to a different session, i.e. different UUID
         # implies different session.
-        log_file.write("%s\n" % str(uuid.uuid4()))
-        log_file.flush()
+        self._file.write("%s\n" % str(uuid.uuid4()))
+        self._file.flush()
 
-        while True:
-            pods = k8s_core_api.list_namespaced_pod(
-                namespace=Config.NAMESPACE,
-                label_selector=f"session_uuid={Config.SESSION_UUID},app={service}",
-            )
-            if not pods.items:
-                logging.info(f"{service} is not up yet.")
-                continue
+    def write_line(self, line: str) -> None:
+        with self._lock:
+            self._file.write(line)
+            self._file.write("\n")
+            self._dirty = True
 
-            # Note: this means that the session sidecar makes use of the
-            # fact that user services are single pod.
-            pod = pods.items[0]
+    def flush(self) -> None:
+        with self._lock:
+            if self._dirty:
+                self._file.flush()
+                self._dirty = False
+
+
+def flush_periodically(writers: Iterable[ServiceLogWriter]) -> None:
+    while True:
+        time.sleep(_FLUSH_INTERVAL)
+        for writer in writers:
+            writer.flush()
+
+
+def _get_timestamp_key(timestamp: str) -> Tuple[str, str]:
+    # RFC3339 timestamps with a variable number of fractional digits,
+    # e.g. 2022-01-01T10:00:00.12345Z, compared as numbers.
+    seconds, _, fraction = timestamp.rstrip("Z").partition(".")
+    return seconds, fraction.ljust(9, "0")
+
+
+def _get_service_container_status(
+    pod: client.V1Pod, service: str
+) -> Optional[client.V1ContainerStatus]:
+    for status in pod.status.container_statuses or []:
+        if status.name == f"{service}-{Config.SESSION_UUID}":
+            return status
+    return None
+
+
+class PodLogFollower(threading.Thread):
+    """Follows the logs of the service container of a pod.
+
+    The state of the pod is fed by the pod watch of the sidecar through
+    `update`. Logs are streamed as soon as the container is running.
+    If the stream drops while the container is running, it is reopened
+    from the timestamp of the last written line. Lines that were
+    already written are skipped. If the container restarts, the logs of
+    the new container are followed as well.
+    """
+
+    def __init__(
+        self,
+        k8s_core_api: client.CoreV1Api,
+        pod: client.V1Pod,
+        writer: ServiceLogWriter,
+    ) -> None:
+        super().__init__(daemon=True)
+        self._k8s_core_api = k8s_core_api
+        self._pod_name = pod.metadata.name
+        self._service = pod.metadata.labels["app"]
+        self._writer = writer
+
+        self._pod_changed = threading.Condition()
+        self._pod = pod
+        self._deleted = False
+        self._reported_issues: Set[str] = set()
+
+        # Timestamp key of the last written line and the number of lines
+        # written with that timestamp.
+        self._last_timestamp_key: Optional[Tuple[str, str]] = None
+        self._lines_at_last_timestamp = 0
+
+    def update(self, pod: client.V1Pod) -> None:
+        with self._pod_changed:
+            self._pod = pod
+            self._pod_changed.notify_all()
+
+    def mark_deleted(self) -> None:
+        with self._pod_changed:
+            self._deleted = True
+            self._pod_changed.notify_all()
+
+    def _report_issue(self, issue: str) -> None:
+        if issue not in self._reported_issues:
+            logging.info(f"{self._service}: {issue}")
+            self._writer.write_line(issue)
+            self._reported_issues.add(issue)
+
+    def _wait_for_container(
+        self, done_restart_count: Optional[int]
+    ) -> Optional[client.V1ContainerStatus]:
+        """Waits for a started container whose logs are not complete.
+
+        Returns:
+            The status of the container, None if no container is going
+            to be started, e.g. because the pod has been deleted.
+        """
+        with self._pod_changed:
+            while True:
+                if self._deleted:
+                    return None
+
+                status = _get_service_container_status(self._pod, self._service)
+                if status is not None and status.restart_count != done_restart_count:
+                    if status.state.running or status.state.terminated:
+                        return status
+                    waiting = status.state.waiting
+                    if waiting is not None and waiting.reason in _IMAGE_PULL_ERRORS:
+                        self._report_issue("Image pull failed.")
+
+                phase = self._pod.status.phase
+                if phase == "Unknown":
+                    self._report_issue("Unknown service issue.")
+                elif phase in ["Failed", "Succeeded"]:
+                    return None
+                self._pod_changed.wait()
+
+    def _stream_logs(self) -> None:
+        kwargs = {}
+        if self._last_timestamp_key is not None:
+            last_time = datetime.datetime.strptime(
+                self._last_timestamp_key[0], "%Y-%m-%dT%H:%M:%S"
+            ).replace(tzinfo=datetime.timezone.utc)
+            kwargs["since_seconds"] = (
+                int(time.time() - last_time.timestamp()) + _RESUME_MARGIN
+            )
+        lines_to_skip = self._lines_at_last_timestamp
 
-            phase = pod.status.phase
-            logging.info(f"{service} phase is {phase}.")
-            if phase in ["Failed", "Running", "Succeeded"]:
-                break
-            elif phase == "Unknown":
-                log_file.write("Unknown service issue.")
-                log_file.flush()
-                return
-            else:  # Pending
-                logging.info(f"{service} is pending.")
-                # Based on the state of the service it may return an
-                # object without a get apparently.
-                if hasattr(pod, "get"):
-                    msg = pod.get("message", "")
-                    if "ImagePullBackOff" in msg or "ErrImagePull" in msg:
-                        logging.info(f"{service} image pull failed.")
-                        log_file.write("Image pull failed.")
-                        log_file.flush()
-                        return
-            time.sleep(1)
-
-        logging.info(f"Getting logs from service {service}, pod {pod.metadata.name}.")
         w = watch.Watch()
-        for event in w.stream(
-            k8s_core_api.read_namespaced_pod_log,
-            name=pod.metadata.name,
-            container=f"{service}-{Config.SESSION_UUID}",
+        for line in w.stream(
+            self._k8s_core_api.read_namespaced_pod_log,
+            name=self._pod_name,
+            container=f"{self._service}-{Config.SESSION_UUID}",
             namespace=Config.NAMESPACE,
-            follow=True,
+            timestamps=True,
+            **kwargs,
         ):
-            log_file.write(event)
-            log_file.write("\n")
-            log_file.flush()
-        logging.info(f"No more logs for {service}.")
+            timestamp, _, line = line.partition(" ")
+            key = _get_timestamp_key(timestamp)
+            if self._last_timestamp_key is not None:
+                if key < self._last_timestamp_key:
+                    continue
+                if key == self._last_timestamp_key and lines_to_skip > 0:
+                    lines_to_skip -= 1
+                    continue
+
+            if key == self._last_timestamp_key:
+                self._lines_at_last_timestamp += 1
+            else:
+                self._last_timestamp_key = key
+                self._lines_at_last_timestamp = 1
+            self._writer.write_line(line)
+
+    def run(self) -> None:
+        logging.info(f"Following service {self._service}, pod {self._pod_name}.")
+        # Restart count of the last container whose logs are complete.
+        done_restart_count = None
+        while True:
+            status = self._wait_for_container(done_restart_count)
+            if status is None:
+                break
+
+            # The logs of a container that has terminated are complete
+            # once streamed.
+            terminated = status.state.terminated is not None
+            try:
+                self._stream_logs()
+            except Exception as e:
+                logging.warning(f"Log stream of {self._service} failed: {e}.")
+                terminated = False
+
+            if terminated:
+                done_restart_count = status.restart_count
+            else:
+                # The stream dropped, or ended since the container
+                # terminated, wait for the state of the pod to be
+                # updated before reopening it.
+                with self._pod_changed:
+                    self._pod_changed.wait(_RECONNECT_BACKOFF)
+        logging.info(f"No more logs for {self._service}, pod {self._pod_name}.")
+
+
+def follow_services_logs(services: List[str], writers: Dict[str, ServiceLogWriter]):
+    """Follows the logs of the pods of the services through a pod watch.
+
+    A single watch over the pods of the session feeds the followers of
+    all services, see `PodLogFollower`.
+    """
+    config.load_incluster_config()
+    k8s_core_api = client.CoreV1Api()
+    label_selector = f"session_uuid={Config.SESSION_UUID}"
+    # Pod uid to its follower.
+    followers: Dict[str, PodLogFollower] = {}
+
+    def handle_pod(pod: client.V1Pod, deleted: bool = False) -> None:
+        service = (pod.metadata.labels or {}).get("app")
+        if service not in services:
+            return
+        follower = followers.get(pod.metadata.uid)
+        if follower is not None:
+            follower.update(pod)
+            if deleted:
+                followers.pop(pod.metadata.uid).mark_deleted()
+        elif not deleted:
+            follower = PodLogFollower(k8s_core_api, pod, writers[service])
+            followers[pod.metadata.uid] = follower
+            follower.start()
+
+    while True:
+        try:
+            # List before watching so that pods deleted while the watch
+            # was down are noticed.
+            pods = k8s_core_api.list_namespaced_pod(
+                namespace=Config.NAMESPACE, label_selector=label_selector
+            )
+            uids = {pod.metadata.uid for pod in pods.items}
+            for uid in list(followers):
+                if uid not in uids:
+                    followers.pop(uid).mark_deleted()
+            for pod in pods.items:
+                handle_pod(pod)
+
+            w = watch.Watch()
+            for event in w.stream(
+                k8s_core_api.list_namespaced_pod,
+                namespace=Config.NAMESPACE,
+                label_selector=label_selector,
+                resource_version=pods.metadata.resource_version,
+            ):
+                handle_pod(event["object"], deleted=event["type"] == "DELETED")
+        except Exception as e:
+            logging.warning(f"Pod watch failed, restarting it: {e}.")
+        time.sleep(_RECONNECT_BACKOFF)
 
 
 if __name__ == "__main__":
@@ -135,5 +337,19 @@ if __name__ == "__main__":
     logging.info(
         f"Following services: {services_to_follow} for {Config.SESSION_TYPE} session."
     )
-    pool = ThreadPool(len(services_to_follow))
-    pool.map(follow_service_logs, services_to_follow)
+    if not services_to_follow:
+        # Exiting would only get the sidecar restarted.
+        signal.pause()
+
+    writers = {service: ServiceLogWriter(service) for service in services_to_follow}
+
+    def flush_and_exit(*args, **kwargs):
+        for writer in writers.values():
+            writer.flush()
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, flush_and_exit)
+    threading.Thread(
+        target=flush_periodically, args=(list(writers.values()),), daemon=True
+    ).start()
+    follow_services_logs(services_to_follow, writers)
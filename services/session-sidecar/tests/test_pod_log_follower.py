@@ -0,0 +1,146 @@
+import os
+import sys
+
+import pytest
+from kubernetes import client
+
+os.environ.setdefault("ORCHEST_SESSION_UUID", "session-uuid")
+os.environ.setdefault("ORCHEST_SESSION_TYPE", "interactive")
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+)
+
+import main  # noqa: E402
+
+
+class FakeWriter:
+    def __init__(self):
+        self.lines = []
+
+    def write_line(self, line):
+        self.lines.append(line)
+
+
+class FakeWatch:
+    """Streams the given log lines, one list of lines per stream."""
+
+    streams = []
+    calls = []
+
+    def stream(self, func, **kwargs):
+        FakeWatch.calls.append(kwargs)
+        lines, drops = FakeWatch.streams.pop(0)
+        for line in lines:
+            yield line
+        if drops:
+            raise ConnectionError("Stream dropped.")
+
+
+@pytest.fixture
+def follower(monkeypatch):
+    monkeypatch.setattr(main.watch, "Watch", FakeWatch)
+    monkeypatch.setattr(FakeWatch, "streams", [])
+    monkeypatch.setattr(FakeWatch, "calls", [])
+    pod = client.V1Pod(
+        metadata=client.V1ObjectMeta(name="pod", labels={"app": "service"}),
+        status=client.V1PodStatus(phase="Running"),
+    )
+    return main.PodLogFollower(client.CoreV1Api(), pod, FakeWriter())
+
+
+@pytest.mark.parametrize(
+    "smaller, larger",
+    [
+        ("2022-01-01T10:00:00Z", "2022-01-01T10:00:00.5Z"),
+        ("2022-01-01T10:00:00.1Z", "2022-01-01T10:00:00.12Z"),
+        ("2022-01-01T10:00:00.05Z", "2022-01-01T10:00:00.1Z"),
+        ("2022-01-01T10:00:00.999999999Z", "2022-01-01T10:00:01Z"),
+        ("2022-01-01T09:59:59.5Z", "2022-01-01T10:00:00.05Z"),
+    ],
+)
+def test_get_timestamp_key_order(smaller, larger):
+    assert main._get_timestamp_key(smaller) < main._get_timestamp_key(larger)
+
+
+@pytest.mark.parametrize(
+    "timestamp, other",
+    [
+        ("2022-01-01T10:00:00.5Z", "2022-01-01T10:00:00.500000000Z"),
+        ("2022-01-01T10:00:00Z", "2022-01-01T10:00:00.0Z"),
+    ],
+)
+def test_get_timestamp_key_equal(timestamp, other):
+    assert main._get_timestamp_key(timestamp) == main._get_timestamp_key(other)
+
+
+def test_stream_logs(follower):
+    FakeWatch.streams.append(
+        (["2022-01-01T10:00:00.1Z a", "2022-01-01T10:00:01Z b c"], False)
+    )
+
+    follower._stream_logs()
+
+    assert follower._writer.lines == ["a", "b c"]
+    assert "since_seconds" not in FakeWatch.calls[0]
+    assert FakeWatch.calls[0]["timestamps"]
+    assert FakeWatch.calls[0]["container"] == "service-session-uuid"
+
+
+def test_stream_logs_resumes_without_duplicates(follower):
+    FakeWatch.streams.append(
+        (
+            [
+                "2022-01-01T10:00:00.1Z a",
+                "2022-01-01T10:00:00.2Z b",
+                "2022-01-01T10:00:00.2Z c",
+            ],
+            True,
+        )
+    )
+    # The reopened stream starts earlier than the last written line,
+    # and repeats lines with the timestamp of that line.
+    FakeWatch.streams.append(
+        (
+            [
+                "2022-01-01T09:59:59Z before",
+                "2022-01-01T10:00:00.1Z a",
+                "2022-01-01T10:00:00.2Z b",
+                "2022-01-01T10:00:00.2Z c",
+                "2022-01-01T10:00:00.20Z d",
+                "2022-01-01T10:00:01Z e",
+            ],
+            False,
+        )
+    )
+
+    with pytest.raises(ConnectionError):
+        follower._stream_logs()
+    assert follower._writer.lines == ["a", "b", "c"]
+
+    follower._stream_logs()
+
+    assert follower._writer.lines == ["a", "b", "c", "d", "e"]
+    assert "since_seconds" in FakeWatch.calls[1]
+    assert FakeWatch.calls[1]["since_seconds"] >= main._RESUME_MARGIN
+
+
+def test_stream_logs_resumes_after_new_lines(follower):
+    FakeWatch.streams.append((["2022-01-01T10:00:00.1Z a"], True))
+    FakeWatch.streams.append((["2022-01-01T10:00:02Z b"], True))
+    FakeWatch.streams.append(
+        (
+            [
+                "2022-01-01T10:00:00.1Z a",
+                "2022-01-01T10:00:02Z b",
+                "2022-01-01T10:00:02Z c",
+            ],
+            False,
+        )
+    )
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            follower._stream_logs()
+    follower._stream_logs()
+
+    assert follower._writer.lines == ["a", "b", "c"]
@@ -1,35 +1,76 @@
 #!/bin/bash
 set -euo pipefail
 
-if [ "$CONTAINER_RUNTIME" = containerd ]; then
-    image_exist=$(ctr -n k8s.io -a=/var/run/runtime.sock images ls name=="${IMAGE_TO_PULL}" -q)
-    if [ -n "${image_exist}" ]; then
-        echo "Image ${IMAGE_TO_PULL} exists, skip pulling."
-        exit 0
-    fi
-    ctr -n=k8s.io -a=/var/run/runtime.sock i pull "${IMAGE_TO_PULL}" --skip-verify
-elif [ "$CONTAINER_RUNTIME" = docker ]; then
+# Pulls the whitespace separated IMAGES_TO_PULL, at most
+# MAX_PARALLEL_PULLS at a time, skipping the images that exist already.
+
+MAX_PARALLEL_PULLS="${MAX_PARALLEL_PULLS:-4}"
+
+if [ "$CONTAINER_RUNTIME" != containerd ] && [ "$CONTAINER_RUNTIME" != docker ]; then
+    echo "Container runtime is not supported"
+    exit 1
+fi
 
-    image_exist=$(docker -H unix:///var/run/runtime.sock images -q "${IMAGE_TO_PULL}")
-    if [ -n "${image_exist}" ]; then
-        echo "Image ${IMAGE_TO_PULL} exists, skip pulling."
-        exit 0
+# Returns 0 if the image exists or has been pulled, 2 if it existed
+# already, 1 if it couldn't be pulled.
+pull_image() {
+    local image="$1"
+
+    if [ "$CONTAINER_RUNTIME" = containerd ]; then
+        image_exist=$(ctr -n k8s.io -a=/var/run/runtime.sock images ls name=="${image}" -q) || return 1
+        if [ -n "${image_exist}" ]; then
+            return 2
+        fi
+        ctr -n=k8s.io -a=/var/run/runtime.sock i pull "${image}" --skip-verify || return 1
+    else
+        image_exist=$(docker -H unix:///var/run/runtime.sock images -q "${image}") || return 1
+        if [ -n "${image_exist}" ]; then
+            return 2
+        fi
+
+        if ! docker -H unix:///var/run/runtime.sock pull "${image}" --disable-content-trust; then
+            echo "Docker pull failed, pulling with buildah."
+            buildah pull --tls-verify=false "${image}" || return 1
+            echo "Pushing from buildah to docker-daemon."
+            # Expected by buildah when docker-daemon is specified.
+            ln -sf /var/run/runtime.sock /var/run/docker.sock
+            buildah push --disable-compression "${image}" "docker-daemon:${image}" || return 1
+        fi
     fi
+}
+
+failures_file=$(mktemp)
 
-    set +e
-    docker -H unix:///var/run/runtime.sock pull "${IMAGE_TO_PULL}" --disable-content-trust
-
-    if [ $? -ne 0 ]; then
-        set -e
-        echo "Docker pull failed, pulling with buildah."
-        buildah pull --tls-verify=false "${IMAGE_TO_PULL}"
-        echo "Pushing from buildah to docker-daemon."
-        # Expected by buildah when docker-daemon is specified.
-        ln -s /var/run/runtime.sock /var/run/docker.sock
-        buildah push --disable-compression "${IMAGE_TO_PULL}" "docker-daemon:${IMAGE_TO_PULL}"
+pull_image_and_report() {
+    local image="$1"
+    local start=$SECONDS
+    local status=0
+    # Prefix the output so that concurrent pulls can be told apart.
+    pull_image "${image}" 2>&1 | sed -u "s|^|[${image}] |" || status=$?
+    local elapsed=$((SECONDS - start))
+
+    if [ "${status}" -eq 2 ]; then
+        echo "Image ${image} exists, skipped pulling (${elapsed}s)."
+    elif [ "${status}" -eq 0 ]; then
+        echo "Image ${image} pulled in ${elapsed}s."
+    else
+        echo "Failed to pull image ${image} after ${elapsed}s."
+        echo "${image}" >> "${failures_file}"
     fi
+}
 
-else
-    echo "Container runtime is not supported"
+start=$SECONDS
+images=$(echo "${IMAGES_TO_PULL}" | tr -s '[:space:]' '\n' | sed '/^$/d' | sort -u)
+for image in ${images}; do
+    while [ "$(jobs -rp | wc -l)" -ge "${MAX_PARALLEL_PULLS}" ]; do
+        wait -n || true
+    done
+    pull_image_and_report "${image}" &
+done
+wait
+
+echo "Done with $(echo "${images}" | wc -w) images in $((SECONDS - start))s."
+if [ -s "${failures_file}" ]; then
+    echo "Failed to pull: $(tr '\n' ' ' < "${failures_file}")"
     exit 1
 fi